@@ -1,27 +1,18 @@
-from flask import Flask, request, jsonify
-from flask_migrate import Migrate
+import os
+
+from flask import Blueprint, Flask, request, jsonify
 from flask_cors import CORS
-from extensions import db
+from capacity import change_status, set_capacity, submit
+from extensions import catalog, coalescer, db, limiter, replicas, request_logger, shedder
 from config import Config
-from models import User, Organization, Opportunity, Application, Payment
-from routes import payments_bp
+from models import User, Organization, Opportunity, Application, Payment, is_duplicate_email
+from sqlalchemy.exc import IntegrityError
+from validation import (APPLICATION, APPLICATION_UPDATE, LOGIN, OPPORTUNITY, OPPORTUNITY_UPDATE, ORGANIZATION, PAYMENT,
+                        REGISTER)
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# --------------------
-# App setup
-# --------------------
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Register blueprints
-app.register_blueprint(payments_bp)
-
-# Initialize CORS for production (allows all origins, can be restricted in production)
-CORS(app)
-
-# Initialize db and migrations
-db.init_app(app)
-migrate = Migrate(app, db)
+api_bp = Blueprint("api", __name__)
 
 # --------------------
 # Helpers for User password
@@ -35,19 +26,17 @@ def check_password(user, password):
 # --------------------
 # Routes
 # --------------------
-@app.route("/")
+@api_bp.route("/")
 def home():
     return jsonify({"message": "Volunteer Connect API running"})
 
 # ---------- AUTH ----------
-@app.route("/register", methods=["POST"])
+@api_bp.route("/register", methods=["POST"])
 def register():
-    data = request.get_json()
-    if not all(k in data for k in ("name", "email", "password", "role")):
-        return jsonify({"error": "Missing fields"}), 400
-
-    if User.query.filter_by(email=data["email"]).first():
-        return jsonify({"error": "Email already exists"}), 400
+    # Every body is checked against its schema (validation.py) before any session work
+    data, problem = REGISTER.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
 
     user = User(
         name=data["name"],
@@ -56,14 +45,24 @@ def register():
     )
     set_password(user, data["password"])
 
+    # Insert and let the unique email index decide: one round trip, and no
+    # window between a lookup and the commit for a concurrent sign-up
     db.session.add(user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_duplicate_email(e):
+            raise
+        return jsonify({"error": "Email already exists"}), 400
     return jsonify({"message": "User registered"}), 201
 
-@app.route("/login", methods=["POST"])
+@api_bp.route("/login", methods=["POST"])
 def login():
-    data = request.get_json()
-    user = User.query.filter_by(email=data.get("email")).first()
+    data, problem = LOGIN.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
+    user = User.query.filter(User.email_matches(data.get("email"))).first()
     if not user or not check_password(user, data.get("password")):
         return jsonify({"error": "Invalid credentials"}), 401
 
@@ -74,110 +73,222 @@ def login():
     })
 
 # ---------- ORGANIZATIONS ----------
-@app.route("/organizations", methods=["GET", "POST"])
+@api_bp.route("/organizations", methods=["GET", "POST"])
 def organizations():
     if request.method == "GET":
-        return jsonify([o.to_dict() for o in Organization.query.all()])
+        # From the catalog snapshot all workers map (catalog.py) while it is fresh;
+        # otherwise concurrent identical GETs share one query (coalescing.py)
+        snapshot = catalog.respond("organizations")
+        if snapshot is not None:
+            return snapshot
+        return coalescer.respond("organizations", lambda: jsonify([o.to_dict() for o in Organization.query.all()]))
 
-    data = request.get_json()
-    if not data or not data.get("name") or not data.get("owner_id"):
-        return jsonify({"error": "Missing organization name or owner_id"}), 400
+    values, problem = ORGANIZATION.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
 
-    org = Organization(
-        name=data["name"],
-        description=data.get("description"),
-        location=data.get("location"),
-        owner_id=data["owner_id"]
-    )
+    org = Organization(**values)
     db.session.add(org)
     db.session.commit()
     return jsonify({"message": "Organization created"}), 201
 
+@api_bp.route("/organizations/<int:id>", methods=["GET"])
+def get_organization(id):
+    snapshot = catalog.respond("organizations", id)
+    if snapshot is not None:
+        return snapshot
+    org = db.session.get(Organization, id)
+    if org is None:
+        return jsonify({"error": "Organization not found"}), 404
+    return jsonify(org.to_dict())
+
 # ---------- OPPORTUNITIES ----------
-@app.route("/opportunities", methods=["GET", "POST"])
+@api_bp.route("/opportunities", methods=["GET", "POST"])
 def opportunities():
     if request.method == "GET":
-        return jsonify([o.to_dict() for o in Opportunity.query.all()])
+        snapshot = catalog.respond("opportunities")
+        if snapshot is not None:
+            return snapshot
+        return coalescer.respond("opportunities", lambda: jsonify([o.to_dict() for o in Opportunity.query.all()]))
 
-    # POST logic
-    data = request.get_json()
-    if not data or not data.get("title") or not data.get("organization_id"):
-        return jsonify({"error": "Missing title or organization_id"}), 400
-
-    duration = data.get("duration")
-    if duration and not isinstance(duration, (int, float)):
-        try:
-            duration = int(duration)
-        except ValueError:
-            return jsonify({"error": "Duration must be a number"}), 400
-
-    new_opportunity = Opportunity(
-        organization_id=data["organization_id"],
-        title=data["title"],
-        description=data.get("description"),
-        location=data.get("location"),
-        duration=duration,
-        created_by=data.get("created_by")
-    )
+    # POST logic (same rules as the bulk catalog import)
+    values, problem = OPPORTUNITY.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
+
+    new_opportunity = Opportunity(**values)
     db.session.add(new_opportunity)
     db.session.commit()
     return jsonify(new_opportunity.to_dict()), 201
 
-@app.route("/opportunities/<int:id>", methods=["PATCH"])
+@api_bp.route("/opportunities/<int:id>", methods=["GET"])
+def get_opportunity(id):
+    snapshot = catalog.respond("opportunities", id)
+    if snapshot is not None:
+        return snapshot
+    # Not in the snapshot: newer than it, deleted, or never existed
+    opportunity = db.session.get(Opportunity, id)
+    if opportunity is None:
+        return jsonify({"error": "Opportunity not found"}), 404
+    return jsonify(opportunity.to_dict())
+
+@api_bp.route("/opportunities/<int:id>", methods=["PATCH"])
 def update_opportunity(id):
     data = request.get_json()
     if not data:
         return jsonify({"error": "No data provided"}), 400
+    values, problem = OPPORTUNITY_UPDATE.validate(data, partial=True)
+    if problem:
+        return jsonify(problem), 400
 
     opportunity = Opportunity.query.get_or_404(id)
-    for field in ["title", "description", "location", "duration", "organization_id"]:
-        if field in data:
-            setattr(opportunity, field, data[field])
+    if "capacity" in values:
+        # Atomic against concurrent applicants; raising it promotes the waitlist
+        error = set_capacity(db.session, opportunity, values.pop("capacity"))
+        if error:
+            return jsonify({"error": error}), 409
+    for field, value in values.items():
+        setattr(opportunity, field, value)
 
     db.session.commit()
     return jsonify(opportunity.to_dict()), 200
 
-@app.route("/opportunities/<int:id>", methods=["DELETE"])
+@api_bp.route("/opportunities/<int:id>", methods=["DELETE"])
 def delete_opportunity(id):
     opportunity = Opportunity.query.get_or_404(id)
-    db.session.delete(opportunity)
+    # Soft delete: payments and applications keep pointing at a real row, and
+    # `flask archive-deleted` moves it out of the live table later
+    opportunity.soft_delete()
     db.session.commit()
     return jsonify({"message": "Opportunity deleted successfully"}), 200
 
 # ---------- APPLICATIONS ----------
-@app.route("/applications", methods=["POST"])
+@api_bp.route("/applications", methods=["POST"])
 def apply():
-    data = request.get_json()
-    if not data or not data.get("user_id") or not data.get("opportunity_id"):
-        return jsonify({"error": "Missing user_id or opportunity_id"}), 400
+    values, problem = APPLICATION.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
 
-    appn = Application(
-        user_id=data["user_id"],
-        opportunity_id=data["opportunity_id"],
-        motivation_message=data.get("motivation_message")
-    )
-    db.session.add(appn)
+    appn = Application(**values)
+    # Takes a place if one is free (see capacity.py), else joins the waitlist
+    status = submit(db.session, appn)
+    if status is None:
+        return jsonify({"error": "Opportunity not found"}), 404
+    db.session.commit()
+    if status == "waitlisted":
+        return jsonify({"message": "Opportunity is full, application waitlisted", "id": appn.id,
+                        "status": status}), 201
+    return jsonify({"message": "Application submitted", "id": appn.id, "status": status}), 201
+
+@api_bp.route("/applications/<int:id>", methods=["PATCH"])
+def update_application(id):
+    data, problem = APPLICATION_UPDATE.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
+
+    # Row lock: two requests must not both give up this application's place
+    application = db.session.get(Application, id, with_for_update=True)
+    if application is None:
+        return jsonify({"error": "Application not found"}), 404
+    # Rejecting a pending or accepted application hands its place to the waitlist
+    error = change_status(db.session, application, data["status"])
+    if error:
+        return jsonify({"error": error}), 409
     db.session.commit()
-    return jsonify({"message": "Application submitted"}), 201
+    return jsonify(application.to_dict()), 200
 
 # ---------- PAYMENTS ----------
-@app.route("/payments", methods=["POST"])
+@api_bp.route("/payments", methods=["POST"])
 def payments():
-    data = request.get_json()
-    if not data or not data.get("user_id") or not data.get("opportunity_id") or not data.get("amount"):
-        return jsonify({"error": "Missing fields"}), 400
+    values, problem = PAYMENT.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
 
-    payment = Payment(
-        user_id=data["user_id"],
-        opportunity_id=data["opportunity_id"],
-        amount=data["amount"]
-    )
+    payment = Payment(**values)
     db.session.add(payment)
     db.session.commit()
     return jsonify({"message": "Payment recorded"}), 201
 
+# --------------------
+# App factory
+# --------------------
+def create_app(config=Config):
+    """Build and configure an app. `config` is a config class/object or a dict."""
+    app = Flask(__name__)
+    if isinstance(config, dict):
+        app.config.from_object(Config)
+        app.config.update(config)
+    else:
+        app.config.from_object(config)
+
+    # Register blueprints (payments_bp first: its POST /payments takes precedence).
+    # Route modules are imported here rather than at module level so importing
+    # this module (tests, scripts, the ASGI entry point) stays cheap.
+    from routes import payments_bp
+    from bulk import bulk_bp
+    from dashboards import dashboards_bp
+    app.register_blueprint(payments_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(bulk_bp)
+    app.register_blueprint(dashboards_bp)
+
+    # Client address from the trusted proxies' X-Forwarded-For entries only; the
+    # rate limiter and replica stickiness key on request.remote_addr
+    if app.config["TRUSTED_PROXY_HOPS"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXY_HOPS"])
+
+    # Initialize CORS for production (allows all origins, can be restricted in production)
+    CORS(app)
+
+    # Initialize db (replica binds must be registered first)
+    replicas.init_app(app)
+    db.init_app(app)
+
+    # Flask-Migrate pulls in Alembic (~150ms of imports) and is only needed for
+    # `flask db ...`, so only load it under the flask CLI
+    if os.environ.get("FLASK_RUN_FROM_CLI") == "true":
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    # Shed load and rate limit before any handler touches the database
+    shedder.init_app(app)
+    limiter.init_app(app)
+    coalescer.init_app(app)
+    catalog.init_app(app)
+    # Request ids and access lines (logs.py); its hook runs ahead of the shedder's
+    request_logger.init_app(app)
+
+    # Maintenance commands (flask archive-deleted, ...)
+    from commands import register_commands
+    register_commands(app)
+
+    return app
+
+
+def reset_after_fork(app):
+    """Drop state a preloading parent process handed to a forked worker (gunicorn post_fork)"""
+    with app.app_context():
+        # Pooled connections were opened by the parent; close=False leaves them
+        # to the parent instead of tearing down its sockets from here
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    replicas.after_fork()
+    limiter.after_fork()
+    shedder.after_fork()
+    coalescer.after_fork()
+    request_logger.after_fork()
+
+
+def __getattr__(name):
+    # Build the default app on first access (`gunicorn app:app`, `from app import app`)
+    # rather than at import, so `from app import create_app` builds nothing
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # --------------------
 # Run App
 # --------------------
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,512 @@
+"""
+ASGI entry point for Volunteer Connect
+
+Serves the routes of app.py and routes.py with the same JSON contracts, but
+on an event loop with an AsyncSession (asyncpg / aiosqlite), so a slow query
+or a password hash no longer pins a whole worker. Run it with:
+
+    python -m gunicorn asgi:app -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:$PORT
+
+The models, validators, soft-delete filtering and dashboard summaries are
+shared with the WSGI app. Not served here: the bulk import/export blueprint, read-replica
+routing (all queries go to the primary) and the cross-worker response store
+of request coalescing (identical GETs still coalesce within a worker). Framework-generated error pages
+(404/405 for unknown routes or ids) are JSON here rather than Flask's HTML.
+"""
+import json
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from capacity import change_status, set_capacity, submit
+from coalescing import AsyncSingleFlight
+from config import Config
+# Also registers the flush hook that keeps dashboard summaries current
+from dashboards import dashboard, dashboard_query
+from extensions import catalog, coalescer, request_logger
+from logs import request_id_from, request_id_var
+from models import Application, Opportunity, Organization, Payment, User, is_duplicate_email
+from throttling import parse_budget, storage_from_url
+from validation import (APPLICATION, APPLICATION_UPDATE, LOGIN, OPPORTUNITY, OPPORTUNITY_UPDATE, ORGANIZATION, PAYMENT,
+                        PAYMENT_UPDATE, REGISTER)
+
+
+# --------------------
+# Database
+# --------------------
+def async_database_url(url):
+    """Swap the sync driver in a SQLAlchemy URL for its async counterpart"""
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+engine = None
+Session = None
+
+
+def init_database(url=None):
+    global engine, Session
+    engine = create_async_engine(async_database_url(url or Config.SQLALCHEMY_DATABASE_URI))
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine.sync_engine, "connect")
+        def _foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+    # expire_on_commit=False: to_dict() after commit must not trigger lazy IO
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+# --------------------
+# Helpers
+# --------------------
+def jsonify(data, status=200, headers=None):
+    """Byte-for-byte the same body Flask's jsonify produces in production"""
+    body = json.dumps(data, sort_keys=True, separators=(",", ":")) + "\n"
+    return Response(body, status_code=status, headers=headers, media_type="application/json")
+
+
+async def get_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def not_found():
+    return jsonify({"error": "Not found"}, 404)
+
+
+# --------------------
+# Rate limiting and load shedding (same config as the WSGI app)
+# --------------------
+rate_storage = storage_from_url(Config.RATELIMIT_STORAGE_URL)
+
+
+def rate_limited(endpoint):
+    """Apply Config.RATELIMIT_BUDGETS[endpoint] to a handler, keyed like throttling.RateLimiter"""
+    def decorator(handler):
+        budget = Config.RATELIMIT_BUDGETS.get(endpoint)
+
+        async def wrapper(request):
+            if Config.RATELIMIT_ENABLED and budget:
+                rate, burst = parse_budget(budget)
+                keys = [f"ip:{request.client.host if request.client else 'unknown'}"]
+                data = await get_json(request)
+                if isinstance(data, dict):
+                    if data.get("user_id"):
+                        keys.append(f"user:{data['user_id']}")
+                    elif isinstance(data.get("email"), str):
+                        keys.append(f"email:{data['email'].strip().lower()}")
+                for key in keys:
+                    # The SQLite bucket store blocks on its file lock; keep it off the event loop
+                    allowed, retry_after = await run_in_threadpool(rate_storage.take, f"{endpoint}:{key}", rate, burst)
+                    if not allowed:
+                        return jsonify({"error": "Too many requests"}, 429,
+                                       {"Retry-After": str(max(1, math.ceil(retry_after)))})
+            return await handler(request)
+        return wrapper
+    return decorator
+
+
+class LoadSheddingMiddleware:
+    """503 + Retry-After once this worker has SHED_MAX_IN_FLIGHT requests in flight"""
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        limit = Config.SHED_MAX_IN_FLIGHT
+        if scope["type"] != "http" or not limit or scope["path"] == "/":
+            return await self.app(scope, receive, send)
+        with self._lock:
+            overloaded = self.in_flight >= limit
+            if not overloaded:
+                self.in_flight += 1
+        if overloaded:
+            response = jsonify({"error": "Service overloaded, retry shortly"}, 503,
+                               {"Retry-After": str(Config.SHED_RETRY_AFTER)})
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class AccessLogMiddleware:
+    """RequestLogger's before/after hooks for Starlette: X-Request-ID in and out, one access line"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        header = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = request_id_from(header)
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            client = scope.get("client")
+            request_logger.access(scope["method"], scope["path"], ENDPOINT_NAMES.get(scope.get("endpoint")),
+                                  status, (time.perf_counter() - started) * 1000.0, client[0] if client else None)
+            request_id_var.reset(token)
+
+
+read_flight = AsyncSingleFlight()
+
+
+async def coalesced(request, tag, produce):
+    """Coalescer.respond for the event loop: concurrent identical GETs share one `produce()`"""
+    if not Config.COALESCE_ENABLED:
+        return await produce()
+    key = (f"{tag}?{request.url.query}", coalescer.generation(tag))
+    response, joined = await read_flight.do(key, produce)
+    return Response(response.body, media_type="application/json",
+                    headers={"X-Coalesced": "follower" if joined else "computed"})
+
+
+def from_snapshot(table, id=None):
+    """CatalogSnapshot.respond for Starlette: the mapped catalog's body, or None to query"""
+    body = catalog.body(table, id)
+    if body is None:
+        return None
+    length, chunks = body
+
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(stream(), media_type="application/json",
+                             headers={"Content-Length": str(length), "X-Coalesced": "snapshot"})
+
+
+# --------------------
+# Routes (mirroring app.py)
+# --------------------
+async def home(request):
+    return jsonify({"message": "Volunteer Connect API running"})
+
+
+@rate_limited("api.register")
+async def register(request):
+    data, problem = REGISTER.validate(await get_json(request))
+    if problem:
+        return jsonify(problem, 400)
+
+    user = User(name=data["name"], email=data["email"], role=data["role"])
+    # Hashing is deliberately slow; keep it off the event loop
+    user.password_hash = await run_in_threadpool(generate_password_hash, data["password"])
+    async with Session() as session:
+        session.add(user)
+        try:
+            await session.commit()
+        except IntegrityError as e:
+            if not is_duplicate_email(e):
+                raise
+            return jsonify({"error": "Email already exists"}, 400)
+    return jsonify({"message": "User registered"}, 201)
+
+
+@rate_limited("api.login")
+async def login(request):
+    data, problem = LOGIN.validate(await get_json(request))
+    if problem:
+        return jsonify(problem, 400)
+    async with Session() as session:
+        user = await session.scalar(select(User).where(User.email_matches(data.get("email"))))
+    if not user or not await run_in_threadpool(check_password_hash, user.password_hash, data.get("password")):
+        return jsonify({"error": "Invalid credentials"}, 401)
+
+    return jsonify({"id": user.id, "name": user.name, "role": user.role})
+
+
+async def organizations(request):
+    if request.method == "GET":
+        async def produce():
+            async with Session() as session:
+                orgs = (await session.scalars(select(Organization))).all()
+            return jsonify([o.to_dict() for o in orgs])
+
+        return from_snapshot("organizations") or await coalesced(request, "organizations", produce)
+
+    values, problem = ORGANIZATION.validate(await get_json(request))
+    if problem:
+        return jsonify(problem, 400)
+
+    async with Session() as session:
+        session.add(Organization(**values))
+        await session.commit()
+    return jsonify({"message": "Organization created"}, 201)
+
+
+async def opportunities(request):
+    if request.method == "GET":
+        async def produce():
+            async with Session() as session:
+                opps = (await session.scalars(select(Opportunity))).all()
+            return jsonify([o.to_dict() for o in opps])
+
+        return from_snapshot("opportunities") or await coalesced(request, "opportunities", produce)
+
+    values, problem = OPPORTUNITY.validate(await get_json(request))
+    if problem:
+        return jsonify(problem, 400)
+
+    async with Session() as session:
+        new_opportunity = Opportunity(**values)
+        session.add(new_opportunity)
+        await session.commit()
+    return jsonify(new_opportunity.to_dict(), 201)
+
+
+async def get_organization(request):
+    id = request.path_params["id"]
+    snapshot = from_snapshot("organizations", id)
+    if snapshot is not None:
+        return snapshot
+    async with Session() as session:
+        org = await session.get(Organization, id)
+    if org is None:
+        return jsonify({"error": "Organization not found"}, 404)
+    return jsonify(org.to_dict())
+
+
+async def get_opportunity(request):
+    id = request.path_params["id"]
+    snapshot = from_snapshot("opportunities", id)
+    if snapshot is not None:
+        return snapshot
+    async with Session() as session:
+        opportunity = await session.get(Opportunity, id)
+    if opportunity is None:
+        return jsonify({"error": "Opportunity not found"}, 404)
+    return jsonify(opportunity.to_dict())
+
+
+async def opportunity_detail(request):
+    id = request.path_params["id"]
+    if request.method == "DELETE":
+        async with Session() as session:
+            opportunity = await session.get(Opportunity, id)
+            if opportunity is None:
+                return not_found()
+            opportunity.soft_delete()
+            await session.commit()
+        return jsonify({"message": "Opportunity deleted successfully"})
+
+    data = await get_json(request)
+    if not data:
+        return jsonify({"error": "No data provided"}, 400)
+    values, problem = OPPORTUNITY_UPDATE.validate(data, partial=True)
+    if problem:
+        return jsonify(problem, 400)
+
+    async with Session() as session:
+        opportunity = await session.get(Opportunity, id)
+        if opportunity is None:
+            return not_found()
+        if "capacity" in values:
+            error = await session.run_sync(set_capacity, opportunity, values.pop("capacity"))
+            if error:
+                return jsonify({"error": error}, 409)
+        for field, value in values.items():
+            setattr(opportunity, field, value)
+        await session.commit()
+        # set_capacity expired the place counts; reload them here, not lazily
+        await session.refresh(opportunity)
+    return jsonify(opportunity.to_dict())
+
+
+@rate_limited("api.apply")
+async def apply(request):
+    values, problem = APPLICATION.validate(await get_json(request))
+    if problem:
+        return jsonify(problem, 400)
+
+    appn = Application(**values)
+    async with Session() as session:
+        status = await session.run_sync(submit, appn)
+        if status is None:
+            return jsonify({"error": "Opportunity not found"}, 404)
+        await session.commit()
+    if status == "waitlisted":
+        return jsonify({"message": "Opportunity is full, application waitlisted", "id": appn.id,
+                        "status": status}, 201)
+    return jsonify({"message": "Application submitted", "id": appn.id, "status": status}, 201)
+
+
+async def update_application(request):
+    data, problem = APPLICATION_UPDATE.validate(await get_json(request))
+    if problem:
+        return jsonify(problem, 400)
+
+    async with Session() as session:
+        application = await session.get(Application, request.path_params["id"], with_for_update=True)
+        if application is None:
+            return jsonify({"error": "Application not found"}, 404)
+        error = await session.run_sync(change_status, application, data["status"])
+        if error:
+            return jsonify({"error": error}, 409)
+        await session.commit()
+    return jsonify(application.to_dict())
+
+
+# --------------------
+# Routes (mirroring dashboards.py)
+# --------------------
+async def organization_dashboard(request):
+    async with Session() as session:
+        rows = (await session.execute(dashboard_query(request.path_params["id"]))).all()
+    if not rows:
+        return jsonify({"error": "Organization not found"}, 404)
+    return jsonify(dashboard(rows[0][0], [summary for _, summary in rows if summary is not None]))
+
+
+# --------------------
+# Routes (mirroring routes.py)
+# --------------------
+async def get_payments(request):
+    async with Session() as session:
+        payments = (await session.scalars(select(Payment))).all()
+    return jsonify([payment.to_dict() for payment in payments])
+
+
+@rate_limited("payments.create_payment")
+async def create_payment(request):
+    values, problem = PAYMENT.validate(await get_json(request))
+    if problem:
+        return jsonify(problem, 400)
+
+    async with Session() as session:
+        try:
+            new_payment = Payment(**values)
+            session.add(new_payment)
+            await session.commit()
+            return jsonify(new_payment.to_dict(), 201)
+        except ValueError as e:
+            return jsonify({'error': str(e)}, 400)
+        except Exception as e:
+            await session.rollback()
+            return jsonify({'error': f"Failed to create payment: {str(e)}"}, 500)
+
+
+async def payment_detail(request):
+    id = request.path_params["id"]
+    if request.method == "PATCH":
+        values, problem = PAYMENT_UPDATE.validate(await get_json(request), partial=True)
+        if problem:
+            return jsonify(problem, 400)
+    async with Session() as session:
+        payment = await session.get(Payment, id)
+        if not payment:
+            return jsonify({'error': 'Payment not found'}, 404)
+
+        action = "delete" if request.method == "DELETE" else "update"
+        try:
+            if request.method == "DELETE":
+                payment.soft_delete()
+                await session.commit()
+                return jsonify({'message': 'Payment deleted successfully'})
+
+            for field, value in values.items():
+                setattr(payment, field, value)
+            await session.commit()
+            return jsonify(payment.to_dict())
+        except ValueError as e:
+            return jsonify({'error': str(e)}, 400)
+        except Exception as e:
+            await session.rollback()
+            return jsonify({'error': f"Failed to {action} payment: {str(e)}"}, 500)
+
+
+# --------------------
+# App
+# --------------------
+# Route names match the Flask endpoints, so budgets and logs line up
+routes = [
+    Route("/", home, name="api.home"),
+    Route("/register", register, methods=["POST"], name="api.register"),
+    Route("/login", login, methods=["POST"], name="api.login"),
+    Route("/organizations", organizations, methods=["GET", "POST"], name="api.organizations"),
+    Route("/organizations/{id:int}", get_organization, methods=["GET"], name="api.get_organization"),
+    Route("/opportunities", opportunities, methods=["GET", "POST"], name="api.opportunities"),
+    Route("/opportunities/{id:int}", get_opportunity, methods=["GET"], name="api.get_opportunity"),
+    Route("/opportunities/{id:int}", opportunity_detail, methods=["PATCH", "DELETE"],
+          name="api.opportunity_detail"),
+    Route("/applications", apply, methods=["POST"], name="api.apply"),
+    Route("/applications/{id:int}", update_application, methods=["PATCH"], name="api.update_application"),
+    Route("/organizations/{id:int}/dashboard", organization_dashboard, methods=["GET"],
+          name="dashboards.organization_dashboard"),
+    Route("/payments", get_payments, methods=["GET"], name="payments.get_payments"),
+    Route("/payments", create_payment, methods=["POST"], name="payments.create_payment"),
+    Route("/payments/{id:int}", payment_detail, methods=["PATCH", "DELETE"], name="payments.payment_detail"),
+]
+# Handler -> route name, the Flask endpoint the access log reports
+ENDPOINT_NAMES = {route.endpoint: route.name for route in routes}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if engine is None:
+        init_database()
+    yield
+    await engine.dispose()
+
+
+async def _http_error(request, exc):
+    message = "Not found" if exc.status_code == 404 else exc.detail
+    return jsonify({"error": message}, exc.status_code)
+
+
+def reset_after_fork():
+    """Drop state a preloading parent process handed to a forked worker (gunicorn post_fork)"""
+    if engine is not None:
+        engine.sync_engine.dispose(close=False)
+    rate_storage.after_fork()
+    coalescer.after_fork()
+    request_logger.after_fork()
+
+
+def create_asgi_app(database_url=None):
+    if database_url:
+        init_database(database_url)
+    catalog.configure({"CATALOG_SNAPSHOT_PATH": Config.CATALOG_SNAPSHOT_PATH,
+                       "CATALOG_SNAPSHOT_INTERVAL": Config.CATALOG_SNAPSHOT_INTERVAL})
+    request_logger.configure({key: getattr(Config, key) for key in dir(Config) if key.startswith("LOG_")})
+    app = Starlette(routes=routes, lifespan=lifespan,
+                    exception_handlers={404: _http_error, 405: _http_error})
+    app.add_middleware(LoadSheddingMiddleware)
+    # Added last, so it is outermost: shed requests get an id and an access line too
+    app.add_middleware(AccessLogMiddleware)
+    return app
+
+
+app = create_asgi_app()
@@ -0,0 +1,5 @@
+"""
+Benchmark and load-testing suite for the Volunteer Connect API.
+
+See benchmarks/README.md for usage.
+"""
@@ -0,0 +1,160 @@
+"""
+Latency cost of structured logging (logs.py), with a fast and a slow log sink.
+
+    python -m benchmarks.access_log
+    python -m benchmarks.access_log --config gthread:3x4 --sink-kbps 16 --duration 20
+
+For each sink and logging mode, boots `gunicorn -c gunicorn.conf.py` with its
+stdout piped into this process:
+
+    off       LOG_ENABLED=false
+    queue     the default: records are queued, a writer thread per worker
+              formats and writes them
+    inline    LOG_QUEUE_SIZE=0: formatted and written on the request thread
+
+The "fast" sink reads stdout as fast as it can. The "slow" sink reads at
+most --sink-kbps, like a log pipeline that pushes back; once the pipe
+buffer fills, writes to stdout block. `--clients` keep-alive clients then
+send a mix for --duration seconds: GET / (one access line each), GET
+/opportunities/<id> (sampled, LOG_SAMPLE_RATES) and PATCH /payments/<id>
+flipping the status (an access line, an audit line and a payment_audit
+row). It reports latency, throughput, the lines the sink received and the
+lines the workers dropped. Beforehand it times, in-process, what one access
+line costs the request thread: queued, queued onto a full queue (dropped),
+and written inline to an in-memory stream.
+WARNING: the target database is dropped and re-seeded.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import re
+import subprocess
+import threading
+import timeit
+
+from benchmarks.concurrency import drive, seeded_environment, start_server
+from benchmarks.gunicorn_matrix import parse_config
+
+MODES = ("off", "queue", "inline")
+SINKS = ("fast", "slow")
+DEFAULT_CONFIGS = ["gthread:2x4"]
+_DROPPED = re.compile(rb'"dropped":(\d+)')
+
+
+class Sink(threading.Thread):
+    """Reads a server's stdout, at most `bytes_per_second` if given; counts lines and reported drops"""
+
+    def __init__(self, pipe, bytes_per_second=None):
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.bytes_per_second = bytes_per_second
+        self.lines = 0
+        self.dropped = 0
+        self.done = threading.Event()
+
+    def run(self):
+        # Kept cheap: it shares this process with the load generator
+        partial = b""
+        while True:
+            chunk = self.pipe.read1(65536)
+            if not chunk:
+                break
+            data = partial + chunk
+            end = data.rfind(b"\n") + 1
+            complete, partial = data[:end], data[end:]
+            self.lines += complete.count(b"\n")
+            if b'"dropped"' in complete:
+                self.dropped += sum(int(n) for n in _DROPPED.findall(complete))
+            if self.bytes_per_second:
+                self.done.wait(len(chunk) / self.bytes_per_second)
+
+
+def request_thread_us(number, repeat=5):
+    """Microseconds RequestLogger.access() takes on the calling thread, per mode"""
+    from logs import RequestLogger
+
+    class Stalled(io.StringIO):
+        def write(self, text):
+            stalled.wait()
+
+    stalled = threading.Event()
+    results = {}
+    for name, queue_size, stream in (("queued", number * repeat + 1, io.StringIO()),
+                                     ("dropped", 1, Stalled()), ("inline", 0, io.StringIO())):
+        logger = RequestLogger()
+        logger.configure({"LOG_ENABLED": True, "LOG_QUEUE_SIZE": queue_size}, stream)
+        timer = timeit.Timer(lambda: logger.access("GET", "/", "api.home", 200, 1.5, "127.0.0.1"))
+        results[name] = round(min(timer.repeat(repeat=repeat, number=number)) / number * 1e6, 2)
+        stalled.set()
+        logger.stop()
+    return results
+
+
+def mix(counts, rng):
+    status = {}
+
+    def next_request():
+        roll = rng.random()
+        if roll < 0.6:
+            return "GET", "/", None, (200,)
+        if roll < 0.95:
+            return "GET", f"/opportunities/{rng.randint(1, counts['opportunities'])}", None, (200, 404)
+        payment = rng.randint(1, counts["payments"])
+        status[payment] = "completed" if status.get(payment) != "completed" else "pending"
+        return "PATCH", f"/payments/{payment}", {"payment_status": status[payment]}, (200, 404)
+    return next_request
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="kind:workers[xthreads]; default: " + ", ".join(DEFAULT_CONFIGS))
+    parser.add_argument("--mode", action="append", choices=MODES, help="Default: all")
+    parser.add_argument("--sink", action="append", choices=SINKS, help="Default: both")
+    parser.add_argument("--sink-kbps", type=float, default=32, help="Read rate of the slow sink")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--opportunities", type=int, default=2000)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    per_line = request_thread_us(20000)
+    print("request thread per access line: " + ", ".join(f"{name} {us} us" for name, us in per_line.items()))
+
+    env, counts = seeded_environment(args.database_url, args.opportunities)
+    counts["payments"] = args.opportunities // 2
+    results = []
+    print(f"{'config':<12} {'sink':<5} {'mode':<7} {'req/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}"
+          f" {'lines':>7} {'dropped':>8}")
+    for kind, workers, threads in (parse_config(c) for c in args.config or DEFAULT_CONFIGS):
+        for sink_kind in args.sink or SINKS:
+            for mode in args.mode or MODES:
+                server_env = dict(env, GUNICORN_WORKER_CLASS=kind, WEB_CONCURRENCY=str(workers),
+                                  GUNICORN_THREADS=str(threads), GUNICORN_MAX_REQUESTS="0",
+                                  LOG_ENABLED=str(mode != "off").lower(),
+                                  LOG_QUEUE_SIZE="0" if mode == "inline" else "10000")
+                process, port = start_server(["-c", "gunicorn.conf.py"], server_env, stdout=subprocess.PIPE)
+                sink = Sink(process.stdout, args.sink_kbps * 1024 if sink_kind == "slow" else None)
+                sink.start()
+                try:
+                    stats = asyncio.run(drive(port, mix(counts, random.Random(42)), args.clients, args.duration))
+                finally:
+                    process.terminate()
+                    sink.done.set()
+                    process.wait()
+                    sink.join(10)
+                config = f"{kind}:{workers}x{threads}"
+                results.append({"config": config, "sink": sink_kind, "mode": mode, "stats": stats,
+                                "lines": sink.lines, "dropped": sink.dropped})
+                print(f"{config:<12} {sink_kind:<5} {mode:<7} {stats['throughput_rps']:>7} {stats['p50_ms']:>7} "
+                      f"{stats['p99_ms']:>7} {stats['max_ms']:>7} {sink.lines:>7} {sink.dropped:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"request_thread_us": per_line, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Contention benchmark for capacity-limited opportunities.
+
+    python -m benchmarks.capacity --applicants 1000 --capacity 100 --rounds 3
+    python -m benchmarks.capacity --config gthread:3x4 --database-url postgresql://localhost/vc_bench
+
+Boots `gunicorn -c gunicorn.conf.py` per worker class. Each round creates an
+opportunity with `--capacity` places, then sends `--applicants` POST
+/applications for it at once, each from a different user. Afterwards it
+rejects `--rejections` of the pending applications at once, which should
+promote as many from the waitlist. After each phase it checks the counts in
+the database: exactly `capacity` applications hold a place, `filled`
+matches, and everyone else is waitlisted. It reports throughput and latency
+per phase. Requests go out over at most `--connections` connections, as in
+benchmarks/coalescing.py.
+WARNING: the target database is dropped and re-seeded.
+"""
+import argparse
+import asyncio
+import collections
+import importlib.util
+import json
+import time
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.coalescing import TIMEOUT, fetch
+from benchmarks.concurrency import seeded_environment, start_server
+from benchmarks.gunicorn_matrix import parse_config
+from benchmarks.harness import summarize
+
+DEFAULT_CONFIGS = ["gthread:3x4", "gevent:3", "uvicorn:3"]
+
+
+async def concurrently(port, requests, connections):
+    """Send (method, path, body) requests all at once; returns (stats, status counts)"""
+    slots = asyncio.Semaphore(connections)
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(asyncio.wait_for(fetch(port, method, path, body, slots=slots), TIMEOUT)
+          for method, path, body in requests),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started
+    statuses = collections.Counter(
+        type(r).__name__ if isinstance(r, Exception) else r[0] for r in results
+    )
+    latencies = [r[2] for r in results if not isinstance(r, Exception) and r[0] < 400]
+    return summarize(latencies, len(results) - len(latencies), elapsed), dict(statuses)
+
+
+def places(engine, opportunity_id):
+    """(applications by status, the opportunity's filled count)"""
+    with engine.connect() as conn:
+        statuses = dict(conn.execute(text(
+            "SELECT status, count(*) FROM applications WHERE opportunity_id = :id GROUP BY status"
+        ), {"id": opportunity_id}).all())
+        filled = conn.scalar(text("SELECT filled FROM opportunities WHERE id = :id"), {"id": opportunity_id})
+    return statuses, filled
+
+
+def pending_ids(engine, opportunity_id, limit):
+    with engine.connect() as conn:
+        return list(conn.scalars(text(
+            "SELECT id FROM applications WHERE opportunity_id = :id AND status = 'pending' ORDER BY id LIMIT :n"
+        ), {"id": opportunity_id, "n": limit}))
+
+
+async def round_trip(port, engine, round_no, args):
+    status, _, _ = await fetch(port, "POST", "/opportunities", {
+        "title": f"Popular shift {round_no}", "organization_id": 1, "capacity": args.capacity,
+    })
+    assert status == 201, status
+    with engine.connect() as conn:
+        opportunity_id = conn.scalar(text("SELECT max(id) FROM opportunities"))
+
+    waitlisted = args.applicants - args.capacity
+    apply_stats, apply_statuses = await concurrently(port, [
+        ("POST", "/applications", {"user_id": user_id, "opportunity_id": opportunity_id})
+        for user_id in range(1, args.applicants + 1)
+    ], args.connections)
+    statuses, filled = places(engine, opportunity_id)
+    apply_stats.update(statuses=apply_statuses, counts=statuses, filled=filled,
+                       correct=statuses == {"pending": args.capacity, "waitlisted": waitlisted}
+                       and filled == args.capacity)
+
+    rejections = pending_ids(engine, opportunity_id, args.rejections)
+    reject_stats, reject_statuses = await concurrently(port, [
+        ("PATCH", f"/applications/{application_id}", {"status": "rejected"}) for application_id in rejections
+    ], args.connections)
+    statuses, filled = places(engine, opportunity_id)
+    promoted = min(len(rejections), waitlisted)
+    reject_stats.update(statuses=reject_statuses, counts=statuses, filled=filled, correct=statuses == {
+        key: value for key, value in {
+            "pending": args.capacity, "rejected": len(rejections), "waitlisted": waitlisted - promoted,
+        }.items() if value
+    } and filled == args.capacity)
+    return {"apply": apply_stats, "reject": reject_stats}
+
+
+async def run_rounds(port, engine, args):
+    return [await round_trip(port, engine, i, args) for i in range(args.rounds)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="kind:workers[xthreads]; default: " + ", ".join(DEFAULT_CONFIGS))
+    parser.add_argument("--applicants", type=int, default=1000)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--rejections", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--connections", type=int, default=150, help="Open at once, as by a proxy's pool")
+    parser.add_argument("--database-url")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    # seed.py makes half as many users as opportunities; every applicant is a different user
+    env, _ = seeded_environment(args.database_url, 2 * args.applicants)
+    engine = create_engine(env["DATABASE_URL"])
+    results, correct = [], True
+    for kind, workers, threads in (parse_config(c) for c in args.config or DEFAULT_CONFIGS):
+        if kind == "gevent" and importlib.util.find_spec("gevent") is None:
+            print(f"{kind}: skipped, gevent is not installed")
+            continue
+        process, port = start_server(["-c", "gunicorn.conf.py"], dict(
+            env, GUNICORN_WORKER_CLASS=kind, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+            GUNICORN_MAX_REQUESTS="0",
+        ))
+        try:
+            rounds = asyncio.run(run_rounds(port, engine, args))
+        finally:
+            process.terminate()
+            process.wait()
+        config = f"{kind}:{workers}x{threads}"
+        for i, phases in enumerate(rounds):
+            for phase, stats in phases.items():
+                correct = correct and stats["correct"]
+                print(f"{config:<12} round {i} {phase:<6} {stats['throughput_rps']:>7} req/s  "
+                      f"p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms  {stats['statuses']}  "
+                      f"filled {stats['filled']}  {stats['counts']}  {'ok' if stats['correct'] else 'WRONG'}")
+        results.append({"config": config, "rounds": rounds})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"applicants": args.applicants, "capacity": args.capacity, "results": results}, f, indent=2)
+    if not correct:
+        raise SystemExit("Overbooked, lost a place, or promoted the wrong number of applications")
+
+
+if __name__ == "__main__":
+    main()
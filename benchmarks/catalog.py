@@ -0,0 +1,133 @@
+"""
+Catalog snapshot benchmark: worker memory and read latency as the catalog grows.
+
+    python -m benchmarks.catalog --sizes 2000 20000 100000
+    python -m benchmarks.catalog --config gthread:3x4 --mode live --mode snapshot
+
+For each catalog size and mode, boots `gunicorn -c gunicorn.conf.py`:
+
+    live       every read queries the database (coalesced, the default)
+    snapshot   CATALOG_SNAPSHOT_PATH set: the master runs the builder and
+               the workers serve reads from the mapped file (catalog.py)
+
+Then it sends `--listings` GET /opportunities and `--lookups` GET
+/opportunities/<id> for random ids, all at once over `--connections`
+connections. It reports listing latency, lookup throughput and, after
+the load, each worker's memory from /proc/<pid>/smaps_rollup. "dirty" is
+Private_Dirty: memory the worker wrote and shares with no one, its own heap.
+"pss" adds its share of pages it shares, such as the snapshot file or the
+pages it inherited from the preloading master. Linux only.
+WARNING: the target database is dropped and re-seeded.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.capacity import concurrently
+from benchmarks.coalescing import fetch
+from benchmarks.concurrency import seeded_environment, start_server
+from benchmarks.gunicorn_matrix import parse_config
+
+MODES = ("live", "snapshot")
+DEFAULT_CONFIGS = ["gthread:3x4"]
+
+
+def worker_memory(master_pid):
+    """{pid: {"rss_mb", "pss_mb", "dirty_mb"}} for each worker of a gunicorn master"""
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        children = [int(pid) for pid in f.read().split()]
+    memory = {}
+    for pid in children:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"build-catalog" in f.read():
+                    continue
+            fields = {}
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3 and parts[2] == "kB":
+                        fields[parts[0].rstrip(":")] = int(parts[1])
+        except OSError:
+            continue
+        memory[pid] = {
+            "rss_mb": round(fields["Rss"] / 1024, 1),
+            "pss_mb": round(fields["Pss"] / 1024, 1),
+            "dirty_mb": round(fields["Private_Dirty"] / 1024, 1),
+        }
+    return memory
+
+
+async def wait_for_snapshot(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, how, _ = await fetch(port, "GET", "/organizations/1")
+        if status == 200 and how == "snapshot":
+            return
+        await asyncio.sleep(0.5)
+    raise RuntimeError("the catalog snapshot was never served")
+
+
+async def load(port, mode, size, args):
+    if mode == "snapshot":
+        await wait_for_snapshot(port)
+    rng = random.Random(42)
+    listings, _ = await concurrently(port, [("GET", "/opportunities", None)] * args.listings, args.connections)
+    lookups, statuses = await concurrently(port, [
+        ("GET", f"/opportunities/{rng.randint(1, size)}", None) for _ in range(args.lookups)
+    ], args.connections)
+    return listings, lookups, statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="kind:workers[xthreads]; default: " + ", ".join(DEFAULT_CONFIGS))
+    parser.add_argument("--mode", action="append", choices=MODES, help="Default: both")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 100000], help="Opportunities")
+    parser.add_argument("--listings", type=int, default=30, help="GET /opportunities per run")
+    parser.add_argument("--lookups", type=int, default=3000, help="GET /opportunities/<id> per run")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'config':<12} {'mode':<9} {'size':>7} {'list p50':>9} {'list p99':>9} {'id req/s':>9}"
+          f" {'rss MB':>7} {'pss MB':>7} {'dirty MB':>9}  (per worker)")
+    for size in args.sizes:
+        env, _ = seeded_environment(args.database_url, size)
+        for kind, workers, threads in (parse_config(c) for c in args.config or DEFAULT_CONFIGS):
+            for mode in args.mode or MODES:
+                server_env = dict(env, GUNICORN_WORKER_CLASS=kind, WEB_CONCURRENCY=str(workers),
+                                  GUNICORN_THREADS=str(threads), GUNICORN_MAX_REQUESTS="0")
+                if mode == "snapshot":
+                    directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+                    server_env["CATALOG_SNAPSHOT_PATH"] = os.path.join(
+                        tempfile.mkdtemp(prefix="vc_catalog_", dir=directory), "catalog.snap")
+                process, port = start_server(["-c", "gunicorn.conf.py"], server_env)
+                try:
+                    listings, lookups, statuses = asyncio.run(load(port, mode, size, args))
+                    memory = worker_memory(process.pid)
+                finally:
+                    process.terminate()
+                    process.wait()
+                average = {key: round(sum(m[key] for m in memory.values()) / len(memory), 1)
+                           for key in ("rss_mb", "pss_mb", "dirty_mb")}
+                config = f"{kind}:{workers}x{threads}"
+                results.append({"config": config, "mode": mode, "opportunities": size, "listings": listings,
+                                "lookups": lookups, "lookup_statuses": statuses, "worker_memory": average})
+                print(f"{config:<12} {mode:<9} {size:>7} {listings['p50_ms']:>9} {listings['p99_ms']:>9} "
+                      f"{lookups['throughput_rps']:>9} {average['rss_mb']:>7} "
+                      f"{average['pss_mb']:>7} {average['dirty_mb']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Request coalescing benchmark: bursts of identical GET /opportunities.
+
+    python -m benchmarks.coalescing --burst 500 --rounds 5
+    python -m benchmarks.coalescing --config gthread:3x4 --config gevent:3 --mode off --mode shared
+
+Boots `gunicorn -c gunicorn.conf.py` per worker class and coalescing mode:
+
+    off      COALESCE_ENABLED=false
+    worker   single flight inside each worker (the default)
+    shared   plus a response store shared by the workers (COALESCE_STORAGE_URL)
+
+Each round creates an opportunity, so the catalog has changed, then starts
+`--burst` identical GETs at once. Reports
+latency, wall time per burst, and how the responses were produced (the
+X-Coalesced header): "computed" counts the queries that actually ran.
+The uvicorn worker has no shared store, so it only runs off and worker.
+The requests go out over at most `--connections` (150) connections at a
+time, the way a proxy's upstream pool would send them: a gthread worker
+that accepts worker_connections (200) sockets before reading any of them
+stops serving.
+WARNING: the target database is dropped and re-seeded.
+"""
+import argparse
+import asyncio
+import collections
+import importlib.util
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.concurrency import seeded_environment, start_server
+from benchmarks.gunicorn_matrix import parse_config
+from benchmarks.harness import summarize
+
+MODES = ("off", "worker", "shared")
+DEFAULT_CONFIGS = ["gthread:3x4", "gevent:3", "uvicorn:3"]
+TIMEOUT = 60
+
+
+async def fetch(port, method, path, body=None, slots=None):
+    """One request on its own connection; returns (status, X-Coalesced header, seconds)"""
+    started = time.perf_counter()
+    if slots is not None:
+        async with slots:
+            return (*(await fetch(port, method, path, body))[:2], time.perf_counter() - started)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Connection: close\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, how = 0, "none"
+    while True:
+        line = (await reader.readline()).strip().lower()
+        if not line:
+            break
+        if line.startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+        elif line.startswith(b"x-coalesced:"):
+            how = line.split(b":")[1].strip().decode()
+    await reader.readexactly(length)
+    writer.close()
+    return status, how, time.perf_counter() - started
+
+
+async def burst(port, size, connections):
+    """`size` identical GETs, all started at once over at most `connections` connections"""
+    slots = asyncio.Semaphore(connections)
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(asyncio.wait_for(fetch(port, "GET", "/opportunities", slots=slots), TIMEOUT) for _ in range(size)),
+        return_exceptions=True,
+    )
+    return results, time.perf_counter() - started
+
+
+async def rounds(port, size, connections, count):
+    latencies, walls, errors, produced = [], [], 0, collections.Counter()
+    for i in range(count):
+        status, _, _ = await fetch(port, "POST", "/opportunities",
+                                   {"title": f"Burst {i}", "organization_id": 1})
+        assert status == 201, status
+        results, wall = await burst(port, size, connections)
+        walls.append(wall)
+        for result in results:
+            if isinstance(result, Exception) or result[0] != 200:
+                errors += 1
+                continue
+            produced[result[1]] += 1
+            latencies.append(result[2])
+    stats = summarize(latencies, errors, sum(walls))
+    stats["burst_wall_ms"] = round(1000 * sum(walls) / len(walls), 1)
+    stats["produced"] = dict(produced)
+    stats["queries_per_burst"] = round(produced["computed"] / count, 1) if produced["none"] == 0 else size
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="kind:workers[xthreads]; default: " + ", ".join(DEFAULT_CONFIGS))
+    parser.add_argument("--mode", action="append", choices=MODES, help="Default: all")
+    parser.add_argument("--burst", type=int, default=500, help="Identical requests per burst")
+    parser.add_argument("--connections", type=int, default=150, help="Open at once, as by a proxy's pool")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--opportunities", type=int, default=2000)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    env, _ = seeded_environment(args.database_url, args.opportunities)
+    results = []
+    for kind, workers, threads in (parse_config(c) for c in args.config or DEFAULT_CONFIGS):
+        if kind == "gevent" and importlib.util.find_spec("gevent") is None:
+            print(f"{kind}: skipped, gevent is not installed")
+            continue
+        for mode in args.mode or MODES:
+            if mode == "shared" and kind == "uvicorn":
+                continue
+            server_env = dict(env, GUNICORN_WORKER_CLASS=kind, WEB_CONCURRENCY=str(workers),
+                              GUNICORN_THREADS=str(threads), GUNICORN_MAX_REQUESTS="0",
+                              COALESCE_ENABLED=str(mode != "off").lower())
+            if mode == "shared":
+                store = os.path.join(tempfile.mkdtemp(prefix="vc_coalesce_"), "responses.db")
+                server_env["COALESCE_STORAGE_URL"] = "sqlite:///" + store
+            process, port = start_server(["-c", "gunicorn.conf.py"], server_env)
+            try:
+                stats = asyncio.run(rounds(port, args.burst, args.connections, args.rounds))
+            finally:
+                process.terminate()
+                process.wait()
+            stats.update(config=f"{kind}:{workers}x{threads}", mode=mode)
+            results.append(stats)
+            print(f"{stats['config']:<12} {mode:<7} queries/burst {stats['queries_per_burst']:>6}  "
+                  f"burst {stats['burst_wall_ms']} ms  p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms  "
+                  f"errors {stats['errors']}  {stats['produced']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"burst": args.burst, "rounds": args.rounds, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
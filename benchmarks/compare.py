@@ -0,0 +1,67 @@
+"""
+Diff two benchmark result files.
+
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+
+Exits non-zero when any scenario's p95 latency grew or its throughput fell by
+more than --threshold percent, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100.0
+
+
+def compare(before, after, threshold):
+    regressions = []
+    rows = []
+    for database, result in after["databases"].items():
+        baseline = before["databases"].get(database, {}).get("scenarios", {})
+        for scenario, stats in result["scenarios"].items():
+            old = baseline.get(scenario)
+            if old is None:
+                continue
+            deltas = {metric: change(old[metric], stats[metric]) for metric in METRICS}
+            rows.append((database, scenario, old, stats, deltas))
+            slower = (deltas["p95_ms"] or 0) > threshold
+            fewer = (deltas["throughput_rps"] or 0) < -threshold
+            if slower or fewer:
+                regressions.append(f"{database}/{scenario}")
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    rows, regressions = compare(before, after, args.threshold)
+    print(f"{before['environment']['commit']} -> {after['environment']['commit']}")
+    for database, scenario, old, new, deltas in rows:
+        print(f"{database}/{scenario}")
+        for metric in METRICS:
+            delta = deltas[metric]
+            shown = "n/a" if delta is None else f"{delta:+.1f}%"
+            print(f"  {metric:<15} {old[metric]!s:>10} -> {new[metric]!s:>10}  {shown}")
+
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Side-by-side concurrency benchmark: gunicorn sync workers vs the ASGI app.
+
+    python -m benchmarks.concurrency --clients 500 --duration 20
+    python -m benchmarks.concurrency --database-url postgresql://localhost/vc_bench
+
+Seeds one database, boots each server against it on a local port with the
+same number of worker processes, then holds `--clients` concurrent
+keep-alive connections open for `--duration` seconds, per scenario. The
+client is plain asyncio, so 500 connections cost one thread. WARNING: the
+target database is dropped and re-seeded.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+
+SERVERS = {
+    "wsgi-sync": ["app:app", "--preload", "--worker-class", "sync"],
+    "asgi-uvicorn": ["asgi:app", "--worker-class", "uvicorn.workers.UvicornWorker"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, env, stdout=None):
+    """Run gunicorn with `args` on a free local port; returns (process, port) once it accepts"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", *args, "--bind", f"127.0.0.1:{port}",
+         "--backlog", "4096", "--timeout", "120", "--log-level", "warning"],
+        env=env, stdout=stdout,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"gunicorn {' '.join(args)} did not start")
+
+
+async def request(conn, port, method, path, body):
+    """One HTTP/1.1 request on a (reader, writer) pair; reconnects when the server closes"""
+    if conn[0] is None:
+        conn[0], conn[1] = await asyncio.open_connection("127.0.0.1", port)
+    reader, writer = conn
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, close = 0, False
+    while True:
+        line = (await reader.readline()).strip().lower()
+        if not line:
+            break
+        if line.startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+        elif line == b"connection: close":
+            close = True
+    await reader.readexactly(length)
+    if close:
+        writer.close()
+        conn[0] = conn[1] = None
+    return status
+
+
+async def drive(port, next_request, clients, duration):
+    latencies, errors = [], collections.Counter()
+    stop_at = time.perf_counter() + duration
+
+    async def client():
+        conn = [None, None]
+        while time.perf_counter() < stop_at:
+            method, path, body, expected = next_request()
+            started = time.perf_counter()
+            try:
+                outcome = await asyncio.wait_for(request(conn, port, method, path, body), 30)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+                outcome = type(e).__name__
+                if conn[1] is not None:
+                    conn[1].close()
+                conn[0] = conn[1] = None
+            if outcome in expected:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors[str(outcome)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    stats = summarize(latencies, sum(errors.values()), time.perf_counter() - started)
+    stats["error_kinds"] = dict(errors)
+    return stats
+
+
+def scenarios(counts, rng):
+    return {
+        # DB-bound: list a page-sized catalog
+        "browse": lambda: ("GET", "/organizations", None, (200,)),
+        # CPU-bound: password hashing
+        "login": lambda: ("POST", "/login", {
+            "email": f"user{rng.randint(1, counts['users'])}@example.com", "password": "password123",
+        }, (200,)),
+        # Write-bound
+        "apply": lambda: ("POST", "/applications", {
+            "user_id": rng.randint(1, counts["users"]),
+            "opportunity_id": rng.randint(1, counts["opportunities"]),
+        }, (201,)),
+    }
+
+
+def seeded_environment(database_url, opportunities):
+    """Seed the benchmark database; returns (server environment, row counts)"""
+    url = database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="vc_conc_"), "bench.db")
+    env = dict(os.environ, DATABASE_URL=url, RATELIMIT_ENABLED="false",
+               SHED_MAX_IN_FLIGHT="0", SHED_MAX_QUEUE_MS="0")
+    subprocess.check_call([sys.executable, "seed.py", "--opportunities", str(opportunities)], env=env)
+    return env, {"users": max(1, opportunities // 2), "opportunities": opportunities}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per scenario")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes per server")
+    parser.add_argument("--opportunities", type=int, default=5000)
+    parser.add_argument("--database-url")
+    parser.add_argument("--server", action="append", choices=sorted(SERVERS), help="Default: both")
+    parser.add_argument("--scenario", action="append", help="Default: all")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    env, counts = seeded_environment(args.database_url, args.opportunities)
+
+    results = {}
+    for name in args.server or sorted(SERVERS, reverse=True):
+        results[name] = {}
+        for scenario, next_request in scenarios(counts, random.Random(42)).items():
+            if args.scenario and scenario not in args.scenario:
+                continue
+            # A fresh server per scenario, so a backlog left by one doesn't bleed into the next
+            process, port = start_server([*SERVERS[name], "--workers", str(args.workers)], env)
+            try:
+                stats = asyncio.run(drive(port, next_request, args.clients, args.duration))
+            finally:
+                process.terminate()
+                process.wait()
+            results[name][scenario] = stats
+            print(f"{name:<13} {scenario:<7} {stats['throughput_rps']:>8} req/s  "
+                  f"p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms  "
+                  f"errors {stats['errors']} {stats['error_kinds'] or ''}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"clients": args.clients, "workers": args.workers, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark matrix for gunicorn.conf.py: worker class x workers x threads.
+
+    python -m benchmarks.gunicorn_matrix --clients 100 --duration 20
+    python -m benchmarks.gunicorn_matrix --config gthread:2x4 --config gthread:2x8 --config gevent:2
+
+Every configuration boots `gunicorn -c gunicorn.conf.py` (so the hooks and
+settings under test are the real ones) with WEB_CONCURRENCY /
+GUNICORN_THREADS / GUNICORN_WORKER_CLASS overridden, then serves the same
+mixed workload: mostly browsing, some applications, a few logins. Reports
+throughput, latency, errors and the server's total RSS at the end of the run.
+WARNING: the target database is dropped and re-seeded.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import random
+
+from benchmarks.concurrency import drive, scenarios, seeded_environment, start_server
+
+DEFAULT_MATRIX = ["sync:3", "gthread:2x4", "gthread:2x8", "gthread:4x4", "gevent:2", "uvicorn:2"]
+MIX = {"browse": 70, "apply": 20, "login": 10}
+
+
+def parse_config(text):
+    """"gthread:2x4" -> ("gthread", 2, 4); threads default to 1"""
+    kind, _, size = text.partition(":")
+    workers, _, threads = size.partition("x")
+    return kind, int(workers or 1), int(threads or 1)
+
+
+def mixed(counts, rng):
+    by_name = scenarios(counts, rng)
+    names, weights = zip(*MIX.items())
+    return lambda: by_name[rng.choices(names, weights)[0]]()
+
+
+def tree_rss_mb(pid):
+    """Resident memory of a process and its children, from /proc (Linux only)"""
+    total, pending = 0, [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+    except (OSError, StopIteration):
+        return None
+    return round(total / 1024, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="kind:workers[xthreads]; default: a standard matrix")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per configuration")
+    parser.add_argument("--opportunities", type=int, default=5000)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    configs = [parse_config(c) for c in args.config or DEFAULT_MATRIX]
+    env, counts = seeded_environment(args.database_url, args.opportunities)
+
+    results = []
+    for kind, workers, threads in configs:
+        if kind == "gevent" and importlib.util.find_spec("gevent") is None:
+            print(f"{kind}: skipped, gevent is not installed")
+            continue
+        process, port = start_server(["-c", "gunicorn.conf.py"], dict(
+            env, GUNICORN_WORKER_CLASS=kind, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+        ))
+        try:
+            stats = asyncio.run(drive(port, mixed(counts, random.Random(42)), args.clients, args.duration))
+            stats["rss_mb"] = tree_rss_mb(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+        label = f"{kind}:{workers}x{threads}"
+        results.append(dict(stats, config=label))
+        print(f"{label:<14} {stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']} ms  "
+              f"p99 {stats['p99_ms']} ms  errors {stats['errors']}  rss {stats['rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"clients": args.clients, "mix": MIX, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Load driver shared by the benchmark scripts
+
+Runs a scenario's requests from a pool of threads, either in-process through
+Flask's test client or against a live server over HTTP, and summarizes the
+latencies as throughput and p50/p95/p99.
+"""
+import http.client
+import json
+import math
+import os
+import platform
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else None,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class TestClientTransport:
+    """Drive the WSGI app in-process: measures app + database, not the network"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, body=None):
+            return client.open(path, method=method, json=body).status_code
+
+        return send
+
+
+class HTTPTransport:
+    """Drive a running server (gunicorn, uvicorn, ...) over keep-alive HTTP"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+
+    def session(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+        def send(method, path, body=None):
+            headers = {}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+
+        return send
+
+
+def run_load(transport, next_request, total_requests, concurrency):
+    """
+    Fire `total_requests` requests from `concurrency` threads.
+
+    `next_request(i)` returns (method, path, json_body, expected_statuses) for
+    the i-th request. Any other status or an exception counts as an error.
+    """
+    latencies = []
+    errors = [0]
+    counter = iter(range(total_requests))
+    lock = threading.Lock()
+
+    def worker():
+        send = transport.session()
+        local_latencies, local_errors = [], 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            method, path, body, expected = next_request(i)
+            started = time.perf_counter()
+            try:
+                ok = send(method, path, body) in expected
+            except Exception:
+                ok = False
+            if ok:
+                local_latencies.append(time.perf_counter() - started)
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def environment_info(database_url):
+    """Metadata stored next to every result so runs can be compared fairly"""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "database": database_url.split("://", 1)[0],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
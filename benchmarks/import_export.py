@@ -0,0 +1,100 @@
+"""
+Throughput of the bulk opportunity import and export.
+
+    python -m benchmarks.import_export --rows 1000000
+    python -m benchmarks.import_export --rows 1000000 --database-url postgresql://localhost/vc_bench
+
+Generates a catalog file, imports it through bulk.import_records() (batched
+INSERT, or COPY on PostgreSQL), then exports it back through
+bulk.export_rows(). Peak RSS is reported per phase to show that memory does
+not grow with the row count. WARNING: the target database is dropped and
+recreated.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def write_catalog(path, rows, fmt):
+    with open(path, "w", newline="") as f:
+        if fmt == "csv":
+            f.write("title,description,location,duration\n")
+            for i in range(rows):
+                f.write(f"Opportunity {i},Generated row {i},City {i % 100},{i % 8 + 1}\n")
+        else:
+            for i in range(rows):
+                f.write(json.dumps({"title": f"Opportunity {i}", "description": f"Generated row {i}",
+                                    "location": f"City {i % 100}", "duration": i % 8 + 1}) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--format", dest="fmt", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--database-url", help="Default: a temporary SQLite file")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="vc_bulk_")
+    url = args.database_url or "sqlite:///" + os.path.join(workdir, "bulk.db")
+
+    from app import create_app
+    from bulk import export_rows, import_records
+    from extensions import db
+    from models import Organization, User
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+    catalog = os.path.join(workdir, f"catalog.{args.fmt}")
+    write_catalog(catalog, args.rows, args.fmt)
+
+    results = {"rows": args.rows, "format": args.fmt, "database": url.split("://", 1)[0]}
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        owner = User(name="Owner", email="owner@example.com", role="organization", password_hash="x")
+        db.session.add(owner)
+        db.session.flush()
+        org = Organization(name="Bulk Org", owner_id=owner.id)
+        db.session.add(org)
+        db.session.commit()
+
+        started = time.perf_counter()
+        with open(catalog, newline="") as stream:
+            summary = import_records("opportunities", stream, args.fmt, organization_id=org.id)
+        elapsed = time.perf_counter() - started
+        results["import"] = {
+            "seconds": round(elapsed, 2),
+            "rows_per_s": round(summary["imported"] / elapsed),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+        started = time.perf_counter()
+        exported_bytes = 0
+        for chunk in export_rows("opportunities", org.id, args.fmt):
+            exported_bytes += len(chunk)
+        elapsed = time.perf_counter() - started
+        results["export"] = {
+            "seconds": round(elapsed, 2),
+            "rows_per_s": round(args.rows / elapsed),
+            "megabytes": round(exported_bytes / 1e6, 1),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
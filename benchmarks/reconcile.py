@@ -0,0 +1,141 @@
+"""
+Time `flask reconcile-payments` against a generated ledger and statement.
+
+    python -m benchmarks.reconcile --payments 10000000
+    python -m benchmarks.reconcile --payments 10000000 --database-url postgresql://localhost/vc_bench
+
+Loads `--payments` completed payments with batched inserts, writes a
+statement CSV for them in shuffled order with a few planted discrepancies
+(changed amounts, dropped lines, extra lines), then times each phase of
+the reconciliation and checks that exactly the planted problems come back.
+WARNING: the target database is dropped and recreated.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+PLANTED = 10
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def load_ledger(cents, batch=100000):
+    from decimal import Decimal
+
+    from sqlalchemy import insert
+
+    from extensions import db
+    from models import Opportunity, Organization, Payment, User
+
+    owner = User(name="Owner", email="owner@example.com", role="organization", password_hash="x")
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name="Ledger Org", owner_id=owner.id)
+    db.session.add(org)
+    db.session.flush()
+    opp = Opportunity(title="Ledger", organization_id=org.id)
+    db.session.add(opp)
+    db.session.commit()
+
+    for start in range(0, len(cents), batch):
+        db.session.execute(insert(Payment), [
+            {"id": start + i + 1, "user_id": owner.id, "opportunity_id": opp.id,
+             "amount": Decimal(int(c)).scaleb(-2), "payment_status": "completed"}
+            for i, c in enumerate(cents[start:start + batch])
+        ])
+    db.session.commit()
+
+
+def write_statement(path, np, cents, rng):
+    """Every payment in shuffled order, with PLANTED of each kind of discrepancy"""
+    ids = np.arange(1, len(cents) + 1, dtype=np.int64)
+    statement_cents = cents.copy()
+    changed = rng.choice(ids, PLANTED, replace=False)
+    statement_cents[changed - 1] += 1
+    dropped = rng.choice(np.setdiff1d(ids, changed), PLANTED, replace=False)
+    keep = np.ones(len(ids), dtype=bool)
+    keep[dropped - 1] = False
+    extra = np.arange(len(ids) + 1, len(ids) + 1 + PLANTED, dtype=np.int64)
+
+    rows_ids = np.concatenate([ids[keep], extra])
+    rows_cents = np.concatenate([statement_cents[keep], np.full(PLANTED, 500)])
+    order = rng.permutation(len(rows_ids))
+    with open(path, "w") as f:
+        f.write("payment_id,amount\n")
+        np.savetxt(f, np.column_stack([rows_ids[order], rows_cents[order] / 100]),
+                   fmt=["%d", "%.2f"], delimiter=",")
+    return {"mismatched": sorted(changed.tolist()), "missing_from_statement": sorted(dropped.tolist()),
+            "missing_from_ledger": extra.tolist()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=1000000)
+    parser.add_argument("--database-url", help="Default: a temporary SQLite file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    import numpy as np
+
+    from app import create_app
+    from extensions import db
+    from reconcile import ledger_chunks, load_statement, reconcile
+
+    workdir = tempfile.mkdtemp(prefix="vc_reconcile_")
+    url = args.database_url or "sqlite:///" + os.path.join(workdir, "ledger.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+    rng = np.random.default_rng(args.seed)
+    cents = rng.integers(100, 50000, args.payments, dtype=np.int64)
+    statement = os.path.join(workdir, "statement.csv")
+
+    results = {"payments": args.payments, "database": url.split("://", 1)[0]}
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        load_ledger(cents)
+        results["load_ledger_seconds"] = round(time.perf_counter() - started, 1)
+        planted = write_statement(statement, np, cents, rng)
+
+        started = time.perf_counter()
+        ids, statement_cents = load_statement(statement, args.chunk_size)
+        results["statement_seconds"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        chunks = list(ledger_chunks(chunk_size=args.chunk_size))
+        results["ledger_seconds"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        result = reconcile(ids, statement_cents, iter(chunks))
+        results["match_seconds"] = round(time.perf_counter() - started, 2)
+
+    results["total_seconds"] = round(
+        results["statement_seconds"] + results["ledger_seconds"] + results["match_seconds"], 2
+    )
+    results["peak_rss_mb"] = peak_rss_mb()
+    found = {
+        "mismatched": sorted(result["mismatched"][:, 0].tolist()),
+        "missing_from_statement": sorted(result["missing_from_statement"].tolist()),
+        "missing_from_ledger": sorted(result["missing_from_ledger"].tolist()),
+    }
+    results["found_planted"] = found == planted
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if found != planted:
+        sys.exit("Reconciliation missed or invented discrepancies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Run the API benchmark scenarios and store the results as JSON.
+
+    python -m benchmarks.run                                  # SQLite, default scale
+    python -m benchmarks.run --opportunities 1000000 \
+        --database-url sqlite:////tmp/vc_bench.db \
+        --database-url postgresql://localhost/vc_bench        # SQLite vs Postgres
+
+Every database is benchmarked in its own subprocess because the app reads
+DATABASE_URL once at import time. WARNING: the target databases are dropped
+and re-seeded unless --skip-seed is given.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.harness import HTTPTransport, TestClientTransport, environment_info, run_load
+from benchmarks.scenarios import SCENARIOS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", action="append", dest="database_urls",
+                        help="Database to benchmark; repeat to compare several (default: temporary SQLite file)")
+    parser.add_argument("--opportunities", type=int, default=10000,
+                        help="Scale of the generated dataset (other tables scale with it)")
+    parser.add_argument("--scenario", action="append", dest="scenarios", choices=sorted(SCENARIOS),
+                        help="Scenario to run; repeat for several (default: all)")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--url", help="Drive a running server at this base URL instead of the in-process app")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in the database")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and traffic")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_worker(args):
+    """Benchmark the single database named by DATABASE_URL; print results as JSON"""
+    # Measure the handlers themselves, not the limiter, the shedder or the
+    # access log (which would also land on stdout, ahead of the JSON result)
+    os.environ["RATELIMIT_ENABLED"] = "false"
+    os.environ["LOG_ENABLED"] = "false"
+    os.environ["SHED_MAX_IN_FLIGHT"] = "0"
+    os.environ["SHED_MAX_QUEUE_MS"] = "0"
+
+    import seed
+    from app import app
+    from extensions import db
+    from models import Opportunity, User
+
+    if args.skip_seed:
+        with app.app_context():
+            counts = {"users": User.query.count(), "opportunities": Opportunity.query.count()}
+    else:
+        # stdout carries the JSON result back to the parent; keep progress off it
+        with contextlib.redirect_stdout(sys.stderr):
+            counts = seed.seed_bulk(opportunities=args.opportunities, seed=args.seed)
+    with app.app_context():
+        db.engine.dispose()
+
+    transport = HTTPTransport(args.url) if args.url else TestClientTransport(app)
+    results = {}
+    for name in args.scenarios or sorted(SCENARIOS):
+        next_request = SCENARIOS[name](counts, random.Random(args.seed))
+        results[name] = run_load(transport, next_request, args.requests, args.concurrency)
+        print(f"  {name:<18} {_format(results[name])}", file=sys.stderr)
+    json.dump({"dataset": counts, "scenarios": results}, sys.stdout)
+
+
+def _format(stats):
+    return (f"{stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']} ms  "
+            f"p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms  errors {stats['errors']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        return run_worker(args)
+
+    database_urls = args.database_urls or [
+        "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="vc_bench_"), "bench.db")
+    ]
+    worker_argv = list(argv if argv is not None else sys.argv[1:])
+    env_info = environment_info(database_urls[0])
+    report = {"environment": env_info, "config": vars(args), "databases": {}}
+    report["config"].pop("worker")
+
+    for url in database_urls:
+        print(f"Benchmarking {url.split('@')[-1]}", file=sys.stderr)
+        output = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.run", "--worker", *worker_argv],
+            env=dict(os.environ, DATABASE_URL=url),
+        )
+        report["databases"][url.split("://", 1)[0]] = json.loads(output)
+
+    path = args.output or os.path.join(RESULTS_DIR, f"{env_info['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
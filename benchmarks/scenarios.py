@@ -0,0 +1,66 @@
+"""
+Traffic scenarios for the load driver
+
+Each scenario is a factory taking the seeded row counts and a random
+generator, and returning `next_request(i)` for harness.run_load().
+"""
+
+
+def browsing(counts, rng):
+    """Read-heavy browsing: catalog listings dominate, with some payment history"""
+    paths = ["/opportunities"] * 6 + ["/organizations"] * 3 + ["/payments"]
+
+    def next_request(i):
+        return "GET", rng.choice(paths), None, (200,)
+
+    return next_request
+
+
+def login_burst(counts, rng):
+    """Many users logging in at once; every seeded user has password123"""
+    users = counts["users"]
+
+    def next_request(i):
+        body = {"email": f"user{rng.randint(1, users)}@example.com", "password": "password123"}
+        return "POST", "/login", body, (200,)
+
+    return next_request
+
+
+def application_spike(counts, rng):
+    """A burst of volunteers applying, concentrated on a few popular opportunities"""
+    users, opportunities = counts["users"], counts["opportunities"]
+    popular = [rng.randint(1, opportunities) for _ in range(5)]
+
+    def next_request(i):
+        body = {
+            "user_id": rng.randint(1, users),
+            "opportunity_id": rng.choice(popular) if rng.random() < 0.8 else rng.randint(1, opportunities),
+            "motivation_message": "Count me in!",
+        }
+        return "POST", "/applications", body, (201,)
+
+    return next_request
+
+
+def payment_writes(counts, rng):
+    """Steady payment inserts"""
+    users, opportunities = counts["users"], counts["opportunities"]
+
+    def next_request(i):
+        body = {
+            "user_id": rng.randint(1, users),
+            "opportunity_id": rng.randint(1, opportunities),
+            "amount": rng.randint(100, 50000) / 100,
+        }
+        return "POST", "/payments", body, (201,)
+
+    return next_request
+
+
+SCENARIOS = {
+    "browsing": browsing,
+    "login_burst": login_burst,
+    "application_spike": application_spike,
+    "payment_writes": payment_writes,
+}
@@ -0,0 +1,110 @@
+"""
+Measure cold-start time: fresh interpreter -> app built -> first response.
+
+    python -m benchmarks.startup                      # current tree
+    python -m benchmarks.startup --ref 1671228        # compare against a commit
+
+Each measurement is a new `python` process, so nothing is cached in memory.
+The `-X importtime` breakdown shows which packages dominate the import phase.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+# Timed inside the child: import the module gunicorn would import, build the
+# app the way `gunicorn app:app` does, and serve the health check once
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.app
+built = time.perf_counter()
+application.test_client().get("/")
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "build_ms": (built - imported) * 1000,
+    "first_request_ms": (served - built) * 1000,
+    "total_ms": (served - started) * 1000,
+}))
+"""
+
+
+def probe(tree, runs):
+    samples = defaultdict(list)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="")
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=tree, env=env, text=True)
+        for key, value in json.loads(output.strip().splitlines()[-1]).items():
+            samples[key].append(value)
+    return {key: round(statistics.median(values), 1) for key, values in samples.items()}
+
+
+def import_breakdown(tree, top):
+    """Cumulative import time per top-level package, from `python -X importtime`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app; app.app"],
+        cwd=tree, capture_output=True, text=True, check=True,
+    )
+    self_us = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            own = int(fields[0])
+        except ValueError:
+            continue  # header row
+        self_us[fields[2].strip().split(".")[0]] += own
+    ranked = sorted(self_us.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {package: round(us / 1000, 1) for package, us in ranked}
+
+
+def checkout(ref):
+    path = tempfile.mkdtemp(prefix="vc_startup_")
+    subprocess.check_call(["git", "worktree", "add", "--detach", path, ref],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", help="Also measure this git ref, for a before/after comparison")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes per tree")
+    parser.add_argument("--top", type=int, default=12, help="Packages to show in the import breakdown")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    trees = {"current": os.getcwd()}
+    if args.ref:
+        trees[args.ref] = checkout(args.ref)
+
+    report = {}
+    try:
+        for name, tree in trees.items():
+            report[name] = {"startup": probe(tree, args.runs), "imports_ms": import_breakdown(tree, args.top)}
+    finally:
+        if args.ref:
+            subprocess.call(["git", "worktree", "remove", "--force", trees[args.ref]])
+
+    for name, result in report.items():
+        startup = result["startup"]
+        print(f"{name}: total {startup['total_ms']} ms (import {startup['import_ms']}, "
+              f"build {startup['build_ms']}, first request {startup['first_request_ms']})")
+        for package, ms in result["imports_ms"].items():
+            print(f"    {package:<20} {ms:>8} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
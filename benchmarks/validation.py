@@ -0,0 +1,116 @@
+"""
+Cost of request validation (validation.py), per call and per request.
+
+    python -m benchmarks.validation
+    python -m benchmarks.validation --number 100000 --requests 2000 --output validation.json
+
+Times Schema.validate() for each endpoint's schema on a valid and on an
+invalid body (timeit, best of --repeat), then puts it next to whole
+requests served in-process by the Flask test client against a scratch
+SQLite file: a valid POST /opportunities (validated, inserted, committed)
+and an invalid one (rejected by its schema, no session work). The last
+line gives validate() as a share of the valid request.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import timeit
+
+from validation import (APPLICATION, APPLICATION_UPDATE, LOGIN, OPPORTUNITY, OPPORTUNITY_UPDATE, ORGANIZATION,
+                        PAYMENT, REGISTER)
+
+# (name, schema, partial, valid body, invalid body)
+CASES = [
+    ("register", REGISTER, False,
+     {"name": "Ada", "email": "ada@example.com", "password": "correct horse", "role": "volunteer"},
+     {"name": "Ada", "email": 7, "role": "admin"}),
+    ("login", LOGIN, False, {"email": "ada@example.com", "password": "correct horse"}, {"email": None}),
+    ("organizations", ORGANIZATION, False,
+     {"name": "Food Bank", "description": "Sorting and delivery", "location": "Leeds", "owner_id": 1},
+     {"name": "", "owner_id": "me"}),
+    ("opportunities", OPPORTUNITY, False,
+     {"title": "Shift", "organization_id": 1, "description": "Sort donations", "location": "Leeds",
+      "duration": "4", "capacity": 20},
+     {"organization_id": True, "duration": "long", "capacity": -1}),
+    ("opportunity patch", OPPORTUNITY_UPDATE, True, {"capacity": 30, "title": "Late shift"}, {"title": ""}),
+    ("applications", APPLICATION, False,
+     {"user_id": 1, "opportunity_id": 1, "motivation_message": "I'd love to help"},
+     {"user_id": "1x", "opportunity_id": [1]}),
+    ("application patch", APPLICATION_UPDATE, False, {"status": "accepted"}, {"status": "maybe"}),
+    ("payments", PAYMENT, False, {"user_id": 1, "opportunity_id": 1, "amount": "19.99"},
+     {"user_id": 1, "amount": 1.005, "payment_status": "paid"}),
+]
+
+
+def per_call_us(schema, body, partial, number, repeat):
+    timer = timeit.Timer(lambda: schema.validate(body, partial))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def per_request_us(requests):
+    """Mean microseconds per in-process POST /opportunities, valid and invalid"""
+    from app import create_app
+    from extensions import db
+    from models import Organization, User
+
+    path = os.path.join(tempfile.mkdtemp(prefix="vc_validation_"), "bench.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "RATELIMIT_ENABLED": False,
+                      "SHED_MAX_IN_FLIGHT": 0, "COALESCE_ENABLED": False, "LOG_ENABLED": False})
+    with app.app_context():
+        db.create_all()
+        owner = User(name="Owner", email="owner@example.com", role="organization", password_hash="x")
+        db.session.add(owner)
+        db.session.flush()
+        db.session.add(Organization(name="Org", owner_id=owner.id))
+        db.session.commit()
+    client = app.test_client()
+    valid, invalid = CASES[3][3], CASES[3][4]
+
+    results = {}
+    for name, body, status in (("valid", valid, 201), ("invalid", invalid, 400)):
+        client.post("/opportunities", json=body)  # warm up
+        started = time.perf_counter()
+        for _ in range(requests):
+            assert client.post("/opportunities", json=body).status_code == status
+        results[name] = (time.perf_counter() - started) / requests * 1e6
+    with app.app_context():
+        db.engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="validate() calls per timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per kind in the end-to-end part")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    schemas = []
+    print(f"{'schema':<18} {'valid us':>9} {'invalid us':>11}")
+    for name, schema, partial, valid, invalid in CASES:
+        assert schema.validate(valid, partial)[1] is None, name
+        assert schema.validate(invalid, partial)[1] is not None, name
+        row = {
+            "schema": name,
+            "valid_us": round(per_call_us(schema, valid, partial, args.number, args.repeat), 2),
+            "invalid_us": round(per_call_us(schema, invalid, partial, args.number, args.repeat), 2),
+        }
+        schemas.append(row)
+        print(f"{name:<18} {row['valid_us']:>9} {row['invalid_us']:>11}")
+
+    requests = per_request_us(args.requests)
+    opportunities = next(row for row in schemas if row["schema"] == "opportunities")
+    share = opportunities["valid_us"] / requests["valid"]
+    print(f"\nPOST /opportunities in-process: valid {requests['valid']:.0f} us, "
+          f"rejected {requests['invalid']:.0f} us; validate() is {share:.2%} of a valid request")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"schemas": schemas, "requests_us": requests, "validation_share": share}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
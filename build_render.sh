@@ -1,6 +1,8 @@
 #!/bin/bash
 # Build script for Render deployment
-# This ensures gunicorn is properly installed and available
+# This ensures gunicorn is properly installed and available.
+# Run it as the Render *Build Command* only: the start command (Procfile) must
+# not call it, or every cold start pays for a full pip install.
 
 echo "========================================="
 echo "Starting Render Build Process"
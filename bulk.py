@@ -0,0 +1,267 @@
+"""
+Bulk export and import of an organization's data, as CSV or NDJSON
+
+Exports stream rows from a server-side cursor (yield_per) straight into the
+response, one chunk at a time, so memory stays flat however many rows an
+organization has. Imports parse the upload chunk by chunk, validate every
+row with the same rules as the JSON endpoints, and load each chunk with one
+batched INSERT (or COPY on PostgreSQL). Payments use INSERT ... RETURNING
+even there, so each new payment gets its audit row.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import insert, select
+
+from coalescing import COALESCED_TABLES
+from dashboards import refresh_summaries
+from extensions import catalog, coalescer, db
+from models import Application, Opportunity, Organization, Payment, User, audit_new_payments
+from validation import OPPORTUNITY, PAYMENT
+
+bulk_bp = Blueprint("bulk", __name__)
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+# --------------------
+# Export
+# --------------------
+def _opportunities_query(organization_id):
+    return (
+        select(Opportunity.id, Opportunity.title, Opportunity.description, Opportunity.location,
+               Opportunity.duration, Opportunity.capacity, Opportunity.created_by, Opportunity.created_at)
+        .where(Opportunity.organization_id == organization_id, Opportunity.deleted_at.is_(None))
+        .order_by(Opportunity.id)
+    )
+
+
+def _applicants_query(organization_id):
+    return (
+        select(Application.id.label("application_id"), Application.opportunity_id,
+               Opportunity.title.label("opportunity_title"), User.id.label("user_id"),
+               User.name, User.email, Application.status, Application.motivation_message,
+               Application.applied_at)
+        .join(Opportunity, Application.opportunity_id == Opportunity.id)
+        .join(User, Application.user_id == User.id)
+        .where(Opportunity.organization_id == organization_id, Opportunity.deleted_at.is_(None))
+        .order_by(Application.id)
+    )
+
+
+def _payments_query(organization_id):
+    return (
+        select(Payment.id, Payment.opportunity_id, Payment.user_id, Payment.amount,
+               Payment.payment_status, Payment.payment_date)
+        .join(Opportunity, Payment.opportunity_id == Opportunity.id)
+        .where(Opportunity.organization_id == organization_id, Payment.deleted_at.is_(None))
+        .order_by(Payment.id)
+    )
+
+
+EXPORTS = {
+    "opportunities": _opportunities_query,
+    "applicants": _applicants_query,
+    "payments": _payments_query,
+}
+# The API cannot tell who is calling, so applicants' names and emails are only
+# exported through `flask export-data`; the rest is already public over HTTP
+HTTP_EXPORTS = ("opportunities", "payments")
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Amounts stay JSON numbers, as in the API
+    return float(value) if isinstance(value, Decimal) else str(value)
+
+
+def export_rows(kind, organization_id, fmt):
+    """Yield the export as text chunks of about CHUNK_SIZE rows each"""
+    result = db.session.execute(
+        EXPORTS[kind](organization_id).execution_options(yield_per=CHUNK_SIZE)
+    )
+    columns = list(result.keys())
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for rows in result.partitions():
+            writer.writerows([[_plain(v) for v in row] for row in rows])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for rows in result.partitions():
+            yield "".join(
+                json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in rows
+            )
+
+
+# --------------------
+# Import
+# --------------------
+def read_records(stream, fmt):
+    """Yield (line, record, error) from a text stream without reading it all into memory"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # CSV has no null: an empty cell means "not given"
+            yield reader.line_num, {k: (v if v != "" else None) for k, v in record.items()}, None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def opportunity_row(record, organization_id):
+    """Validate one catalog row against the POST /opportunities schema"""
+    values, problem = OPPORTUNITY.validate(dict(record, organization_id=organization_id))
+    if problem:
+        return None, problem["error"]
+    values["created_at"] = datetime.utcnow()
+    return values, None
+
+
+def payment_row(record, organization_id=None):
+    """Validate one payment row against the POST /payments schema"""
+    values, problem = PAYMENT.validate(record)
+    if problem:
+        return None, problem["error"]
+    values["payment_date"] = datetime.utcnow()
+    return values, None
+
+
+IMPORTS = {
+    "opportunities": (Opportunity, opportunity_row),
+    "payments": (Payment, payment_row),
+}
+
+
+def _copy_chunk(model, rows):
+    """Load a chunk with COPY ... FROM STDIN; returns False if the driver can't"""
+    cursor = db.session.connection().connection.cursor()
+    if not hasattr(cursor, "copy_expert"):
+        return False
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_plain(row[c]) for c in columns])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+    return True
+
+
+def _load_chunk(model, rows):
+    if model is Payment:
+        # Not COPY: the audit trail needs the ids the database assigns
+        created = db.session.execute(
+            insert(Payment.__table__).returning(Payment.id, Payment.payment_status, Payment.amount), rows
+        ).all()
+        audit_new_payments(db.session, created)
+        return
+    if db.session.get_bind().dialect.name == "postgresql" and _copy_chunk(model, rows):
+        return
+    db.session.execute(insert(model), rows)
+
+
+def import_records(kind, stream, fmt, organization_id=None):
+    """
+    Validate and load every record in `stream`, CHUNK_SIZE rows at a time.
+
+    Invalid rows are skipped and reported (the first MAX_REPORTED_ERRORS of
+    them); valid rows are committed together at the end.
+    """
+    model, build_row = IMPORTS[kind]
+    imported, rejected, errors, chunk = 0, 0, [], []
+    # Core inserts skip the ORM flush that keeps dashboards current; track
+    # what was loaded and refresh it in the same transaction instead
+    touched = {"opportunity_ids": set(), "organization_ids": set()}
+    try:
+        for line, record, error in read_records(stream, fmt):
+            values = None
+            if error is None:
+                values, error = build_row(record, organization_id)
+            if error:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line, "error": error})
+                continue
+            chunk.append(values)
+            if model is Opportunity:
+                touched["organization_ids"].add(values["organization_id"])
+            else:
+                touched["opportunity_ids"].add(values["opportunity_id"])
+            if len(chunk) == CHUNK_SIZE:
+                _load_chunk(model, chunk)
+                imported += len(chunk)
+                chunk = []
+        if chunk:
+            _load_chunk(model, chunk)
+            imported += len(chunk)
+        for scope, ids in touched.items():
+            if ids:
+                refresh_summaries(db.session.connection(), **{scope: ids})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Nor do they reach the flush hook that invalidates coalesced GET responses
+    if imported and model.__tablename__ in COALESCED_TABLES:
+        coalescer.invalidate([model.__tablename__])
+        catalog.invalidate([model.__tablename__])
+    return {"imported": imported, "rejected": rejected, "errors": errors}
+
+
+# --------------------
+# Routes
+# --------------------
+@bulk_bp.route("/organizations/<int:id>/export/<kind>", methods=["GET"])
+def export_data(id, kind):
+    fmt = request.args.get("format", "csv")
+    if kind not in HTTP_EXPORTS or fmt not in FORMATS:
+        return jsonify({"error": f"Export one of {', '.join(HTTP_EXPORTS)} as csv or ndjson"}), 400
+    Organization.query.get_or_404(id)
+
+    return Response(
+        stream_with_context(export_rows(kind, id, fmt)),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={kind}-{id}.{fmt}"},
+    )
+
+
+@bulk_bp.route("/organizations/<int:id>/import/opportunities", methods=["POST"])
+def import_opportunities(id):
+    fmt = request.args.get("format") or ("csv" if request.mimetype == "text/csv" else "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"error": "Format must be csv or ndjson"}), 400
+    Organization.query.get_or_404(id)
+
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    summary = import_records("opportunities", stream, fmt, organization_id=id)
+    return jsonify(summary), 201 if summary["imported"] else 400
@@ -0,0 +1,146 @@
+"""
+Places on capacity-limited opportunities
+
+An opportunity with a capacity has `filled` of its places taken by pending
+and accepted applications. An applicant takes a place with one conditional
+UPDATE:
+
+    UPDATE opportunities SET filled = filled + 1
+    WHERE id = :id AND (capacity IS NULL OR filled < capacity)
+
+The database checks and increments in one step, so concurrent applicants
+can't overbook. On PostgreSQL a second UPDATE waits on the first one's row
+lock and then re-checks the condition. Nothing locks more than that one
+opportunity row, and only until the applicant's transaction commits.
+
+Applicants who find the opportunity full are waitlisted. When a place frees
+up (an application is rejected, or capacity is raised), the oldest
+waitlisted application takes it. It is picked with FOR UPDATE SKIP LOCKED,
+so a promotion never waits on a waitlisted row that another request is
+already changing.
+
+Every function works on a sync Session inside the caller's transaction; the
+ASGI app calls them through AsyncSession.run_sync.
+"""
+from sqlalchemy import func, or_, select, update
+
+from models import HOLDS_PLACE, Application, Opportunity
+
+
+def _update_filled(session, opportunity_id, delta, *where):
+    # synchronize_session=False: loaded Opportunity objects may be stale, and
+    # evaluating `filled + 1` against one in Python would be wrong
+    return session.execute(
+        update(Opportunity)
+        .where(Opportunity.id == opportunity_id, *where)
+        .values(filled=Opportunity.filled + delta)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def reserve(session, opportunity_id):
+    """Take a place on a live opportunity; False if it is full or doesn't exist"""
+    return _update_filled(
+        session, opportunity_id, 1,
+        Opportunity.deleted_at.is_(None),
+        or_(Opportunity.capacity.is_(None), Opportunity.filled < Opportunity.capacity),
+    )
+
+
+def release(session, opportunity_id):
+    """Give up a place and hand it to the next waitlisted application, if any"""
+    _update_filled(session, opportunity_id, -1)
+    return promote(session, opportunity_id)
+
+
+def promote(session, opportunity_id):
+    """Fill free places from the waitlist, oldest first; returns the promoted applications"""
+    promoted = []
+    while reserve(session, opportunity_id):
+        waiting = session.scalar(
+            select(Application)
+            .where(Application.opportunity_id == opportunity_id, Application.status == "waitlisted")
+            .order_by(Application.applied_at, Application.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if waiting is None:
+            _update_filled(session, opportunity_id, -1)
+            break
+        waiting.status = "pending"
+        # Flushed now, so the next pass doesn't pick the same row
+        session.flush()
+        promoted.append(waiting)
+    return promoted
+
+
+def submit(session, application):
+    """
+    Add a new application: pending if it got a place, otherwise waitlisted.
+    Returns its status, or None if the opportunity doesn't exist.
+    """
+    if reserve(session, application.opportunity_id):
+        application.status = "pending"
+    elif session.scalar(select(Opportunity.id).where(Opportunity.id == application.opportunity_id)) is None:
+        return None
+    else:
+        application.status = "waitlisted"
+    session.add(application)
+    return application.status
+
+
+def change_status(session, application, status):
+    """
+    Move an application to `status`, taking or giving up its place. Lock the
+    application row first (get(..., with_for_update=True)), so two requests
+    can't both release it. Returns an error message, or None.
+    """
+    holds, held = status in HOLDS_PLACE, application.status in HOLDS_PLACE
+    if holds and not held:
+        if not reserve(session, application.opportunity_id):
+            return "Opportunity is full"
+        application.status = status
+    elif held and not holds:
+        application.status = status
+        session.flush()
+        release(session, application.opportunity_id)
+    else:
+        application.status = status
+    return None
+
+
+def set_capacity(session, opportunity, capacity):
+    """
+    Change the capacity (None: unlimited) and fill any new places from the
+    waitlist. Returns an error message if fewer places than are taken.
+    """
+    at_most = [] if capacity is None else [Opportunity.filled <= capacity]
+    changed = session.execute(
+        update(Opportunity)
+        .where(Opportunity.id == opportunity.id, *at_most)
+        .values(capacity=capacity)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if changed:
+        promote(session, opportunity.id)
+    session.expire(opportunity, ["capacity", "filled"])
+    if not changed:
+        return f"Capacity can't be below the {opportunity.filled} places already taken"
+    return None
+
+
+def recount_places(connection, opportunity_ids=None):
+    """
+    Recompute `filled` from the applications, for writes that bypassed the
+    functions above (raw SQL, bulk loads, cascades from deleting a user)
+    """
+    applications = Application.__table__
+    opportunities = Opportunity.__table__
+    query = update(opportunities).values(filled=(
+        select(func.count())
+        .where(applications.c.opportunity_id == opportunities.c.id, applications.c.status.in_(HOLDS_PLACE))
+        .scalar_subquery()
+    ))
+    if opportunity_ids is not None:
+        query = query.where(opportunities.c.id.in_(sorted(opportunity_ids)))
+    connection.execute(query)
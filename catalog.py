@@ -0,0 +1,235 @@
+"""
+Catalog snapshot: the opportunity and organization listings in one
+memory-mapped file, shared by every worker on a host
+
+`flask build-catalog --every 5` (started by gunicorn.conf.py when
+CATALOG_SNAPSHOT_PATH is set) serializes the live catalog into the file:
+
+    magic             b"VCCAT1\\n\\0"
+    header length     uint32, then the header as JSON
+    for each table, 8-byte aligned:
+      ids             int64[n], ascending
+      spans           int64[2n], (start, end) of each row within the blob
+      blob            b"[row,row,...]\\n", the GET /<table> body byte for byte
+
+A build is written next to the file and renamed over it, so a reader maps
+either the old file or the new one, never half of each. Workers map it
+read-only. Its pages sit once in the page cache however many workers map
+it, so memory per worker stays flat as the catalog grows. Every
+CHECK_SECONDS a worker checks whether the file was replaced and maps the
+new one; the old mapping goes away with its last reference. A list
+response streams the blob straight from the mapping in CHUNK_BYTES pieces,
+so no worker ever holds a whole copy of it. A lookup by id is a binary
+search over the mapped ids, then a copy of one row's span.
+
+A snapshot is served for at most MAX_AGE_INTERVALS build intervals, so a
+stopped builder can't leave workers serving an old catalog. After a worker
+commits a write to a catalog table, it answers from the live query until a
+snapshot built after that commit appears, so clients read their own
+writes. Other workers may serve the previous build for up to one interval.
+A missing or unreadable file means live queries, never errors.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+
+from flask import current_app
+from sqlalchemy import select
+
+MAGIC = b"VCCAT1\n\0"
+# How often a worker looks for a rebuilt file
+CHECK_SECONDS = 1.0
+# Snapshots older than this many CATALOG_SNAPSHOT_INTERVALs are not served
+MAX_AGE_INTERVALS = 3
+# Size of each piece of a streamed list response
+CHUNK_BYTES = 64 * 1024
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def _encode(row):
+    # What Flask's jsonify produces in production: sorted keys, compact separators
+    return json.dumps(row, sort_keys=True, separators=(",", ":")).encode()
+
+
+# --------------------
+# Builder
+# --------------------
+def _table_sections(session, model):
+    ids, spans, rows, position = array("q"), array("q"), [], 1
+    for record in session.scalars(select(model).order_by(model.id).execution_options(yield_per=1000)):
+        row = _encode(record.to_dict())
+        ids.append(record.id)
+        spans.extend((position, position + len(row)))
+        rows.append(row)
+        position += len(row) + 1
+    return ids.tobytes(), spans.tobytes(), b"[" + b",".join(rows) + b"]\n"
+
+
+def build_catalog(session, path):
+    """Write the live catalog to `path`, replacing it atomically; returns {table: rows}"""
+    # Imported here: extensions.py imports this module before the models exist
+    from models import Opportunity, Organization
+
+    # Stamped before reading: a commit racing the build makes the snapshot
+    # look older than that commit, never newer
+    header = {"built_at": time.time(), "tables": {}}
+    sections, offset = [], 0
+    for model in (Opportunity, Organization):
+        ids, spans, blob = _table_sections(session, model)
+        header["tables"][model.__tablename__] = {
+            "count": len(ids) // 8, "ids": offset, "spans": offset + len(ids),
+            "blob": offset + len(ids) + len(spans), "blob_length": len(blob),
+        }
+        section = ids + spans + blob
+        sections.append(section + b"\0" * (_aligned(len(section)) - len(section)))
+        offset += len(sections[-1])
+
+    encoded = json.dumps(header).encode()
+    preamble = MAGIC + struct.pack("=I", len(encoded)) + encoded
+    preamble += b"\0" * (_aligned(len(preamble)) - len(preamble))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix=".catalog-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(preamble)
+            for section in sections:
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return {table: entry["count"] for table, entry in header["tables"].items()}
+
+
+# --------------------
+# Reader
+# --------------------
+class _Mapping:
+    """One mapped snapshot file"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        view = memoryview(self.buffer)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        (length,) = struct.unpack_from("=I", self.buffer, len(MAGIC))
+        header = json.loads(bytes(view[len(MAGIC) + 4:len(MAGIC) + 4 + length]))
+        start = _aligned(len(MAGIC) + 4 + length)
+        self.built_at = header["built_at"]
+        self.tables = {}
+        for table, entry in header["tables"].items():
+            count, ids, spans, blob = (entry["count"], start + entry["ids"], start + entry["spans"],
+                                       start + entry["blob"])
+            self.tables[table] = (
+                view[ids:ids + 8 * count].cast("q"),
+                view[spans:spans + 16 * count].cast("q"),
+                view[blob:blob + entry["blob_length"]],
+            )
+
+    def listing(self, table):
+        """(length, chunks) of the list body; the chunks keep this mapping alive"""
+        entry = self.tables.get(table)
+        if entry is None:
+            return None
+        blob = entry[2]
+        return len(blob), (bytes(blob[i:i + CHUNK_BYTES]) for i in range(0, len(blob), CHUNK_BYTES))
+
+    def row(self, table, id):
+        entry = self.tables.get(table)
+        if entry is None:
+            return None
+        ids, spans, blob = entry
+        i = bisect_left(ids, id)
+        if i == len(ids) or ids[i] != id:
+            return None
+        return bytes(blob[spans[2 * i]:spans[2 * i + 1]]) + b"\n"
+
+
+class CatalogSnapshot:
+    """Serves catalog reads from the mapped snapshot file while it is fresh enough"""
+
+    def __init__(self, app=None):
+        self.path = None
+        self.max_age = 15.0
+        self.check_seconds = CHECK_SECONDS
+        self._mapping = None
+        self._checked = None
+        self._written = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CATALOG_SNAPSHOT_PATH", "")
+        app.config.setdefault("CATALOG_SNAPSHOT_INTERVAL", 5.0)
+        self.configure(app.config)
+        app.extensions["catalog"] = self
+
+    def configure(self, config):
+        """Apply CATALOG_SNAPSHOT_* settings from a config mapping (the ASGI app has no Flask app)"""
+        self.path = config.get("CATALOG_SNAPSHOT_PATH") or None
+        self.max_age = MAX_AGE_INTERVALS * float(config.get("CATALOG_SNAPSHOT_INTERVAL", 5.0))
+        self._mapping = None
+        self._checked = None
+
+    def invalidate(self, tags):
+        """Called after a commit that wrote to the tables named in `tags`"""
+        now = time.time()
+        for tag in tags:
+            self._written[tag] = now
+
+    def _current(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_seconds:
+            return self._mapping
+        self._checked = now
+        try:
+            stat = os.stat(self.path)
+            mapping = self._mapping
+            if mapping is None or mapping.identity != (stat.st_dev, stat.st_ino, stat.st_mtime_ns):
+                # A plain attribute swap: requests still holding the old mapping finish with it
+                self._mapping = _Mapping(self.path)
+        except (OSError, ValueError, KeyError):
+            self._mapping = None
+        return self._mapping
+
+    def body(self, table, id=None):
+        """
+        The body of GET /<table>[/<id>] from the snapshot as (length, chunks),
+        or None to query live
+        """
+        if self.path is None:
+            return None
+        mapping = self._current()
+        if mapping is None or mapping.built_at <= self._written.get(table, 0.0):
+            return None
+        if time.time() - mapping.built_at > self.max_age:
+            return None
+        if id is None:
+            return mapping.listing(table)
+        row = mapping.row(table, id)
+        return None if row is None else (len(row), [row])
+
+    def respond(self, table, id=None):
+        """body() as a Flask response, or None"""
+        body = self.body(table, id)
+        if body is None:
+            return None
+        length, chunks = body
+        response = current_app.response_class(chunks, mimetype="application/json")
+        response.headers["Content-Length"] = str(length)
+        response.headers["X-Coalesced"] = "snapshot"
+        return response
@@ -0,0 +1,355 @@
+"""
+Request coalescing (single-flight) for hot read endpoints
+
+When hundreds of identical GET /opportunities arrive together, only one of
+them runs the query and serializes the result; the rest wait for it and
+send the same bytes.
+
+Inside a worker, SingleFlight lets concurrent identical requests share one
+in-flight computation. With COALESCE_STORAGE_URL set, the workers on a host
+also share the last response through a SQLite file. A worker that finds it
+out of date takes a short lock and recomputes it. Meanwhile the other
+workers keep serving the previous response (stale-while-revalidate) instead
+of piling onto the database. If there is no previous response, they wait
+for the lock holder.
+
+Commits that touch a coalesced table bump that table's generation. Requests
+that start after the commit never join an older flight, and they never
+take an older shared response as fresh. A stale response is only served
+while another worker is already recomputing, and for at most
+COALESCE_MAX_STALE_SECONDS.
+
+With read replicas, requests only share a flight with requests reading the
+same database, so a client pinned to the primary after a write never gets
+a lagging replica's answer. Only responses computed on the primary are
+shared between workers; replica requests use one if it is fresh, and
+otherwise ask their replica without storing the result.
+"""
+import asyncio
+import itertools
+import sqlite3
+import threading
+import time
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from replicas import read_bind
+
+# Tables behind coalesced endpoints; commits that write them bump their generation
+COALESCED_TABLES = frozenset({"opportunities", "organizations"})
+# How often a worker waiting on another's lock checks for the new response
+POLL_SECONDS = 0.01
+
+
+# --------------------
+# In-worker single flight
+# --------------------
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution of the function"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Returns (result, shared): shared is True if another caller computed it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def after_fork(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop (the ASGI app)"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # followers re-raise it; don't log it as unretrieved
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+        return result, False
+
+
+# --------------------
+# Shared responses across workers
+# --------------------
+class SQLiteResponses:
+    """
+    Last response per key plus a refresh lock, shared by every worker on the
+    host through a SQLite file. Like the rate limiter's SQLiteStorage, it
+    stands in for a networked store such as Redis.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, body BLOB, "
+            "generation INTEGER NOT NULL DEFAULT -1, stored REAL NOT NULL DEFAULT 0, "
+            "locked_until REAL NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS generations (tag TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key, tag):
+        """(body, generation stored with it, when it was stored, the tag's current generation)"""
+        row = self._connect().execute(
+            "SELECT r.body, r.generation, r.stored, "
+            "(SELECT generation FROM generations WHERE tag = ?) FROM responses r WHERE r.key = ?",
+            (tag, key),
+        ).fetchone()
+        if row is None:
+            return None, -1, 0.0, self.generation(tag)
+        body, generation, stored, current = row
+        return body, generation, stored, current or 0
+
+    def generation(self, tag):
+        row = self._connect().execute("SELECT generation FROM generations WHERE tag = ?", (tag,)).fetchone()
+        return row[0] if row else 0
+
+    def try_lock(self, key, seconds, now=None):
+        """Take the refresh lock for `key` unless another worker holds an unexpired one"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO responses (key) VALUES (?)", (key,))
+            taken = conn.execute(
+                "UPDATE responses SET locked_until = ? WHERE key = ? AND locked_until < ?",
+                (now + seconds, key, now),
+            ).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return taken
+
+    def store(self, key, body, generation):
+        """Save a response computed at `generation` and release the lock"""
+        self._connect().execute(
+            "UPDATE responses SET body = ?, generation = ?, stored = ?, locked_until = 0 WHERE key = ?",
+            (body, generation, time.time(), key),
+        )
+
+    def unlock(self, key):
+        self._connect().execute("UPDATE responses SET locked_until = 0 WHERE key = ?", (key,))
+
+    def bump(self, tags):
+        conn = self._connect()
+        for tag in tags:
+            conn.execute(
+                "INSERT INTO generations (tag, generation) VALUES (?, 1) "
+                "ON CONFLICT (tag) DO UPDATE SET generation = generation + 1",
+                (tag,),
+            )
+
+    def reset(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM responses")
+        conn.execute("DELETE FROM generations")
+
+    def after_fork(self):
+        # A SQLite connection must not be used across fork: abandon the parent's
+        self._local = threading.local()
+
+
+def responses_from_url(url):
+    """Shared response store from `sqlite:///path/to/file`, or None to coalesce per worker only"""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteResponses(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported coalescing storage: {url}")
+
+
+# --------------------
+# Extension
+# --------------------
+class Coalescer:
+    """Single-flight (and optionally shared) responses for hot read endpoints"""
+
+    def __init__(self, app=None):
+        self.flight = SingleFlight()
+        self.shared = None
+        self.enabled = True
+        self.lock_seconds = 2.0
+        self.max_stale_seconds = 30.0
+        self._generations = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("COALESCE_ENABLED", True)
+        app.config.setdefault("COALESCE_STORAGE_URL", "")
+        app.config.setdefault("COALESCE_LOCK_SECONDS", 2.0)
+        app.config.setdefault("COALESCE_MAX_STALE_SECONDS", 30.0)
+        self.configure(app.config)
+        app.extensions["coalescer"] = self
+
+    def configure(self, config):
+        """Apply COALESCE_* settings from a config mapping (the ASGI app has no Flask app)"""
+        self.enabled = bool(config.get("COALESCE_ENABLED", True))
+        self.lock_seconds = float(config.get("COALESCE_LOCK_SECONDS", 2.0))
+        self.max_stale_seconds = float(config.get("COALESCE_MAX_STALE_SECONDS", 30.0))
+        self.shared = responses_from_url(config.get("COALESCE_STORAGE_URL"))
+
+    def after_fork(self):
+        self.flight.after_fork()
+        if self.shared is not None:
+            self.shared.after_fork()
+
+    def generation(self, tag):
+        """This worker's count of commits to `tag`; requests only share a flight within one"""
+        return self._generations.get(tag, 0)
+
+    def invalidate(self, tags):
+        """Called after a commit that wrote to the tables named in `tags`"""
+        for tag in tags:
+            # A racing += can only lose a bump that another commit also made
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        if self.shared is not None:
+            try:
+                self.shared.bump(tags)
+            except sqlite3.Error:
+                # The write has committed; other workers just keep the old
+                # response until the next write bumps the generation
+                pass
+
+    def respond(self, tag, produce):
+        """
+        The response for this request to a read endpoint over the `tag` table.
+        `produce` builds it (a JSON 200 response) when nobody else is already.
+        The X-Coalesced header says how it was obtained.
+        """
+        if not self.enabled:
+            return produce()
+        key = f"{tag}?{request.query_string.decode()}"
+        bind = read_bind()
+        (body, how), joined = self.flight.do(
+            (key, self.generation(tag), bind), lambda: self._body(key, tag, produce, bind)
+        )
+        response = current_app.response_class(body, mimetype="application/json")
+        response.headers["X-Coalesced"] = "follower" if joined else how
+        return response
+
+    def _body(self, key, tag, produce, bind=None):
+        """(body, how): computed here, or a fresh or stale response shared by another worker"""
+        if self.shared is not None:
+            try:
+                if bind is None:
+                    return self._shared_body(key, tag, produce)
+                # A replica may lag: what it returns is never shared, but the
+                # primary's response for the current generation is as fresh
+                body, generation, _, current = self.shared.lookup(key, tag)
+                if body is not None and generation == current:
+                    return body, "cached"
+            except sqlite3.Error:
+                # Like the rate limiter, never let the shared store take the API down
+                pass
+        return produce().get_data(), "computed"
+
+    def _shared_body(self, key, tag, produce):
+        deadline = time.monotonic() + self.lock_seconds
+        while True:
+            body, generation, stored, current = self.shared.lookup(key, tag)
+            if body is not None and generation == current:
+                return body, "cached"
+            if self.shared.try_lock(key, self.lock_seconds):
+                try:
+                    body = produce().get_data()
+                except BaseException:
+                    self.shared.unlock(key)
+                    raise
+                # Stored under the generation read before the query ran: a
+                # commit that lands meanwhile leaves it stale, not wrong
+                self.shared.store(key, body, current)
+                return body, "computed"
+            if body is not None and time.time() - stored < self.max_stale_seconds:
+                return body, "stale"
+            if time.monotonic() >= deadline:
+                # The lock holder is slow or gone; don't make this request wait on it
+                return produce().get_data(), "computed"
+            time.sleep(POLL_SECONDS)
+
+
+def invalidate_on_commit(*caches):
+    """Invalidate each of `caches` after every ORM commit that wrote to a coalesced table"""
+
+    @event.listens_for(Session, "after_flush")
+    def _note_writes(session, flush_context):
+        written = {
+            getattr(obj, "__tablename__", None)
+            for obj in itertools.chain(session.new, session.dirty, session.deleted)
+        }
+        session.info.setdefault("coalesced_writes", set()).update(written & COALESCED_TABLES)
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _note_statement_writes(execute_state):
+        # UPDATE/DELETE statements (capacity.py's place counts) skip the flush
+        if execute_state.is_update or execute_state.is_delete:
+            written = {mapper.local_table.name for mapper in execute_state.all_mappers}
+            execute_state.session.info.setdefault("coalesced_writes", set()).update(written & COALESCED_TABLES)
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate(session):
+        written = session.info.pop("coalesced_writes", None)
+        if written:
+            for cache in caches:
+                cache.invalidate(written)
+
+    @event.listens_for(Session, "after_rollback")
+    def _forget_writes(session):
+        session.info.pop("coalesced_writes", None)
@@ -0,0 +1,282 @@
+"""
+Maintenance commands for the flask CLI
+
+    flask archive-deleted --older-than-days 30
+    flask export-data opportunities --organization-id 3 --format ndjson -o opps.ndjson
+    flask import-data opportunities catalog.csv --organization-id 3
+    flask refresh-dashboards [--organization-id 3]
+    flask recount-places [--opportunity-id 7]
+    flask build-catalog [--every 5] [--path /dev/shm/catalog.snap]
+    flask reconcile-payments statement.csv [--status completed]
+    flask partition-tables [--opportunity-partitions 16]
+    flask create-partitions [--months-ahead 3]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import literal, select
+
+from bulk import EXPORTS, FORMATS, IMPORTS, export_rows, import_records
+from capacity import recount_places
+from catalog import build_catalog
+from dashboards import refresh_summaries
+from extensions import db
+from models import (Application, Opportunity, Payment, applications_archive, opportunities_archive,
+                    payments_archive)
+from partitioning import MONTHS_AHEAD, OPPORTUNITY_PARTITIONS, create_partitions, partition_tables
+
+
+# --------------------
+# Archival
+# --------------------
+def _move_rows(table, archive, ids, archived_at):
+    """Copy rows into the archive table and delete them, in the caller's transaction"""
+    columns = [c.name for c in table.columns]
+    db.session.execute(
+        archive.insert().from_select(
+            columns + ["archived_at"],
+            select(*table.columns, literal(archived_at)).where(table.c.id.in_(ids)),
+        )
+    )
+    db.session.execute(table.delete().where(table.c.id.in_(ids)))
+
+
+def _next_batch(table, cutoff, batch_size):
+    # Served by the partial ix_<table>_deleted_at index
+    return db.session.scalars(
+        select(table.c.id)
+        .where(table.c.deleted_at.isnot(None), table.c.deleted_at < cutoff)
+        .order_by(table.c.id)
+        .limit(batch_size)
+    ).all()
+
+
+def archive_deleted(older_than, batch_size=1000, pause=0.0):
+    """
+    Move rows soft-deleted more than `older_than` ago into the archive tables.
+
+    Works in batches, each in its own short transaction, so live traffic is
+    never blocked for long. An archived opportunity takes all its payments
+    and applications with it, in the same batch, so ON DELETE CASCADE never
+    finds anything left to destroy.
+    Returns the number of rows archived per table.
+    """
+    cutoff = datetime.utcnow() - older_than
+    payments, applications, opportunities = Payment.__table__, Application.__table__, Opportunity.__table__
+    archived = {"payments": 0, "applications": 0, "opportunities": 0}
+
+    while True:
+        ids = _next_batch(payments, cutoff, batch_size)
+        if not ids:
+            break
+        _move_rows(payments, payments_archive, ids, datetime.utcnow())
+        db.session.commit()
+        archived["payments"] += len(ids)
+        time.sleep(pause)
+
+    while True:
+        ids = _next_batch(opportunities, cutoff, batch_size)
+        if not ids:
+            break
+        now = datetime.utcnow()
+        payment_ids = db.session.scalars(
+            select(payments.c.id).where(payments.c.opportunity_id.in_(ids))
+        ).all()
+        if payment_ids:
+            _move_rows(payments, payments_archive, payment_ids, now)
+        application_ids = db.session.scalars(
+            select(applications.c.id).where(applications.c.opportunity_id.in_(ids))
+        ).all()
+        if application_ids:
+            _move_rows(applications, applications_archive, application_ids, now)
+        _move_rows(opportunities, opportunities_archive, ids, now)
+        db.session.commit()
+        archived["payments"] += len(payment_ids)
+        archived["applications"] += len(application_ids)
+        archived["opportunities"] += len(ids)
+        time.sleep(pause)
+
+    return archived
+
+
+@click.command("archive-deleted")
+@click.option("--older-than-days", default=30, show_default=True,
+              help="Only archive rows soft-deleted at least this long ago")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per transaction")
+@click.option("--pause", default=0.05, show_default=True,
+              help="Seconds to sleep between batches, to leave room for live traffic")
+def archive_deleted_command(older_than_days, batch_size, pause):
+    """Move old soft-deleted opportunities (with their applications) and payments to the archive tables."""
+    archived = archive_deleted(timedelta(days=older_than_days), batch_size, pause)
+    click.echo(f"Archived {archived['opportunities']} opportunities, {archived['applications']} applications "
+               f"and {archived['payments']} payments")
+
+
+# --------------------
+# Bulk import / export
+# --------------------
+@click.command("export-data")
+@click.argument("kind", type=click.Choice(sorted(EXPORTS)))
+@click.option("--organization-id", type=int, required=True)
+@click.option("--format", "fmt", type=click.Choice(sorted(FORMATS)), default="csv", show_default=True)
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="File to write (default: stdout)")
+def export_data_command(kind, organization_id, fmt, output):
+    """Stream an organization's opportunities, applicants or payments."""
+    out = open(output, "w", newline="") if output else sys.stdout
+    try:
+        for chunk in export_rows(kind, organization_id, fmt):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+
+@click.command("import-data")
+@click.argument("kind", type=click.Choice(sorted(IMPORTS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--organization-id", type=int, help="Organization that owns imported opportunities")
+@click.option("--format", "fmt", type=click.Choice(sorted(FORMATS)),
+              help="Input format (default: from the file extension)")
+def import_data_command(kind, path, organization_id, fmt):
+    """Validate and bulk-load opportunities or payments from CSV/NDJSON."""
+    if kind == "opportunities" and organization_id is None:
+        raise click.UsageError("--organization-id is required for opportunities")
+    fmt = fmt or ("csv" if os.path.splitext(path)[1].lower() == ".csv" else "ndjson")
+    with open(path, newline="", encoding="utf-8") as stream:
+        summary = import_records(kind, stream, fmt, organization_id)
+    click.echo(f"Imported {summary['imported']} rows, rejected {summary['rejected']}")
+    for error in summary["errors"]:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+
+
+# --------------------
+# Dashboards
+# --------------------
+@click.command("refresh-dashboards")
+@click.option("--organization-id", type=int, multiple=True, help="Only these organizations (default: all)")
+def refresh_dashboards_command(organization_id):
+    """Recompute dashboard summaries, picking up writes made outside the ORM."""
+    refresh_summaries(db.session.connection(), organization_ids=organization_id or None)
+    db.session.commit()
+    click.echo("Dashboards refreshed")
+
+
+# --------------------
+# Places
+# --------------------
+@click.command("recount-places")
+@click.option("--opportunity-id", type=int, multiple=True, help="Only these opportunities (default: all)")
+def recount_places_command(opportunity_id):
+    """Recompute places taken on each opportunity, picking up writes made outside the API."""
+    recount_places(db.session.connection(), opportunity_ids=opportunity_id or None)
+    db.session.commit()
+    click.echo("Places recounted")
+
+
+# --------------------
+# Catalog snapshot
+# --------------------
+@click.command("build-catalog")
+@click.option("--path", help="Snapshot file (default: CATALOG_SNAPSHOT_PATH)")
+@click.option("--every", type=float, default=0, help="Rebuild every N seconds until stopped (default: once)")
+def build_catalog_command(path, every):
+    """Write the opportunity and organization catalog to the snapshot file the workers map."""
+    path = path or current_app.config["CATALOG_SNAPSHOT_PATH"]
+    if not path:
+        raise click.UsageError("Pass --path or set CATALOG_SNAPSHOT_PATH")
+    while True:
+        started = time.monotonic()
+        try:
+            counts = build_catalog(db.session, path)
+        except Exception as e:
+            if not every:
+                raise
+            # Keep going: workers stop trusting a snapshot that gets too old (catalog.py)
+            click.echo(f"Catalog build failed: {e}", err=True)
+        else:
+            if not every:
+                click.echo(f"Catalog written to {path}: "
+                           + ", ".join(f"{n} {table}" for table, n in counts.items()))
+                return
+        finally:
+            # One read transaction per build, and no identity map kept between builds
+            db.session.remove()
+        time.sleep(max(0.0, every - (time.monotonic() - started)))
+
+
+# --------------------
+# Reconciliation
+# --------------------
+@click.command("reconcile-payments")
+@click.argument("statement", type=click.Path(exists=True, dir_okay=False))
+@click.option("--status", "statuses", multiple=True, default=("completed",), show_default=True,
+              help="Ledger payment statuses the statement covers (repeatable)")
+@click.option("--chunk-size", default=1000000, show_default=True, help="Rows per chunk on each side")
+@click.option("--show", default=10, show_default=True, help="Payments listed per kind of discrepancy")
+def reconcile_payments_command(statement, statuses, chunk_size, show):
+    """Check payments against a provider statement CSV; exits 1 on any discrepancy."""
+    try:
+        # numpy is only needed here, so the app itself doesn't pay for importing it
+        import reconcile
+    except ImportError as e:
+        raise click.ClickException(f"reconcile-payments needs numpy: {e}")
+
+    started = time.perf_counter()
+    try:
+        ids, cents = reconcile.load_statement(statement, chunk_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    result = reconcile.reconcile(ids, cents, reconcile.ledger_chunks(statuses, chunk_size))
+    for line in reconcile.report(result, show):
+        click.echo(line)
+    click.echo(f"Reconciled in {time.perf_counter() - started:.1f}s")
+    if reconcile.discrepancies(result):
+        sys.exit(1)
+
+
+# --------------------
+# Partitioning (PostgreSQL, opt-in)
+# --------------------
+@click.command("partition-tables")
+@click.option("--opportunity-partitions", default=OPPORTUNITY_PARTITIONS, show_default=True,
+              help="Hash partitions for opportunities, by organization_id")
+@click.option("--months-ahead", default=MONTHS_AHEAD, show_default=True,
+              help="Future months to create payments partitions for")
+@click.confirmation_option(prompt="This locks and rewrites opportunities and payments, one-way. Continue?")
+def partition_tables_command(opportunity_partitions, months_ahead):
+    """Convert opportunities and payments to partitioned tables."""
+    try:
+        converted = partition_tables(db.session.connection(), opportunity_partitions, months_ahead)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f"Partitioned: {', '.join(converted)}" if converted else "Already partitioned")
+
+
+@click.command("create-partitions")
+@click.option("--months-ahead", default=MONTHS_AHEAD, show_default=True,
+              help="Create payments partitions through this many months from now")
+def create_partitions_command(months_ahead):
+    """Create upcoming monthly payments partitions; schedule it monthly."""
+    try:
+        created = create_partitions(db.session.connection(), months_ahead)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f"Created {', '.join(created)}" if created else "Partitions already exist")
+
+
+def register_commands(app):
+    app.cli.add_command(archive_deleted_command)
+    app.cli.add_command(export_data_command)
+    app.cli.add_command(import_data_command)
+    app.cli.add_command(refresh_dashboards_command)
+    app.cli.add_command(recount_places_command)
+    app.cli.add_command(build_catalog_command)
+    app.cli.add_command(reconcile_payments_command)
+    app.cli.add_command(partition_tables_command)
+    app.cli.add_command(create_partitions_command)
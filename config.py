@@ -16,6 +16,21 @@ class Config:
         # Local development
         SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'volunteer.db')
     
+    # Optional read replicas (comma-separated URLs). GET traffic is spread over
+    # them; writes, and reads within REPLICA_STICKY_SECONDS of a client's last
+    # write, go to the primary.
+    REPLICA_URLS = [
+        url.strip().replace('postgres://', 'postgresql://', 1)
+        for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+        if url.strip()
+    ]
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+    # Proxies in front of the app that append to X-Forwarded-For (Render: one).
+    # request.remote_addr is the address the last of them saw; entries further
+    # left are client-supplied and never trusted. 0 when serving clients directly.
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+
     # Turn off tracking modifications (optional but recommended)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
@@ -23,3 +38,59 @@ class Config:
     # Generate a secure random key for production if not set
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
 
+    # Rate limiting: per-route token buckets keyed by client IP and acting user.
+    # "memory://" keeps buckets per worker; "sqlite:////tmp/ratelimit.db" shares
+    # them between every worker on the host.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', 'memory://')
+    RATELIMIT_BUDGETS = {
+        'api.login': '10/minute',
+        'api.register': '5/minute',
+        'api.apply': '30/minute',
+        'api.payments': '30/minute',
+        'payments.create_payment': '30/minute',
+    }
+
+    # Load shedding: answer 503 + Retry-After instead of queueing more work once a
+    # worker already holds this many requests, or a request has already waited
+    # this long in front of it (0 disables either check). Under gthread the
+    # count includes requests waiting for one of the worker's threads; sync
+    # workers handle one request at a time and rely on the queue time alone.
+    SHED_MAX_IN_FLIGHT = int(os.environ.get('SHED_MAX_IN_FLIGHT', 32))
+    SHED_MAX_QUEUE_MS = int(os.environ.get('SHED_MAX_QUEUE_MS', 2000))
+    SHED_RETRY_AFTER = int(os.environ.get('SHED_RETRY_AFTER', 1))
+
+    # Request coalescing for GET /opportunities and /organizations: concurrent
+    # identical requests in a worker share one query. With a storage URL
+    # ("sqlite:////tmp/coalesce.db"), workers on the host also share the last
+    # response and serve it, for up to COALESCE_MAX_STALE_SECONDS, while one
+    # of them holds a COALESCE_LOCK_SECONDS lock to refresh it after a write.
+    COALESCE_ENABLED = os.environ.get('COALESCE_ENABLED', 'true').lower() == 'true'
+    COALESCE_STORAGE_URL = os.environ.get('COALESCE_STORAGE_URL', '')
+    COALESCE_LOCK_SECONDS = float(os.environ.get('COALESCE_LOCK_SECONDS', 2))
+    COALESCE_MAX_STALE_SECONDS = float(os.environ.get('COALESCE_MAX_STALE_SECONDS', 30))
+
+    # Catalog snapshot (catalog.py): with a path ("/dev/shm/catalog.snap"),
+    # gunicorn rebuilds the catalog into that file every
+    # CATALOG_SNAPSHOT_INTERVAL seconds and all workers serve GET
+    # /opportunities, /organizations and their /<id> lookups from it
+    CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH', '')
+    CATALOG_SNAPSHOT_INTERVAL = float(os.environ.get('CATALOG_SNAPSHOT_INTERVAL', 5))
+
+    # Structured logs (logs.py): one JSON line per request on stdout, formatted
+    # and written by a background thread so a slow log pipeline never holds up
+    # a request. Past LOG_QUEUE_SIZE waiting lines, new ones are dropped and
+    # counted (0 writes on the request thread instead). The endpoints in
+    # LOG_SAMPLE_RATES log only that share of their fast, successful GET/HEAD
+    # requests; writes, errors and requests slower than LOG_SLOW_MS are always
+    # logged.
+    LOG_ENABLED = os.environ.get('LOG_ENABLED', 'true').lower() == 'true'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_SLOW_MS = float(os.environ.get('LOG_SLOW_MS', 1000))
+    LOG_SAMPLE_RATES = {
+        'api.opportunities': 0.1,
+        'api.organizations': 0.1,
+        'api.get_opportunity': 0.1,
+        'api.get_organization': 0.1,
+    }
@@ -0,0 +1,203 @@
+"""
+Shared pytest fixtures
+
+The schema is created once per test session, and every test runs inside a
+transaction that is rolled back afterwards, so tests never see each other's
+rows and never pay for create_all()/drop_all().
+
+By default the database is in-memory SQLite. Set TEST_DATABASE_URL to a
+PostgreSQL URL to run against Postgres instead: the schema is built once in a
+template database named after a hash of the schema, and each pytest-xdist
+worker gets its own copy of it.
+"""
+import hashlib
+import os
+from functools import partial
+
+import pytest
+from flask import has_request_context, request_tearing_down
+from flask.globals import app_ctx, request_ctx
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.pool import StaticPool
+from flask_sqlalchemy.session import Session
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from config import Config
+from extensions import db
+
+
+class TestConfig(Config):
+    __test__ = False  # not a test class, despite the name
+
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # One shared connection, so every thread sees the same in-memory database
+        "poolclass": StaticPool,
+        "connect_args": {"check_same_thread": False},
+    }
+    RATELIMIT_ENABLED = False
+    SHED_MAX_IN_FLIGHT = 0
+    SHED_MAX_QUEUE_MS = 0
+    LOG_ENABLED = False  # tests that look at log lines turn it on with their own stream
+
+
+class _TransactionSession(Session):
+    """Route every statement through the test's connection, whatever the bind key"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return self.bind
+
+
+def _enable_sqlite_savepoints(engine):
+    """
+    pysqlite defers BEGIN until the first write, which breaks SAVEPOINT. Take
+    over transaction control so the rollback at the end of a test is real.
+    https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl
+    """
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+def _session_scope():
+    # Like production: each request gets its own session, separate from the test's
+    if has_request_context():
+        return id(request_ctx._get_current_object())
+    return id(app_ctx._get_current_object())
+
+
+def _end_request_session(sender, **extra):
+    db.session.remove()
+
+
+def _worker_id(config):
+    # Set by pytest-xdist on its workers; "master" when running without it
+    return getattr(config, "workerinput", {}).get("workerid", "master")
+
+
+def _schema_hash():
+    """Short hash of the DDL create_all() emits, so a model change means a new template"""
+    dialect = postgresql.dialect()
+    ddl = []
+    for table in db.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl.extend(str(CreateIndex(index).compile(dialect=dialect))
+                   for index in sorted(table.indexes, key=lambda index: index.name))
+    return hashlib.sha1("\n".join(ddl).encode()).hexdigest()[:12]
+
+
+def _postgres_database(url, worker_id):
+    """
+    Build the schema once in `<name>_template_<schema hash>` and clone it for this worker.
+
+    CREATE DATABASE ... TEMPLATE copies files rather than replaying DDL, so a
+    fresh per-worker database costs milliseconds. An advisory lock stops
+    xdist workers from racing to build the template, and the hash in its
+    name means a template built from older models is never reused.
+    """
+    url = make_url(url)
+    template = f"{url.database}_template_{_schema_hash()}"
+    worker_db = f"{url.database}_{worker_id}"
+    admin = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": template})
+        try:
+            exists = conn.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": template})
+            if not exists:
+                conn.execute(text(f'CREATE DATABASE "{template}"'))
+                template_app = create_app(dict(SQLALCHEMY_DATABASE_URI=url.set(database=template).render_as_string(hide_password=False)))
+                with template_app.app_context():
+                    db.create_all()
+                    db.engine.dispose()
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{worker_db}"'))
+            conn.execute(text(f'CREATE DATABASE "{worker_db}" TEMPLATE "{template}"'))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": template})
+    admin.dispose()
+    return url.set(database=worker_db).render_as_string(hide_password=False)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _fast_password_hashing():
+    """scrypt costs ~100ms per hash by design; tests only need a valid hash"""
+    fast_hash = partial(generate_password_hash, method="pbkdf2:sha256:1")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("models.generate_password_hash", fast_hash)
+        mp.setattr("app.generate_password_hash", fast_hash)
+        yield
+
+
+@pytest.fixture(scope="session")
+def app(request):
+    """One app and one schema for the whole session"""
+    overrides = {}
+    url = os.environ.get("TEST_DATABASE_URL")
+    if url:
+        overrides = {
+            "SQLALCHEMY_DATABASE_URI": _postgres_database(url, _worker_id(request.config)),
+            "SQLALCHEMY_ENGINE_OPTIONS": {},
+        }
+
+    config = type("SessionTestConfig", (TestConfig,), overrides)
+    app = create_app(config)
+    with app.app_context():
+        if not url:
+            _enable_sqlite_savepoints(db.engine)
+            db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def _transaction(request):
+    """
+    Wrap each test in a transaction that is rolled back at the end.
+
+    Sessions join the outer transaction through SAVEPOINTs, so code under
+    test can commit() and rollback() freely without ending it. Requests made
+    through the test client get their own session, closed when the request
+    ends, so the test's identity map never hides what the database holds.
+    """
+    if "app" not in request.fixturenames:
+        yield
+        return
+
+    app = request.getfixturevalue("app")
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    original_session = db.session
+    db.session = db._make_scoped_session({
+        "class_": _TransactionSession,
+        "bind": connection,
+        "join_transaction_mode": "create_savepoint",
+        "scopefunc": _session_scope,
+    })
+    request_tearing_down.connect(_end_request_session, app)
+    try:
+        yield
+    finally:
+        request_tearing_down.disconnect(_end_request_session, app)
+        db.session.remove()
+        db.session = original_session
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def session(app):
+    return db.session
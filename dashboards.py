@@ -0,0 +1,285 @@
+"""
+Organization dashboards, served from the opportunity_summaries table
+
+GET /organizations/<id>/dashboard reads one organization row and its
+summary rows in a single query over indexed columns, instead of walking
+organizations -> opportunities -> applications/payments row by row.
+
+Staleness: every write that goes through an ORM session (the API, the ASGI
+app, seed.py) adds its difference to the summaries it touched in the same
+flush: +1/-1 on the counts and +/- the amount on the totals, one upsert per
+opportunity. Nothing is recounted, so a write costs the same however many
+applications and payments its opportunity already has, and concurrent
+writes add up instead of overwriting each other. Bulk imports recount what
+they loaded before committing. Writes that bypass both (raw SQL,
+database-level cascades) are only picked up by `flask refresh-dashboards`,
+the full recount. Schedule it (e.g. every 15 minutes); that interval is then
+the worst-case staleness.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import Blueprint, jsonify
+from sqlalchemy import bindparam, delete, event, func, inspect, literal, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import APPLICATION_STATUSES, Application, Opportunity, OpportunitySummary, Organization, Payment
+
+dashboards_bp = Blueprint("dashboards", __name__)
+
+
+# --------------------
+# Refresh
+# --------------------
+def _summary_select(where, now):
+    """One summary row per live opportunity matching `where`, as INSERT ... SELECT input"""
+    opportunities = Opportunity.__table__
+    applications = Application.__table__
+    payments = Payment.__table__
+
+    def count_applications(status=None):
+        query = select(func.count()).where(applications.c.opportunity_id == opportunities.c.id)
+        if status:
+            query = query.where(applications.c.status == status)
+        return query.scalar_subquery()
+
+    def live_payments(aggregate, status=None):
+        query = select(aggregate).where(
+            payments.c.opportunity_id == opportunities.c.id, payments.c.deleted_at.is_(None)
+        )
+        if status:
+            query = query.where(payments.c.payment_status == status)
+        return query.scalar_subquery()
+
+    return select(
+        opportunities.c.id,
+        opportunities.c.organization_id,
+        opportunities.c.title,
+        count_applications(),
+        *(count_applications(status) for status in APPLICATION_STATUSES),
+        live_payments(func.count()),
+        live_payments(func.coalesce(func.sum(payments.c.amount), 0), "completed"),
+        live_payments(func.coalesce(func.sum(payments.c.amount), 0), "pending"),
+        literal(now, OpportunitySummary.refreshed_at.type),
+    ).where(opportunities.c.deleted_at.is_(None), where)
+
+
+SUMMARY_COLUMNS = [
+    "opportunity_id", "organization_id", "title",
+    "applications_total", *(f"applications_{status}" for status in APPLICATION_STATUSES),
+    "payments_count", "payments_completed_amount", "payments_pending_amount", "refreshed_at",
+]
+# The columns a write adds its difference to
+COUNTED_COLUMNS = SUMMARY_COLUMNS[3:-1]
+
+
+def _upsert(connection, summaries):
+    return (postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert)(summaries)
+
+
+def refresh_summaries(connection, opportunity_ids=None, organization_ids=None):
+    """
+    Recompute summaries for some opportunities, some organizations, or
+    (with neither) everything. Runs on the caller's connection, so it commits
+    or rolls back with the writes it reflects.
+    """
+    summaries = OpportunitySummary.__table__
+    opportunities = Opportunity.__table__
+    if opportunity_ids is not None:
+        ids = sorted(opportunity_ids)
+        stale = summaries.c.opportunity_id.in_(ids)
+        source = opportunities.c.id.in_(ids)
+    elif organization_ids is not None:
+        ids = sorted(organization_ids)
+        stale = summaries.c.organization_id.in_(ids)
+        source = opportunities.c.organization_id.in_(ids)
+    else:
+        stale = source = true()
+
+    # Lock the opportunities first (FOR NO KEY UPDATE, so inserts that reference
+    # them are not blocked). Two transactions refreshing the same opportunity
+    # then take turns, and the second one's statements below start after the
+    # first committed, so READ COMMITTED counts its rows. The upsert can't hit
+    # a duplicate key the way DELETE + INSERT did when a concurrent
+    # transaction re-inserted the row the DELETE was waiting on
+    connection.execute(
+        select(opportunities.c.id).where(source).order_by(opportunities.c.id).with_for_update(key_share=True)
+    )
+    upsert = _upsert(connection, summaries).from_select(SUMMARY_COLUMNS, _summary_select(source, datetime.utcnow()))
+    connection.execute(upsert.on_conflict_do_update(
+        index_elements=[summaries.c.opportunity_id],
+        set_={column: upsert.excluded[column] for column in SUMMARY_COLUMNS[1:]},
+    ))
+    # Whatever was not just written belongs to a deleted (or moved) opportunity
+    live = select(opportunities.c.id).where(opportunities.c.deleted_at.is_(None), source)
+    connection.execute(delete(summaries).where(stale, summaries.c.opportunity_id.not_in(live)))
+
+
+def apply_deltas(connection, deltas):
+    """
+    Add {opportunity_id: Counter(column=difference)} to the summaries. Each
+    opportunity is one upsert of `column = column + difference`, which
+    PostgreSQL applies to the latest committed row, so concurrent writers
+    don't need to lock anything first. An opportunity without a summary row
+    gets one holding just the difference: correct for a new opportunity, and
+    for any other the next `flask refresh-dashboards` fixes it. Soft-deleted
+    opportunities are skipped.
+    """
+    summaries = OpportunitySummary.__table__
+    opportunities = Opportunity.__table__
+    source = select(
+        opportunities.c.id,
+        opportunities.c.organization_id,
+        opportunities.c.title,
+        *(bindparam(f"delta_{column}", type_=summaries.c[column].type) for column in COUNTED_COLUMNS),
+        bindparam("refreshed_at", type_=summaries.c.refreshed_at.type),
+    ).where(opportunities.c.id == bindparam("delta_opportunity_id"), opportunities.c.deleted_at.is_(None))
+    upsert = _upsert(connection, summaries).from_select(SUMMARY_COLUMNS, source)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[summaries.c.opportunity_id],
+        set_={
+            # Renames and moves between organizations come along for free
+            "organization_id": upsert.excluded.organization_id,
+            "title": upsert.excluded.title,
+            "refreshed_at": upsert.excluded.refreshed_at,
+            **{column: summaries.c[column] + upsert.excluded[column] for column in COUNTED_COLUMNS},
+        },
+    )
+    now = datetime.utcnow()
+    # In id order, like refresh_summaries, so two writers lock rows in the same order
+    connection.execute(upsert, [
+        {"delta_opportunity_id": opportunity_id, "refreshed_at": now,
+         **{f"delta_{column}": difference[column] for column in COUNTED_COLUMNS}}
+        for opportunity_id, difference in sorted(deltas.items())
+    ])
+
+
+def _before(obj, key):
+    """An attribute's value before this flush (see active_history in models.py)"""
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        # Was None, or for deleted_at (no active_history) not loaded: soft
+        # deletes only reach live rows, so that is None as well
+        return None
+    return getattr(obj, key)
+
+
+def _counted(obj, value):
+    """The summary `obj` counts towards and what it adds there, reading its attributes through `value`"""
+    if isinstance(obj, Application):
+        counts = Counter(applications_total=1)
+        if value(obj, "status") in APPLICATION_STATUSES:
+            counts[f"applications_{value(obj, 'status')}"] = 1
+        return value(obj, "opportunity_id"), counts
+    if value(obj, "deleted_at") is not None:
+        return None, Counter()
+    counts = Counter(payments_count=1)
+    if value(obj, "payment_status") in ("completed", "pending"):
+        counts[f"payments_{value(obj, 'payment_status')}_amount"] = value(obj, "amount")
+    return value(obj, "opportunity_id"), counts
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_summary_deltas(session, flush_context):
+    deltas = defaultdict(Counter)
+    # Opportunities whose own row needs writing even when nothing is counted
+    rewritten, gone, restored = set(), set(), set()
+
+    def add(opportunity_id, counts, sign):
+        if opportunity_id is not None:
+            for column, difference in counts.items():
+                deltas[opportunity_id][column] += sign * difference
+
+    for obj in session.new:
+        if isinstance(obj, Opportunity):
+            # Its summary row starts at zero
+            rewritten.add(obj.id)
+        elif isinstance(obj, (Application, Payment)):
+            add(*_counted(obj, getattr), +1)
+    for obj in session.dirty:
+        if isinstance(obj, Opportunity):
+            if inspect(obj).attrs.deleted_at.history.added:
+                (gone if obj.deleted_at is not None else restored).add(obj.id)
+            else:
+                # Renamed or moved to another organization
+                rewritten.add(obj.id)
+        elif isinstance(obj, (Application, Payment)) and session.is_modified(obj):
+            add(*_counted(obj, _before), -1)
+            add(*_counted(obj, getattr), +1)
+    for obj in session.deleted:
+        if isinstance(obj, Opportunity):
+            gone.add(obj.id)
+        elif isinstance(obj, (Application, Payment)):
+            add(*_counted(obj, _before), -1)
+
+    # An edit that changes nothing counted (a motivation message, say) cancels out
+    changed = {
+        opportunity_id: deltas[opportunity_id]
+        for opportunity_id in rewritten | set(deltas)
+        if opportunity_id not in gone | restored
+        and (opportunity_id in rewritten or any(deltas[opportunity_id].values()))
+    }
+    if not (changed or gone or restored):
+        return
+    connection = session.connection()
+    if changed:
+        apply_deltas(connection, changed)
+    if restored:
+        # What changed while it was deleted was never counted
+        refresh_summaries(connection, opportunity_ids=restored)
+    if gone:
+        summaries = OpportunitySummary.__table__
+        connection.execute(delete(summaries).where(summaries.c.opportunity_id.in_(sorted(gone))))
+
+
+# --------------------
+# Route
+# --------------------
+def dashboard(organization, summaries):
+    rows = [summary.to_dict() for summary in summaries]
+
+    def total(section, key):
+        return sum(row[section][key] for row in rows)
+
+    def amount(column):
+        # Summed as Decimal, rounded to a float once
+        return float(sum((getattr(summary, column) for summary in summaries), 0))
+
+    # The oldest summary bounds how stale this dashboard can be
+    oldest = min((summary.refreshed_at for summary in summaries), default=None)
+    return {
+        "organization": organization.to_dict(),
+        "opportunities": rows,
+        "totals": {
+            "opportunities": len(rows),
+            "applications": {key: total("applications", key) for key in ("total", *APPLICATION_STATUSES)},
+            "payments": {
+                "count": total("payments", "count"),
+                "completed_amount": amount("payments_completed_amount"),
+                "pending_amount": amount("payments_pending_amount"),
+            },
+        },
+        "refreshed_at": oldest.isoformat() if oldest else None,
+    }
+
+
+def dashboard_query(organization_id):
+    """The organization and its summaries in one statement: a primary key plus an index lookup"""
+    return (
+        select(Organization, OpportunitySummary)
+        .outerjoin(OpportunitySummary, OpportunitySummary.organization_id == Organization.id)
+        .where(Organization.id == organization_id)
+        .order_by(OpportunitySummary.opportunity_id)
+    )
+
+
+@dashboards_bp.route("/organizations/<int:id>/dashboard", methods=["GET"])
+def organization_dashboard(id):
+    rows = db.session.execute(dashboard_query(id)).all()
+    if not rows:
+        return jsonify({"error": "Organization not found"}), 404
+    return jsonify(dashboard(rows[0][0], [summary for _, summary in rows if summary is not None]))
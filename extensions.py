@@ -1,3 +1,28 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from catalog import CatalogSnapshot
+from coalescing import Coalescer, invalidate_on_commit
+from logs import RequestLogger
+from replicas import ReplicaRouter, RoutingSession
+from throttling import LoadShedder, RateLimiter
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+replicas = ReplicaRouter()
+limiter = RateLimiter()
+shedder = LoadShedder()
+coalescer = Coalescer()
+catalog = CatalogSnapshot()
+request_logger = RequestLogger()
+invalidate_on_commit(coalescer, catalog)
+
 
-db = SQLAlchemy()
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE (and every other FK rule) unless asked
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
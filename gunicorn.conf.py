@@ -0,0 +1,162 @@
+"""
+Gunicorn settings for Volunteer Connect
+
+    python -m gunicorn -c gunicorn.conf.py
+
+Worker and thread counts are derived from the CPUs and memory the container
+may actually use (cgroup limits, not the host's). Every derived value can
+be overridden from the environment:
+
+    GUNICORN_WORKER_CLASS   gthread (default), sync, gevent or uvicorn
+    WEB_CONCURRENCY         worker processes
+    GUNICORN_THREADS        threads per worker (gthread only)
+    GUNICORN_WORKER_MB      memory budgeted per worker when sizing (default 128)
+    GUNICORN_MAX_REQUESTS   recycle a worker after this many requests (default 1000)
+    GUNICORN_TIMEOUT        seconds before a silent worker is killed (default 30)
+
+With CATALOG_SNAPSHOT_PATH set, the master also runs `flask build-catalog
+--every CATALOG_SNAPSHOT_INTERVAL` as a child process, so the catalog file
+the workers map (catalog.py) stays current.
+
+`uvicorn` serves asgi.py instead of app.py. `gevent` needs `pip install
+gevent psycogreen`; without psycogreen every query blocks the whole worker.
+"""
+import math
+import os
+import subprocess
+import sys
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "gevent": "gevent",
+    "uvicorn": "uvicorn.workers.UvicornWorker",
+}
+
+
+# --------------------
+# Container limits
+# --------------------
+def cpu_limit():
+    """CPUs available to this process: the cgroup quota if set, else the affinity mask"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_limit():
+    """Bytes available to this container (cgroup v2, then v1, then physical RAM), or None"""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # An unlimited v1 cgroup reports a huge sentinel rather than "max"
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_workers(kind, cpus, memory, worker_mb):
+    # Threads, greenlets and the event loop overlap I/O within a worker, so
+    # those classes need ~1 process per CPU; sync workers need the classic 2n+1
+    by_cpu = 2 * cpus + 1 if kind == "sync" else cpus + 1
+    if memory is None:
+        return by_cpu
+    # Leave a quarter of the container for the master, page cache and spikes
+    by_memory = int(memory * 0.75 // (worker_mb * 1024 * 1024))
+    return max(1, min(by_cpu, by_memory))
+
+
+# --------------------
+# Settings
+# --------------------
+kind = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+if kind not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {kind!r}")
+
+wsgi_app = "asgi:app" if kind == "uvicorn" else "app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = WORKER_CLASSES[kind]
+workers = int(os.environ.get("WEB_CONCURRENCY") or default_workers(
+    kind, cpu_limit(), memory_limit(), int(os.environ.get("GUNICORN_WORKER_MB", 128))
+))
+# Stay at or below the SQLAlchemy pool (5 + 10 overflow) so threads never wait on it
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) if kind == "gthread" else 1
+worker_connections = 200
+
+# Bound slow memory growth: recycle workers, staggered so they don't all restart at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = timeout
+# Render's proxy reuses upstream connections; keep them a little longer than the default 2s
+keepalive = 5
+
+# Import the app once in the master so workers fork warm and share its pages.
+# gevent must monkey-patch before the app imports socket/ssl, so it loads per worker.
+preload_app = kind != "gevent"
+
+# Worker heartbeats are file writes; keep them off a possibly slow disk
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+errorlog = "-"
+
+
+# --------------------
+# Hooks
+# --------------------
+catalog_builder = None
+
+
+def when_ready(server):
+    """Start the catalog snapshot builder, once, next to the workers"""
+    global catalog_builder
+    if os.environ.get("CATALOG_SNAPSHOT_PATH"):
+        catalog_builder = subprocess.Popen([
+            sys.executable, "-m", "flask", "--app", "app", "build-catalog",
+            "--every", os.environ.get("CATALOG_SNAPSHOT_INTERVAL", "5"),
+        ])
+
+
+def on_exit(server):
+    if catalog_builder is not None:
+        catalog_builder.terminate()
+        catalog_builder.wait()
+
+
+def post_fork(server, worker):
+    """Workers must not reuse connections, locks or counters inherited from the master"""
+    if kind == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen is not installed; database calls will block gevent workers")
+
+    # Only the preloaded module has anything to reset
+    app_module = sys.modules.get("app")
+    if app_module is not None and "app" in vars(app_module):
+        app_module.reset_after_fork(app_module.app)
+    if kind == "gthread":
+        # Shed on what the worker has accepted (running + waiting for a thread),
+        # not just what its threads are running
+        from extensions import shedder
+        shedder.count_with(lambda: len(worker.futures))
+    asgi_module = sys.modules.get("asgi")
+    if asgi_module is not None:
+        asgi_module.reset_after_fork()
@@ -0,0 +1,242 @@
+"""
+Structured JSON logs that never hold up a request
+
+Records go through the "volunteer" logger: "volunteer.access" for one line
+per request, "volunteer.audit" for payment status changes. The request
+thread only stamps a record with its request id and puts it on an in-memory
+queue; a writer thread per worker formats it as one JSON line and writes it
+to stdout. When stdout stalls (the log pipeline pushing back), the queue
+fills up and further records are dropped and counted instead of making
+requests wait; the next record that gets through carries the count as
+"dropped". LOG_QUEUE_SIZE=0 formats and writes on the request thread instead.
+
+Every request gets an id: the caller's X-Request-ID when it looks like one,
+otherwise a fresh one. Flask keeps it in g.request_id (the ASGI app in a
+context variable), every record logged during the request carries it, and
+the response echoes it in X-Request-ID.
+
+Endpoints listed in LOG_SAMPLE_RATES log only that share of their
+successful reads (GET and HEAD); writes, errors and requests slower than
+LOG_SLOW_MS are always logged. A sampled line carries "sample_rate", so counts can be scaled back up.
+Log values, not live objects: arguments are formatted later, on another thread.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler
+
+from flask import g, has_app_context, request
+
+LOGGER = "volunteer"
+# How long stop() waits for the writer to drain the queue
+STOP_SECONDS = 2.0
+# Only reads are sampled: one endpoint may also take writes (POST /opportunities)
+SAMPLED_METHODS = frozenset({"GET", "HEAD"})
+
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+# The ASGI app's request id; Flask keeps it in g
+request_id_var = ContextVar("request_id", default=None)
+
+access_log = logging.getLogger(LOGGER + ".access")
+audit_log = logging.getLogger(LOGGER + ".audit")
+
+
+def request_id_from(header):
+    """The caller's X-Request-ID if it looks like one, otherwise a new id"""
+    if header and _REQUEST_ID.fullmatch(header):
+        return header
+    return uuid.uuid4().hex
+
+
+def current_request_id():
+    """The id of the request being served on this thread or task, or None"""
+    request_id = request_id_var.get()
+    if request_id is None and has_app_context():
+        request_id = g.get("request_id")
+    return request_id
+
+
+def _stamp_request_id(record):
+    # A handler filter: runs on the request thread, where g and the context variable are
+    record.request_id = current_request_id()
+    return True
+
+
+# --------------------
+# Formatting and writing
+# --------------------
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per line: time, level, logger, message, request id, then the record's `fields`"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + ".%03dZ" % record.msecs,
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if getattr(record, "dropped", 0):
+            entry["dropped"] = record.dropped
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Enqueues records as they are, and drops them rather than wait for room"""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The default formats here, on the request thread; the writer does it instead
+        return record
+
+    def enqueue(self, record):
+        # Unlocked, so the count is approximate under contention
+        dropped, self.dropped = self.dropped, 0
+        record.dropped = dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += dropped + 1
+
+
+class _Writer(threading.Thread):
+    """Takes records off the queue and hands them to the output handler, until it reads None"""
+
+    def __init__(self, records, handler):
+        super().__init__(name="log-writer", daemon=True)
+        self.records = records
+        self.handler = handler
+
+    def run(self):
+        while True:
+            record = self.records.get()
+            if record is None:
+                return
+            self.handler.handle(record)
+
+
+# --------------------
+# Request logging
+# --------------------
+class RequestLogger:
+    """Request ids, sampled access lines and the non-blocking handler behind the "volunteer" logger"""
+
+    def __init__(self, app=None):
+        self.logger = logging.getLogger(LOGGER)
+        self.logger.propagate = False
+        self.enabled = False
+        self.sample_rates = {}
+        self.slow_ms = 1000.0
+        self.queue_size = 10000
+        self.stream = None
+        self.handler = None
+        self.writer = None
+        atexit.register(self.stop)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("LOG_ENABLED", True)
+        app.config.setdefault("LOG_LEVEL", "INFO")
+        app.config.setdefault("LOG_QUEUE_SIZE", 10000)
+        app.config.setdefault("LOG_SLOW_MS", 1000)
+        app.config.setdefault("LOG_SAMPLE_RATES", {})
+        self.configure(app.config)
+        app.extensions["request_logger"] = self
+        # Ahead of the load shedder and the rate limiter, so requests they turn away get an id too
+        app.before_request_funcs.setdefault(None, []).insert(0, self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.end_request)
+
+    def configure(self, config, stream=None):
+        """Apply LOG_* settings from a config mapping (the ASGI app has no Flask app); `stream` defaults to stdout"""
+        self.enabled = bool(config.get("LOG_ENABLED", True))
+        self.sample_rates = dict(config.get("LOG_SAMPLE_RATES") or {})
+        self.slow_ms = float(config.get("LOG_SLOW_MS", 1000))
+        self.queue_size = int(config.get("LOG_QUEUE_SIZE", 10000))
+        self.stream = stream
+        self.logger.setLevel(config.get("LOG_LEVEL", "INFO"))
+        self._start()
+
+    def _start(self):
+        self.stop()
+        if not self.enabled:
+            return
+        output = logging.StreamHandler(self.stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        if self.queue_size > 0:
+            records = queue.Queue(self.queue_size)
+            self.handler = _DroppingQueueHandler(records)
+            self.writer = _Writer(records, output)
+            self.writer.start()
+        else:
+            self.handler = output
+        self.handler.addFilter(_stamp_request_id)
+        self.logger.addHandler(self.handler)
+
+    def stop(self):
+        """Write out what is queued (waiting up to STOP_SECONDS) and detach the handler"""
+        handler, writer = self.handler, self.writer
+        self.handler = self.writer = None
+        if handler is not None:
+            self.logger.removeHandler(handler)
+        if writer is not None:
+            try:
+                writer.records.put(None, timeout=STOP_SECONDS)
+            except queue.Full:
+                return
+            writer.join(STOP_SECONDS)
+
+    def after_fork(self):
+        # The writer thread stayed behind in the parent, and its queue may hold
+        # a lock the parent had taken when it forked
+        self.handler = self.writer = None
+        self.logger.handlers = []
+        self._start()
+
+    def access(self, method, path, endpoint, status, duration_ms, remote_addr):
+        """Log one request, unless sampling skips it"""
+        if not self.enabled:
+            return
+        rate = self.sample_rates.get(endpoint, 1.0) if method in SAMPLED_METHODS else 1.0
+        if status >= 400 or duration_ms >= self.slow_ms:
+            rate = 1.0
+        elif rate < 1.0 and random.random() >= rate:
+            return
+        fields = {"method": method, "path": path, "endpoint": endpoint, "status": status,
+                  "duration_ms": round(duration_ms, 2), "remote_addr": remote_addr}
+        if rate < 1.0:
+            fields["sample_rate"] = rate
+        access_log.info("%s %s %s", method, path, status, extra={"fields": fields})
+
+    def start_request(self):
+        g.request_id = request_id_from(request.headers.get("X-Request-ID"))
+        g._log_started = time.perf_counter()
+
+    def finish_request(self, response):
+        request_id = g.get("request_id")
+        if request_id is None:
+            return response
+        response.headers["X-Request-ID"] = request_id
+        self.access(request.method, request.path, request.endpoint, response.status_code,
+                    (time.perf_counter() - g._log_started) * 1000.0, request.remote_addr)
+        return response
+
+    def end_request(self, exc=None):
+        g.pop("request_id", None)
+        g.pop("_log_started", None)
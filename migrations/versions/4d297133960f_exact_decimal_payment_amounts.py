@@ -0,0 +1,52 @@
+"""Exact decimal payment amounts
+
+Payment amounts (and the dashboard sums of them) move from binary floats to
+NUMERIC, rounding each existing value to cents on the way. On PostgreSQL
+ALTER COLUMN ... TYPE rewrites the table under an exclusive lock, so run it
+in a maintenance window on a large payments table.
+
+Revision ID: 4d297133960f
+Revises: cbc96eeca95d
+Create Date: 2026-10-19 15:10:40.569840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d297133960f'
+down_revision = 'cbc96eeca95d'
+branch_labels = None
+depends_on = None
+
+# (table, column, precision, nullable)
+AMOUNTS = [
+    ('payments', 'amount', 12, False),
+    ('payments_archive', 'amount', 12, True),
+    ('opportunity_summaries', 'payments_completed_amount', 14, False),
+    ('opportunity_summaries', 'payments_pending_amount', 14, False),
+]
+
+
+def upgrade():
+    postgresql = op.get_context().dialect.name == 'postgresql'
+    for table, column, precision, nullable in AMOUNTS:
+        if not postgresql:
+            # SQLite keeps the stored REAL through the rebuild; round it first
+            op.execute(f'UPDATE {table} SET {column} = round({column}, 2)')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                   existing_type=sa.FLOAT(),
+                   type_=sa.Numeric(precision=precision, scale=2),
+                   existing_nullable=nullable,
+                   postgresql_using=f'round({column}::numeric, 2)')
+
+
+def downgrade():
+    for table, column, precision, nullable in reversed(AMOUNTS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                   existing_type=sa.Numeric(precision=precision, scale=2),
+                   type_=sa.FLOAT(),
+                   existing_nullable=nullable)
@@ -0,0 +1,37 @@
+"""Applications archive
+
+`flask archive-deleted` now moves an archived opportunity's applications to
+applications_archive instead of letting ON DELETE CASCADE remove them.
+Applications already lost that way are not recoverable.
+
+Revision ID: 6dc479ac3f32
+Revises: 913bb624c2fb
+Create Date: 2026-10-19 17:05:12.408311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6dc479ac3f32'
+down_revision = '913bb624c2fb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('applications_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('opportunity_id', sa.Integer(), nullable=True),
+    sa.Column('motivation_message', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('applied_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('applications_archive')
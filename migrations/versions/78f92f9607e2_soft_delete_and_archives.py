@@ -0,0 +1,107 @@
+"""Soft delete and archives
+
+Opportunities and payments get a deleted_at column, the partial indexes over
+live and soft-deleted rows, and the opportunities_archive/payments_archive
+tables `flask archive-deleted` moves old soft-deleted rows into. Foreign keys
+gain their ON DELETE actions, so removing a user, organization or opportunity
+is one statement for the database to cascade instead of one per child row.
+
+Revision ID: 78f92f9607e2
+Revises: e7414e0f5e75
+Create Date: 2026-10-19 15:02:31.774210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '78f92f9607e2'
+down_revision = 'e7414e0f5e75'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table, ON DELETE). PostgreSQL named these
+# constraints <table>_<column>_fkey; db.create_all() left them unnamed on
+# SQLite, so the convention below gives them the same names there
+FOREIGN_KEYS = [
+    ('organizations', 'owner_id', 'users', 'CASCADE'),
+    ('opportunities', 'organization_id', 'organizations', 'CASCADE'),
+    ('opportunities', 'created_by', 'users', 'SET NULL'),
+    ('applications', 'user_id', 'users', 'CASCADE'),
+    ('applications', 'opportunity_id', 'opportunities', 'CASCADE'),
+    ('payments', 'user_id', 'users', 'CASCADE'),
+    ('payments', 'opportunity_id', 'opportunities', 'CASCADE'),
+]
+FK_NAMES = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+SOFT_DELETED = ['opportunities', 'payments']
+
+# (name, table, column, WHERE)
+PARTIAL_INDEXES = [
+    ('ix_opportunities_deleted_at', 'opportunities', 'deleted_at', 'deleted_at IS NOT NULL'),
+    ('ix_opportunities_live_created_at', 'opportunities', 'created_at', 'deleted_at IS NULL'),
+    ('ix_opportunities_live_organization_id', 'opportunities', 'organization_id', 'deleted_at IS NULL'),
+    ('ix_payments_deleted_at', 'payments', 'deleted_at', 'deleted_at IS NOT NULL'),
+    ('ix_payments_live_opportunity_id', 'payments', 'opportunity_id', 'deleted_at IS NULL'),
+    ('ix_payments_live_user_id', 'payments', 'user_id', 'deleted_at IS NULL'),
+]
+
+
+def _set_on_delete(table, ondelete):
+    # Before the partial indexes exist: on SQLite the batch rebuilds the table
+    with op.batch_alter_table(table, naming_convention=FK_NAMES) as batch_op:
+        for fk_table, column, referent, action in FOREIGN_KEYS:
+            if fk_table == table:
+                name = f'{table}_{column}_fkey'
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referent, [column], ['id'],
+                                            ondelete=action if ondelete else None)
+
+
+def upgrade():
+    op.create_table('opportunities_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('organization_id', sa.Integer(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('payments_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('opportunity_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('payment_status', sa.String(), nullable=True),
+    sa.Column('payment_date', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    for table in ['organizations', 'opportunities', 'applications', 'payments']:
+        _set_on_delete(table, ondelete=True)
+    for table in SOFT_DELETED:
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    for name, table, column, where in PARTIAL_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_where=sa.text(where), sqlite_where=sa.text(where))
+
+
+def downgrade():
+    for name, table, column, where in reversed(PARTIAL_INDEXES):
+        op.drop_index(name, table_name=table)
+    for table in reversed(SOFT_DELETED):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('deleted_at')
+    for table in ['payments', 'applications', 'opportunities', 'organizations']:
+        _set_on_delete(table, ondelete=False)
+
+    op.drop_table('payments_archive')
+    op.drop_table('opportunities_archive')
@@ -0,0 +1,45 @@
+"""Payment audit trail
+
+A payment_audit table with one row per change of a payment's status,
+written alongside the change itself. Existing payments get no rows: their
+history before this revision is unknown.
+
+Revision ID: 913bb624c2fb
+Revises: fd2e185df253
+Create Date: 2026-10-19 16:26:30.211878
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '913bb624c2fb'
+down_revision = 'fd2e185df253'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_audit',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=False),
+    sa.Column('old_status', sa.String(), nullable=True),
+    sa.Column('new_status', sa.String(), nullable=True),
+    sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=True),
+    sa.Column('request_id', sa.String(length=128), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('payment_audit', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_payment_audit_changed_at'), ['changed_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_payment_audit_payment_id'), ['payment_id'], unique=False)
+
+
+
+def downgrade():
+    with op.batch_alter_table('payment_audit', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payment_audit_payment_id'))
+        batch_op.drop_index(batch_op.f('ix_payment_audit_changed_at'))
+
+    op.drop_table('payment_audit')
@@ -0,0 +1,53 @@
+"""Foreign key and time column indexes
+
+Every foreign key column gets an index (ON DELETE cascades and joins look
+rows up by it), and so do the creation/payment timestamps that lists and
+reports filter and sort by. On PostgreSQL they are built with CREATE INDEX
+CONCURRENTLY outside a transaction, so tables stay writable while they
+build. If a build fails it leaves an INVALID index behind: drop it and
+rerun `flask db upgrade`.
+
+Revision ID: cbc96eeca95d
+Revises: 3f1db07c808c
+Create Date: 2026-10-19 15:07:23.933069
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cbc96eeca95d'
+down_revision = '3f1db07c808c'
+branch_labels = None
+depends_on = None
+
+
+# (table, column) pairs; index names follow SQLAlchemy's ix_<table>_<column>
+INDEXES = [
+    ('applications', 'user_id'),
+    ('applications', 'opportunity_id'),
+    ('applications', 'applied_at'),
+    ('opportunities', 'organization_id'),
+    ('opportunities', 'created_by'),
+    ('organizations', 'owner_id'),
+    ('organizations', 'created_at'),
+    ('payments', 'user_id'),
+    ('payments', 'opportunity_id'),
+    ('payments', 'payment_date'),
+    ('users', 'created_at'),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for table, column in INDEXES:
+            op.create_index(f'ix_{table}_{column}', table, [column], unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table, column in reversed(INDEXES):
+            op.drop_index(f'ix_{table}_{column}', table_name=table,
+                          postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,74 @@
+"""Case-insensitive unique email
+
+Users whose emails differ only in case or surrounding whitespace are merged
+into the oldest account: their organizations, opportunities, applications
+and payments move to it and the newer rows are deleted. Every email is then
+stored trimmed and lower-cased, and the plain unique constraint on email is
+replaced by a unique index on lower(email). That index is built in the
+migration's transaction, not CONCURRENTLY like the ones in cbc96eeca95d.
+
+Revision ID: f2bc2bb8de0b
+Revises: 78f92f9607e2
+Create Date: 2026-10-19 15:02:43.118967
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2bc2bb8de0b'
+down_revision = '78f92f9607e2'
+branch_labels = None
+depends_on = None
+
+# Every column that points at users.id
+USER_REFERENCES = [
+    ('organizations', 'owner_id'),
+    ('opportunities', 'created_by'),
+    ('applications', 'user_id'),
+    ('payments', 'user_id'),
+]
+
+# db.create_all() left the constraint unnamed; this names it on SQLite, where
+# it has to be dropped by rebuilding the table
+UNNAMED_UNIQUE = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def upgrade():
+    # Plain SQL throughout, so `flask db upgrade --sql` can print it too
+    op.execute(
+        'CREATE TEMPORARY TABLE user_merges AS '
+        'SELECT u.id AS duplicate, k.survivor FROM users u JOIN ('
+        '  SELECT lower(trim(email)) AS email_key, MIN(id) AS survivor FROM users'
+        '  GROUP BY lower(trim(email)) HAVING COUNT(*) > 1'
+        ') k ON lower(trim(u.email)) = k.email_key '
+        'WHERE u.id <> k.survivor'
+    )
+    for table, column in USER_REFERENCES:
+        op.execute(
+            f'UPDATE {table} SET {column} = (SELECT survivor FROM user_merges WHERE duplicate = {table}.{column}) '
+            f'WHERE {column} IN (SELECT duplicate FROM user_merges)'
+        )
+    op.execute('DELETE FROM users WHERE id IN (SELECT duplicate FROM user_merges)')
+    op.execute('DROP TABLE user_merges')
+    op.execute('UPDATE users SET email = lower(trim(email)) WHERE email <> lower(trim(email))')
+
+    if op.get_context().dialect.name == 'postgresql':
+        op.drop_constraint('users_email_key', 'users', type_='unique')
+    else:
+        with op.batch_alter_table('users', naming_convention=UNNAMED_UNIQUE) as batch_op:
+            batch_op.drop_constraint('uq_users_email', type_='unique')
+    # Deliberately not CONCURRENTLY: it must commit together with the dedupe,
+    # or a sign-up between the two could reintroduce a duplicate and fail the build
+    op.create_index('ux_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    # Merged accounts are not split apart again
+    op.drop_index('ux_users_email_lower', table_name='users')
+    if op.get_context().dialect.name == 'postgresql':
+        op.create_unique_constraint('users_email_key', 'users', ['email'])
+    else:
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.create_unique_constraint('uq_users_email', ['email'])
@@ -0,0 +1,70 @@
+"""Opportunity capacity and waitlist
+
+Opportunities get an optional capacity and a count of the places taken
+(pending and accepted applications), backfilled from the existing rows.
+Every existing opportunity stays unlimited. Dashboard summaries count
+waitlisted applications, and a partial index keeps each waitlist in
+promotion order. On PostgreSQL that index is built with CREATE INDEX
+CONCURRENTLY outside a transaction.
+
+Revision ID: fd2e185df253
+Revises: 4d297133960f
+Create Date: 2026-10-19 16:07:15.068987
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fd2e185df253'
+down_revision = '4d297133960f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('opportunities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('capacity', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('filled', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE opportunities SET filled = (SELECT count(*) FROM applications a '
+        "WHERE a.opportunity_id = opportunities.id AND a.status IN ('pending', 'accepted'))"
+    )
+    with op.batch_alter_table('opportunities', schema=None) as batch_op:
+        batch_op.create_check_constraint('ck_opportunities_filled_capacity', 'capacity IS NULL OR filled <= capacity')
+
+    with op.batch_alter_table('opportunities_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('capacity', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('filled', sa.Integer(), nullable=True))
+
+    # Nothing is waitlisted yet, so 0 is the right count for every summary
+    with op.batch_alter_table('opportunity_summaries', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('applications_waitlisted', sa.Integer(), server_default='0', nullable=False))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_applications_waitlist', 'applications', ['opportunity_id', 'applied_at', 'id'],
+                        unique=False, postgresql_where=sa.text("status = 'waitlisted'"),
+                        sqlite_where=sa.text("status = 'waitlisted'"),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_applications_waitlist', table_name='applications',
+                      postgresql_concurrently=True, if_exists=True)
+
+    # Waitlisted applications become pending again, as they were before waitlists
+    op.execute("UPDATE applications SET status = 'pending' WHERE status = 'waitlisted'")
+
+    with op.batch_alter_table('opportunity_summaries', schema=None) as batch_op:
+        batch_op.drop_column('applications_waitlisted')
+
+    with op.batch_alter_table('opportunities_archive', schema=None) as batch_op:
+        batch_op.drop_column('filled')
+        batch_op.drop_column('capacity')
+
+    with op.batch_alter_table('opportunities', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_opportunities_filled_capacity', type_='check')
+        batch_op.drop_column('filled')
+        batch_op.drop_column('capacity')
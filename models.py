@@ -1,25 +1,98 @@
 from extensions import db
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy.orm import validates
+from logs import audit_log, current_request_id
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session, column_property, validates, with_loader_criteria
+
+
+# --------------------------
+# Soft delete
+# --------------------------
+class SoftDeleteMixin:
+    """
+    Rows are marked with deleted_at instead of being removed. Every ORM query
+    hides them automatically (see _hide_soft_deleted below); pass
+    .execution_options(include_deleted=True) to see them anyway.
+    """
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
+    def soft_delete(self):
+        self.deleted_at = datetime.utcnow()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_soft_deleted(execute_state):
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                SoftDeleteMixin,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True,
+            )
+        )
+
+
+def live_index(name, *columns):
+    """Partial index over live (not soft-deleted) rows only"""
+    where = text("deleted_at IS NULL")
+    return db.Index(name, *columns, postgresql_where=where, sqlite_where=where)
 
 # --------------------------
 # User Model
 # --------------------------
+EMAIL_INDEX = "ux_users_email_lower"
+
+
+def normalize_email(email):
+    """Emails are stored and looked up trimmed and lower-cased"""
+    return email.strip().lower() if isinstance(email, str) else email
+
+
+def is_duplicate_email(error):
+    """True if an IntegrityError was raised by the unique email index"""
+    return EMAIL_INDEX in str(error.orig)
+
+
+USER_ROLES = ("volunteer", "organization")
+
+
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        # Unique on lower(email), so lookups by lower(email) are index scans and
+        # rows written around the ORM still can't differ only in case
+        db.Index(EMAIL_INDEX, db.func.lower(db.text("email")), unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
-    email = db.Column(db.String, unique=True, nullable=False)
+    email = db.Column(db.String, nullable=False)
     password_hash = db.Column(db.String, nullable=False)
-    role = db.Column(db.String, nullable=False)  # volunteer | organization
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    role = db.Column(db.String, nullable=False)  # one of USER_ROLES
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
-    organizations = db.relationship("Organization", backref="owner", cascade="all, delete")
-    applications = db.relationship("Application", backref="user", cascade="all, delete")
-    payments = db.relationship("Payment", backref="user", cascade="all, delete")
+    # passive_deletes: the database's ON DELETE CASCADE removes children in one
+    # statement instead of SQLAlchemy loading and deleting them row by row
+    organizations = db.relationship("Organization", backref="owner", cascade="all, delete", passive_deletes=True)
+    applications = db.relationship("Application", backref="user", cascade="all, delete", passive_deletes=True)
+    payments = db.relationship("Payment", backref="user", cascade="all, delete", passive_deletes=True)
+
+    @validates("email")
+    def validate_email(self, key, email):
+        return normalize_email(email)
+
+    @classmethod
+    def email_matches(cls, email):
+        """Filter clause for a case-insensitive lookup, served by the lower(email) index"""
+        return db.func.lower(cls.email) == normalize_email(email)
 
     # Password helpers
     def set_password(self, password):
@@ -48,10 +121,10 @@ class Organization(db.Model):
     name = db.Column(db.String, nullable=False)
     description = db.Column(db.Text)
     location = db.Column(db.String)
-    owner_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    owner_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
-    opportunities = db.relationship("Opportunity", backref="organization", cascade="all, delete")
+    opportunities = db.relationship("Opportunity", backref="organization", cascade="all, delete", passive_deletes=True)
 
     def to_dict(self):
         return {
@@ -67,20 +140,37 @@ class Organization(db.Model):
 # --------------------------
 # Opportunity Model
 # --------------------------
-class Opportunity(db.Model):
+class Opportunity(SoftDeleteMixin, db.Model):
     __tablename__ = "opportunities"
+    __table_args__ = (
+        live_index("ix_opportunities_live_organization_id", "organization_id"),
+        live_index("ix_opportunities_live_created_at", "created_at"),
+        # Lets the archiver find old soft-deleted rows without a scan
+        db.Index("ix_opportunities_deleted_at", "deleted_at",
+                 postgresql_where=text("deleted_at IS NOT NULL"),
+                 sqlite_where=text("deleted_at IS NOT NULL")),
+        # Backstop for capacity.py: no write, however it races, can overbook
+        db.CheckConstraint("capacity IS NULL OR filled <= capacity", name="ck_opportunities_filled_capacity"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String, nullable=False)
     description = db.Column(db.Text)
     location = db.Column(db.String)
     duration = db.Column(db.Integer)
-    organization_id = db.Column(db.Integer, db.ForeignKey("organizations.id"), nullable=False)
-    created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    # Full FK indexes (alongside the partial live ones) serve ON DELETE lookups
+    # and include_deleted queries, which can't use a partial index
+    organization_id = db.Column(db.Integer, db.ForeignKey("organizations.id", ondelete="CASCADE"),
+                                nullable=False, index=True)
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Places: NULL capacity is unlimited. `filled` counts the applications
+    # holding a place and only changes through capacity.py's atomic updates
+    capacity = db.Column(db.Integer, nullable=True)
+    filled = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
-    applications = db.relationship("Application", backref="opportunity", cascade="all, delete")
-    payments = db.relationship("Payment", backref="opportunity", cascade="all, delete")
+    applications = db.relationship("Application", backref="opportunity", cascade="all, delete", passive_deletes=True)
+    payments = db.relationship("Payment", backref="opportunity", cascade="all, delete", passive_deletes=True)
 
     def to_dict(self):
         return {
@@ -91,22 +181,41 @@ class Opportunity(db.Model):
             "duration": self.duration,
             "organization_id": self.organization_id,
             "created_by": self.created_by,
-            "created_at": self.created_at.isoformat() if self.created_at else None
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "capacity": self.capacity,
+            "filled": self.filled,
         }
 
 
 # --------------------------
 # Application Model
 # --------------------------
+APPLICATION_STATUSES = ("pending", "accepted", "rejected", "waitlisted")
+# Statuses that take one of the opportunity's places
+HOLDS_PLACE = ("pending", "accepted")
+
+
 class Application(db.Model):
     __tablename__ = "applications"
+    __table_args__ = (
+        # The waitlist in promotion order, per opportunity
+        db.Index("ix_applications_waitlist", "opportunity_id", "applied_at", "id",
+                 postgresql_where=text("status = 'waitlisted'"),
+                 sqlite_where=text("status = 'waitlisted'")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    opportunity_id = db.Column(db.Integer, db.ForeignKey("opportunities.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # active_history on opportunity_id and status: a change knows the summary
+    # counts it moves out of (dashboards.py)
+    opportunity_id = column_property(
+        db.Column(db.Integer, db.ForeignKey("opportunities.id", ondelete="CASCADE"), nullable=False, index=True),
+        active_history=True,
+    )
     motivation_message = db.Column(db.Text)
-    status = db.Column(db.String, default="pending")  # pending | accepted | rejected
-    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # pending | accepted | rejected | waitlisted
+    status = column_property(db.Column(db.String, default="pending"), active_history=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def to_dict(self):
         return {
@@ -122,35 +231,217 @@ class Application(db.Model):
 # --------------------------
 # Payment Model
 # --------------------------
-class Payment(db.Model):
+PAYMENT_STATUSES = ['pending', 'completed', 'failed']
+
+
+def validate_payment_status(status):
+    # Shared by the model validator and the bulk importer
+    if status not in PAYMENT_STATUSES:
+        raise ValueError(f"Status must be one of {', '.join(PAYMENT_STATUSES)}")
+    return status
+
+
+CENT = Decimal("0.01")
+MAX_AMOUNT = Decimal("9999999999.99")  # Numeric(12, 2)
+
+
+def parse_amount(value):
+    """Exact Decimal from a JSON number or a string; at most 2 decimal places"""
+    try:
+        # Through str() so the float 0.1 becomes Decimal("0.1"), not its binary expansion
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError("Amount must be a number")
+    if isinstance(value, bool) or not amount.is_finite():
+        raise ValueError("Amount must be a number")
+    if amount != amount.quantize(CENT):
+        raise ValueError("Amount can have at most 2 decimal places")
+    return amount.quantize(CENT)
+
+
+def validate_payment_amount(amount):
+    amount = parse_amount(amount)
+    if amount <= 0:
+        raise ValueError("Amount must be positive")
+    if amount > MAX_AMOUNT:
+        raise ValueError("Amount is too large")
+    return amount
+
+
+class Payment(SoftDeleteMixin, db.Model):
     __tablename__ = "payments"
+    __table_args__ = (
+        live_index("ix_payments_live_user_id", "user_id"),
+        live_index("ix_payments_live_opportunity_id", "opportunity_id"),
+        db.Index("ix_payments_deleted_at", "deleted_at",
+                 postgresql_where=text("deleted_at IS NOT NULL"),
+                 sqlite_where=text("deleted_at IS NOT NULL")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    opportunity_id = db.Column(db.Integer, db.ForeignKey("opportunities.id"), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    payment_status = db.Column(db.String, default="pending")  # pending | completed | failed
-    payment_date = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # active_history, like payment_status below: the dashboard deltas take
+    # the old values back out of the summary
+    opportunity_id = column_property(
+        db.Column(db.Integer, db.ForeignKey("opportunities.id", ondelete="CASCADE"), nullable=False, index=True),
+        active_history=True,
+    )
+    # Exact decimal: float sums drift once there are millions of payments
+    amount = column_property(db.Column(db.Numeric(12, 2), nullable=False), active_history=True)
+    # pending | completed | failed. active_history: a change always knows the
+    # status it replaced, even on an expired instance, for the audit trail below
+    payment_status = column_property(db.Column(db.String, default="pending"), active_history=True)
+    payment_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     @validates('payment_status')
     def validate_status(self, key, status):
-        valid_statuses = ['pending', 'completed', 'failed']
-        if status not in valid_statuses:
-            raise ValueError(f"Status must be one of {', '.join(valid_statuses)}")
-        return status
+        return validate_payment_status(status)
 
     @validates('amount')
     def validate_amount(self, key, amount):
-        if amount <= 0:
-            raise ValueError("Amount must be positive")
-        return amount
+        return validate_payment_amount(amount)
 
     def to_dict(self):
         return {
             "id": self.id,
             "user_id": self.user_id,
             "opportunity_id": self.opportunity_id,
-            "amount": self.amount,
+            # A JSON number as before; any 2-decimal amount below 10^13 round-trips exactly
+            "amount": float(self.amount),
             "payment_status": self.payment_status,
             "payment_date": self.payment_date.isoformat() if self.payment_date else None
         }
+
+
+class PaymentAudit(db.Model):
+    """
+    One row per change of a payment's status, including its first one when
+    it is created, written in the transaction that makes the change (see
+    _audit_payment_status). Append-only; no foreign key, so the trail
+    outlives archived and deleted payments.
+    """
+    __tablename__ = "payment_audit"
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.Integer, nullable=False, index=True)
+    old_status = db.Column(db.String, nullable=True)
+    new_status = db.Column(db.String, nullable=True)
+    amount = db.Column(db.Numeric(12, 2), nullable=True)
+    request_id = db.Column(db.String(128), nullable=True)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+def _audit_row(payment_id, old_status, new_status, amount):
+    return {"payment_id": payment_id, "old_status": old_status, "new_status": new_status,
+            "amount": amount, "request_id": current_request_id(), "changed_at": datetime.utcnow()}
+
+
+def record_payment_audit(session, rows):
+    """
+    Write audit rows with one multi-row INSERT on the session's connection,
+    so they commit or roll back with the changes they record; each is also
+    logged once the transaction commits
+    """
+    if rows:
+        session.connection().execute(PaymentAudit.__table__.insert(), rows)
+        session.info.setdefault("payment_audit", []).extend(rows)
+
+
+def audit_new_payments(session, payments):
+    """Audit payments inserted outside the ORM: (id, payment_status, amount) rows"""
+    record_payment_audit(session, [_audit_row(id, None, status, amount) for id, status, amount in payments])
+
+
+@event.listens_for(Session, "after_flush")
+def _audit_payment_status(session, flush_context):
+    # A new payment is recorded with old_status None, so the trail starts at
+    # its first status. History still shows what this flush changed
+    rows = []
+    for payment in session.new:
+        if isinstance(payment, Payment):
+            rows.append(_audit_row(payment.id, None, payment.payment_status, payment.amount))
+    for payment in session.dirty:
+        if not isinstance(payment, Payment):
+            continue
+        history = inspect(payment).attrs.payment_status.history
+        if not history.added:
+            continue
+        old = history.deleted[0] if history.deleted else None
+        if old == history.added[0]:
+            continue
+        rows.append(_audit_row(payment.id, old, history.added[0], payment.amount))
+    record_payment_audit(session, rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _log_payment_audit(session):
+    for row in session.info.pop("payment_audit", ()):
+        audit_log.info("payment %s %s -> %s", row["payment_id"], row["old_status"], row["new_status"],
+                       extra={"fields": {key: row[key] for key in ("payment_id", "old_status", "new_status", "amount")}})
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_payment_audit(session, previous_transaction):
+    session.info.pop("payment_audit", None)
+
+
+# --------------------------
+# Dashboard summaries
+# --------------------------
+class OpportunitySummary(db.Model):
+    """
+    One precomputed row per live opportunity: applicant counts by status and
+    payment totals. Kept current by dashboards.py; never written directly.
+    """
+    __tablename__ = "opportunity_summaries"
+
+    opportunity_id = db.Column(db.Integer, db.ForeignKey("opportunities.id", ondelete="CASCADE"), primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey("organizations.id", ondelete="CASCADE"),
+                                nullable=False, index=True)
+    title = db.Column(db.String, nullable=False)
+    applications_total = db.Column(db.Integer, nullable=False, default=0)
+    applications_pending = db.Column(db.Integer, nullable=False, default=0)
+    applications_accepted = db.Column(db.Integer, nullable=False, default=0)
+    applications_rejected = db.Column(db.Integer, nullable=False, default=0)
+    applications_waitlisted = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    payments_count = db.Column(db.Integer, nullable=False, default=0)
+    payments_completed_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    payments_pending_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "opportunity_id": self.opportunity_id,
+            "title": self.title,
+            "applications": {
+                "total": self.applications_total,
+                "pending": self.applications_pending,
+                "accepted": self.applications_accepted,
+                "rejected": self.applications_rejected,
+                "waitlisted": self.applications_waitlisted,
+            },
+            "payments": {
+                "count": self.payments_count,
+                "completed_amount": float(self.payments_completed_amount),
+                "pending_amount": float(self.payments_pending_amount),
+            },
+            "refreshed_at": self.refreshed_at.isoformat(),
+        }
+
+
+# --------------------------
+# Archive tables
+# --------------------------
+def _archive_table(source):
+    """Same columns as `source`, minus constraints, plus when the row was archived"""
+    columns = [db.Column(c.name, c.type, primary_key=c.primary_key) for c in source.columns]
+    return db.Table(
+        f"{source.name}_archive",
+        *columns,
+        db.Column("archived_at", db.DateTime, nullable=False, default=datetime.utcnow),
+    )
+
+
+opportunities_archive = _archive_table(Opportunity.__table__)
+applications_archive = _archive_table(Application.__table__)
+payments_archive = _archive_table(Payment.__table__)
@@ -0,0 +1,281 @@
+"""
+Opt-in PostgreSQL partitioning for the tables that grow with every tenant
+
+    flask partition-tables [--opportunity-partitions 16] [--months-ahead 3]
+    flask create-partitions [--months-ahead 3]
+
+- opportunities: PARTITION BY HASH (organization_id). A query for one
+  organization reads one partition and its indexes.
+- payments: PARTITION BY RANGE (payment_date), one partition per month plus a
+  DEFAULT partition for dates no month covers. A date-bounded query reads only
+  the months it spans.
+
+`partition-tables` converts the existing tables in one transaction. It copies
+their rows into partitioned replacements and swaps them in. The conversion
+is one-way; back up first. Afterwards, run `create-partitions` monthly (for
+example as a Render Cron Job) so the coming months have their own partitions
+before any payment lands in them.
+
+The models and routes don't change; the ORM still addresses rows by id.
+PostgreSQL requires a partitioned table's primary key to include the
+partition key, so the keys become (id, organization_id) and (id,
+payment_date). Ids stay unique because the same sequence still assigns them,
+and a lookup by id alone probes every partition's primary key index. For the
+same reason no foreign key can point at opportunities.id any more. Triggers
+take over those checks and ON DELETE actions, reading them from the models.
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint
+
+from extensions import db
+from models import Opportunity, Payment
+
+OPPORTUNITY_PARTITIONS = 16
+MONTHS_AHEAD = 3
+
+
+def _require_postgresql(connection):
+    if connection.dialect.name != "postgresql":
+        raise ValueError("Partitioning needs PostgreSQL")
+
+
+def partitioned_tables(connection):
+    """Names of the partitioned (parent) tables"""
+    return set(connection.scalars(text(
+        "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid"
+    )))
+
+
+def partitions(connection, table):
+    """Names of the partitions attached to `table`"""
+    return set(connection.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": table}))
+
+
+# --------------------
+# Monthly payment partitions
+# --------------------
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(start, months):
+    years, month = divmod(start.month - 1 + months, 12)
+    return datetime(start.year + years, month + 1, 1)
+
+
+def month_partition(start):
+    return f"payments_y{start.year}m{start.month:02d}"
+
+
+def _bounds(start):
+    return f"FROM ('{start.isoformat(' ')}') TO ('{add_months(start, 1).isoformat(' ')}')"
+
+
+def _attach_month(connection, start):
+    """
+    Add the partition for the month starting at `start` to the live payments
+    table. Payments already in the DEFAULT partition for that month move
+    into it first; otherwise ATTACH would fail on them.
+    """
+    name = month_partition(start)
+    connection.execute(text(f"CREATE TABLE {name} (LIKE payments INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(text(
+        f"WITH moved AS (DELETE FROM payments_default WHERE payment_date >= :start AND payment_date < :end "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    ), {"start": start, "end": add_months(start, 1)})
+    connection.execute(text(f"ALTER TABLE payments ATTACH PARTITION {name} FOR VALUES {_bounds(start)}"))
+    return name
+
+
+def create_partitions(connection, months_ahead=MONTHS_AHEAD, now=None):
+    """Make sure every month from now through `months_ahead` has a payments partition; returns those created"""
+    _require_postgresql(connection)
+    if "payments" not in partitioned_tables(connection):
+        raise ValueError("payments is not partitioned; run `flask partition-tables` first")
+    existing = partitions(connection, "payments")
+    first = month_start(now or datetime.utcnow())
+    months = (add_months(first, i) for i in range(months_ahead + 1))
+    return [_attach_month(connection, start) for start in months if month_partition(start) not in existing]
+
+
+# --------------------
+# Conversion
+# --------------------
+def _swap_in_partitioned(connection, table, key, partition_by, add_partitions):
+    """
+    Replace `table` with a copy partitioned on `key`. The primary key becomes
+    (id, key); indexes and outgoing foreign keys are rebuilt from the model.
+    Foreign keys that point at the table are dropped; see _reference_triggers.
+    """
+    name, staging = table.name, f"{table.name}_partitioned"
+    connection.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(text(
+        f"CREATE TABLE {staging} (LIKE {name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY {partition_by}"
+    ))
+    connection.execute(text(f"ALTER TABLE {staging} ALTER COLUMN {key} SET NOT NULL"))
+    connection.execute(text(f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_pkey PRIMARY KEY (id, {key})"))
+    add_partitions(staging)
+    connection.execute(text(f"INSERT INTO {staging} SELECT * FROM {name}"))
+
+    # The id sequence would be dropped with the old table
+    sequence = connection.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": name})
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {staging}.id"))
+    references = connection.execute(text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(:table) AND conrelid <> confrelid"
+    ), {"table": name}).all()
+    for referencing, constraint in references:
+        connection.execute(text(f'ALTER TABLE {referencing} DROP CONSTRAINT "{constraint}"'))
+    connection.execute(text(f"DROP TABLE {name}"))
+    connection.execute(text(f"ALTER TABLE {staging} RENAME TO {name}"))
+    connection.execute(text(f"ALTER TABLE {name} RENAME CONSTRAINT {staging}_pkey TO {name}_pkey"))
+
+    for index in table.indexes:
+        index.create(connection)
+    parents = partitioned_tables(connection)
+    for constraint in table.foreign_key_constraints:
+        if constraint.referred_table.name not in parents:
+            connection.execute(AddConstraint(constraint))
+
+
+def _reference_triggers(connection):
+    """
+    Stand-ins for the foreign keys the models declare against partitioned
+    tables: a check on the referencing side (locking the referenced row, as a
+    foreign key does) and the ON DELETE action on the referenced side, skipped
+    when the row was only moved between partitions
+    """
+    parents = partitioned_tables(connection)
+    actions = {}
+    for table in db.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            target = fk.column.table.name
+            if target not in parents:
+                continue
+            child, column, key = table.name, fk.parent.name, fk.column.name
+            function = f"{child}_{column}_check"
+            connection.execute(text(f"""
+                CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+                BEGIN
+                    IF NEW.{column} IS NOT NULL THEN
+                        PERFORM 1 FROM {target} WHERE {key} = NEW.{column} FOR KEY SHARE;
+                        IF NOT FOUND THEN
+                            RAISE EXCEPTION '{child}.{column} references missing {target}.{key} %',
+                                NEW.{column} USING ERRCODE = 'foreign_key_violation';
+                        END IF;
+                    END IF;
+                    RETURN NULL;
+                END $$ LANGUAGE plpgsql
+            """))
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {function} ON {child}"))
+            connection.execute(text(
+                f"CREATE TRIGGER {function} AFTER INSERT OR UPDATE OF {column} ON {child} "
+                f"FOR EACH ROW EXECUTE FUNCTION {function}()"
+            ))
+
+            ondelete = (fk.ondelete or "NO ACTION").upper()
+            if ondelete == "CASCADE":
+                action = f"DELETE FROM {child} WHERE {column} = OLD.{key};"
+            elif ondelete == "SET NULL":
+                action = f"UPDATE {child} SET {column} = NULL WHERE {column} = OLD.{key};"
+            else:
+                action = (f"IF EXISTS (SELECT 1 FROM {child} WHERE {column} = OLD.{key}) THEN "
+                          f"RAISE EXCEPTION '{target}.{key} % is still referenced from {child}', OLD.{key} "
+                          f"USING ERRCODE = 'foreign_key_violation'; END IF;")
+            # A row moved to another partition (say, an opportunity given to another
+            # organization) is deleted from the old one and fires this trigger too;
+            # it still exists, so there is nothing to act on
+            actions.setdefault(target, []).append(
+                f"IF NOT EXISTS (SELECT 1 FROM {target} WHERE {key} = OLD.{key}) THEN {action} END IF;"
+            )
+
+    for target, statements in actions.items():
+        function, body = f"{target}_on_delete", " ".join(statements)
+        connection.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+            BEGIN
+                {body}
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+        """))
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {function} ON {target}"))
+        connection.execute(text(
+            f"CREATE TRIGGER {function} AFTER DELETE ON {target} FOR EACH ROW EXECUTE FUNCTION {function}()"
+        ))
+
+
+def partition_tables(connection, opportunity_partitions=OPPORTUNITY_PARTITIONS, months_ahead=MONTHS_AHEAD):
+    """
+    Convert opportunities and payments to partitioned tables, skipping any
+    already converted, in the caller's transaction. Returns the tables it
+    converted.
+    """
+    _require_postgresql(connection)
+    converted = []
+    done = partitioned_tables(connection)
+
+    if "opportunities" not in done:
+        def hash_partitions(staging):
+            for remainder in range(opportunity_partitions):
+                connection.execute(text(
+                    f"CREATE TABLE opportunities_p{remainder:02d} PARTITION OF {staging} "
+                    f"FOR VALUES WITH (MODULUS {opportunity_partitions}, REMAINDER {remainder})"
+                ))
+
+        _swap_in_partitioned(connection, Opportunity.__table__, "organization_id",
+                             "HASH (organization_id)", hash_partitions)
+        converted.append("opportunities")
+
+    if "payments" not in done:
+        # The partition key can't be NULL; the ORM always sets it, raw inserts may not have
+        connection.execute(text("UPDATE payments SET payment_date = :now WHERE payment_date IS NULL"),
+                           {"now": datetime.utcnow()})
+        oldest = connection.scalar(text("SELECT min(payment_date) FROM payments"))
+        now = month_start(datetime.utcnow())
+        first = month_start(min(oldest, now) if oldest else now)
+
+        def month_partitions(staging):
+            start = first
+            while start <= add_months(now, months_ahead):
+                connection.execute(text(
+                    f"CREATE TABLE {month_partition(start)} PARTITION OF {staging} FOR VALUES {_bounds(start)}"
+                ))
+                start = add_months(start, 1)
+            connection.execute(text(f"CREATE TABLE payments_default PARTITION OF {staging} DEFAULT"))
+
+        _swap_in_partitioned(connection, Payment.__table__, "payment_date",
+                             "RANGE (payment_date)", month_partitions)
+        converted.append("payments")
+
+    # Rebuilt every time: converting payments replaces the triggers on its old table
+    _reference_triggers(connection)
+    return converted
+
+
+# --------------------
+# Migrations
+# --------------------
+def include_object(connection):
+    """
+    Alembic include_object hook: partitions and the foreign keys replaced by
+    triggers are not in the models, so autogenerate and `flask db check`
+    must not report them as drift
+    """
+    names = {}
+
+    def include(object, name, type_, reflected, compare_to):
+        if not names:
+            names["parents"] = partitioned_tables(connection)
+            names["children"] = set(connection.scalars(text("SELECT relname FROM pg_class WHERE relispartition")))
+        if type_ == "table" and reflected and name in names["children"]:
+            return False
+        if type_ == "foreign_key_constraint" and object.referred_table.name in names["parents"]:
+            return False
+        return True
+
+    return include
@@ -0,0 +1,190 @@
+"""
+Reconcile the payments ledger against a payment provider's statement
+
+    flask reconcile-payments statement.csv [--status completed]
+
+The statement is a CSV with a header naming at least a `payment_id` (or
+`id`) and an `amount` column; other columns are ignored. Both sides are
+held as NumPy int64 arrays of ids and cents rather than Python objects: the
+statement is parsed a chunk at a time by np.loadtxt and sorted once, then
+the ledger is streamed out of the database in keyset-paginated chunks (COPY
+on PostgreSQL) and each chunk is matched with one np.searchsorted. 10M
+payments take about 160 MB per side, and the work per chunk is a few
+vectorized passes instead of ten million dictionary lookups.
+"""
+import csv
+import io
+import itertools
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, func, select
+
+from extensions import db
+from models import Payment
+
+CHUNK_SIZE = 1_000_000
+ID_COLUMNS = ("payment_id", "id")
+STATEMENT_DTYPE = [("id", np.int64), ("amount", np.float64)]
+
+
+def to_cents(amounts):
+    """
+    Exact int64 cents from float64 amounts with at most 2 decimals. Any such
+    amount below 10^13 parses to within 1e-3 cents of its true value, so
+    rounding recovers it exactly.
+    """
+    return np.rint(amounts * 100).astype(np.int64)
+
+
+def format_cents(cents):
+    return str(Decimal(int(cents)).scaleb(-2))
+
+
+# --------------------
+# Statement
+# --------------------
+def load_statement(path, chunk_size=CHUNK_SIZE):
+    """(ids, cents) int64 arrays from a statement CSV, sorted by id"""
+    with open(path, newline="", encoding="utf-8") as stream:
+        header = [name.strip().lower() for name in next(csv.reader([stream.readline()]))]
+        id_column = next((header.index(name) for name in ID_COLUMNS if name in header), None)
+        if id_column is None or "amount" not in header:
+            raise ValueError("Statement needs a header with payment_id and amount columns")
+        columns = (id_column, header.index("amount"))
+
+        ids, cents = [], []
+        while True:
+            lines = list(itertools.islice(stream, chunk_size))
+            if not lines:
+                break
+            try:
+                block = np.loadtxt(lines, delimiter=",", quotechar='"', usecols=columns,
+                                   dtype=STATEMENT_DTYPE, ndmin=1)
+            except ValueError as e:
+                raise ValueError(f"Unreadable statement: {e}")
+            ids.append(block["id"])
+            cents.append(to_cents(block["amount"]))
+
+    ids = np.concatenate(ids) if ids else np.empty(0, np.int64)
+    cents = np.concatenate(cents) if cents else np.empty(0, np.int64)
+    order = np.argsort(ids, kind="stable")
+    return ids[order], cents[order]
+
+
+# --------------------
+# Ledger
+# --------------------
+def _ledger_query(statuses, after, limit):
+    # Cents are computed in the database, so the exact NUMERIC never becomes a float
+    query = (
+        select(Payment.id, cast(func.round(Payment.amount * 100), BigInteger))
+        .where(Payment.id > after, Payment.deleted_at.is_(None))
+        .order_by(Payment.id)
+        .limit(limit)
+    )
+    if statuses:
+        query = query.where(Payment.payment_status.in_(statuses))
+    return query
+
+
+def _fetch_chunk(query):
+    """
+    (n, 2) int64 array for a ledger query, read off the DBAPI cursor: NumPy
+    converts plain tuples ~30x faster than SQLAlchemy Row objects, and on
+    PostgreSQL COPY ... TO STDOUT skips building tuples at all
+    """
+    bind = db.session.get_bind()
+    sql = str(query.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if bind.dialect.name == "postgresql" and hasattr(cursor, "copy_expert"):
+            buffer = io.StringIO()
+            cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)", buffer)
+            if not buffer.tell():
+                return np.empty((0, 2), np.int64)
+            buffer.seek(0)
+            return np.loadtxt(buffer, delimiter=",", dtype=np.int64, ndmin=2)
+        cursor.execute(sql)
+        return np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    finally:
+        cursor.close()
+
+
+def ledger_chunks(statuses=("completed",), chunk_size=CHUNK_SIZE):
+    """Yield (ids, cents) for live payments in id order, chunk_size rows at a time"""
+    after = 0
+    while True:
+        block = _fetch_chunk(_ledger_query(statuses, after, chunk_size))
+        if not len(block):
+            return
+        yield block[:, 0], block[:, 1]
+        after = int(block[-1, 0])
+
+
+# --------------------
+# Matching
+# --------------------
+def reconcile(statement_ids, statement_cents, chunks):
+    """
+    Match ledger chunks against a statement sorted by id.
+
+    Returns counts plus id arrays for each kind of discrepancy: amounts that
+    differ, ledger payments the statement lacks, statement lines with no
+    ledger payment, and ids the statement lists more than once.
+    """
+    size = len(statement_ids)
+    seen = np.zeros(size, dtype=bool)
+    ledger = matched = 0
+    mismatched, missing_from_statement = [], []
+
+    for ids, cents in chunks:
+        ledger += len(ids)
+        if size:
+            positions = np.minimum(np.searchsorted(statement_ids, ids), size - 1)
+            found = statement_ids[positions] == ids
+        else:
+            positions = found = np.zeros(len(ids), dtype=bool)
+        missing_from_statement.append(ids[~found])
+        positions = positions[found]
+        seen[positions] = True
+        differs = statement_cents[positions] != cents[found]
+        matched += int(found.sum() - differs.sum())
+        mismatched.append(np.column_stack(
+            (ids[found][differs], cents[found][differs], statement_cents[positions][differs])
+        ))
+
+    # A duplicated id only marks its first line as seen; the others are not "missing"
+    duplicates = np.unique(statement_ids[1:][statement_ids[1:] == statement_ids[:-1]])
+    return {
+        "ledger": ledger,
+        "statement": size,
+        "matched": matched,
+        # Rows of (payment id, ledger cents, statement cents)
+        "mismatched": np.concatenate(mismatched) if mismatched else np.empty((0, 3), np.int64),
+        "missing_from_statement": (np.concatenate(missing_from_statement) if missing_from_statement
+                                   else np.empty(0, np.int64)),
+        "missing_from_ledger": np.setdiff1d(statement_ids[~seen], statement_ids[seen]),
+        "duplicates": duplicates,
+    }
+
+
+def discrepancies(result):
+    return (len(result["mismatched"]) + len(result["missing_from_statement"])
+            + len(result["missing_from_ledger"]) + len(result["duplicates"]))
+
+
+def report(result, show=10):
+    """Human-readable lines, listing up to `show` payments per kind of discrepancy"""
+    yield (f"Ledger payments: {result['ledger']}, statement lines: {result['statement']}, "
+           f"matched: {result['matched']}")
+    yield f"  amount mismatches:       {len(result['mismatched'])}"
+    yield f"  missing from statement:  {len(result['missing_from_statement'])}"
+    yield f"  missing from ledger:     {len(result['missing_from_ledger'])}"
+    yield f"  duplicate statement ids: {len(result['duplicates'])}"
+    for payment_id, ledger_cents, statement_cents in result["mismatched"][:show]:
+        yield (f"amount mismatch: payment {payment_id} ledger {format_cents(ledger_cents)} "
+               f"statement {format_cents(statement_cents)}")
+    for kind in ("missing_from_statement", "missing_from_ledger", "duplicates"):
+        for payment_id in result[kind][:show]:
+            yield f"{kind.replace('_', ' ')}: payment {payment_id}"
@@ -0,0 +1,106 @@
+"""
+Read-replica routing for Volunteer Connect
+
+When REPLICA_URLS is configured, read-only requests (GET/HEAD/OPTIONS) run
+their queries on a replica, and everything else uses the primary. A client
+that has just written something is pinned to the primary for
+REPLICA_STICKY_SECONDS, so it reads its own writes even while replicas lag.
+
+The sticky window is remembered twice: in a cookie (works across workers
+and hosts) and in a per-worker map keyed by client address (works for
+clients that drop cookies, as long as they hit the same worker).
+"""
+import random
+import threading
+import time
+
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_COOKIE = "vc_last_write"
+
+
+def read_bind():
+    """Bind key of the replica this request reads from, or None for the primary"""
+    # Imported here: extensions imports this module to build the session class
+    from extensions import db
+
+    return db.session.info.get("replica")
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica chosen for this request, if any"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if bind is None and replica and not self._flushing and not isinstance(clause, UpdateBase):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """Chooses primary or replica per request; must be initialized before db"""
+
+    def __init__(self, app=None):
+        self._last_write = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("REPLICA_URLS", [])
+        app.config.setdefault("REPLICA_STICKY_SECONDS", 5.0)
+        # Replica engines are ordinary Flask-SQLAlchemy binds, so they share its
+        # engine options and are disposed with the primary
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        keys = []
+        for i, url in enumerate(app.config["REPLICA_URLS"]):
+            key = f"replica_{i}"
+            binds[key] = url
+            keys.append(key)
+        app.config["SQLALCHEMY_BINDS"] = binds
+        app.extensions["replica_router"] = self
+        if keys:
+            app.config["REPLICA_BIND_KEYS"] = keys
+            app.before_request(self.route_request)
+            app.after_request(self.remember_write)
+
+    def after_fork(self):
+        self._last_write = {}
+        self._lock = threading.Lock()
+
+    def _client(self):
+        # Set from trusted proxy hops only (ProxyFix in create_app)
+        return request.remote_addr
+
+    def recently_wrote(self):
+        window = current_app.config["REPLICA_STICKY_SECONDS"]
+        now = time.time()
+        try:
+            if now - float(request.cookies.get(STICKY_COOKIE, 0)) < window:
+                return True
+        except ValueError:
+            pass
+        with self._lock:
+            return now - self._last_write.get(self._client(), 0) < window
+
+    def route_request(self):
+        # Imported here: extensions imports this module to build the session class
+        from extensions import db
+
+        if request.method in READ_METHODS and not self.recently_wrote():
+            db.session.info["replica"] = random.choice(current_app.config["REPLICA_BIND_KEYS"])
+
+    def remember_write(self, response):
+        if request.method in READ_METHODS or response.status_code >= 400:
+            return response
+        window = current_app.config["REPLICA_STICKY_SECONDS"]
+        now = time.time()
+        with self._lock:
+            self._last_write[self._client()] = now
+            if len(self._last_write) > 10000:
+                self._last_write = {k: t for k, t in self._last_write.items() if now - t < window}
+        response.set_cookie(STICKY_COOKIE, str(now), max_age=max(1, int(window)), httponly=True)
+        return response
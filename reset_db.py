@@ -1,8 +1,14 @@
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import text
+
 from app import app
 from extensions import db
 
+Migrate(app, db)
+
 with app.app_context():
     db.drop_all()  # drop old tables if they exist
-    db.create_all()  # create tables fresh from models
+    db.session.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    db.session.commit()
+    upgrade()  # create tables (and their indexes) from migrations/
     print("Database reset complete!")
-
@@ -1,12 +1,11 @@
 #!/bin/bash
-# reset_db.sh - Completely resets the Volunteer Connect backend database and migrations
+# reset_db.sh - Completely resets the Volunteer Connect backend database
 
 echo "🚀 Starting full reset..."
 
-# 1️⃣ Delete old database and migrations
-echo "Deleting old database and migrations..."
+# 1️⃣ Delete old database (migrations/ is committed: keep it)
+echo "Deleting old database..."
 rm -f volunteer.db
-rm -rf migrations
 find . -name "__pycache__" -exec rm -rf {} +
 find . -name "*.pyc" -exec rm -f {} +
 
@@ -14,20 +13,12 @@ find . -name "*.pyc" -exec rm -f {} +
 echo "Installing/upgrading dependencies..."
 pip install --upgrade Flask-SQLAlchemy Flask-Migrate alembic
 
-# 3️⃣ Initialize new migrations
-echo "Initializing new migrations..."
-flask db init
-
-# 4️⃣ Create initial migration
-echo "Generating initial migration..."
-flask db migrate -m "Initial migration"
-
-# 5️⃣ Apply migration (create tables)
-echo "Applying migration..."
+# 3️⃣ Apply migrations (create tables)
+echo "Applying migrations..."
 flask db upgrade
 
-# 6️⃣ Seed the database
+# 4️⃣ Seed the database
 echo "Seeding database..."
 python seed.py
 
-echo "✅ Reset complete! Database and migrations are fresh."
+echo "✅ Reset complete! Database is fresh."
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, make_response
 from extensions import db
 from models import Payment, User, Opportunity
+from validation import PAYMENT, PAYMENT_UPDATE
 
 # -------------------------------------------------------------------
 # Blueprint Configuration
@@ -32,31 +33,22 @@ def get_payments():
 # -------------------------------------------------------------------
 @payments_bp.route('/payments', methods=['POST'])
 def create_payment():
-    # 1. Get the JSON data sent by the user
-    data = request.get_json()
-    
-    # 2. Basic Validation: Check if all necessary fields are present
-    if not all(key in data for key in ('user_id', 'opportunity_id', 'amount')):
-        return jsonify({'error': 'Missing required fields: user_id, opportunity_id, amount'}), 400
+    # 1. Validate the JSON body against the PAYMENT schema (validation.py):
+    #    required fields, ids, amount as an exact decimal (a float would round
+    #    0.1 + 0.2) and status, all reported at once, before any database work
+    values, problem = PAYMENT.validate(request.get_json())
+    if problem:
+        return jsonify(problem), 400
         
     try:
-        # 3. Convert amount to float to ensure it's a number
-        amount = float(data['amount'])
-        
-        # 4. Create a new Payment object
-        new_payment = Payment(
-            user_id=data['user_id'],
-            opportunity_id=data['opportunity_id'],
-            amount=amount,
-            # Use .get() to provide a default value if 'payment_status' is missing
-            payment_status=data.get('payment_status', 'pending') 
-        )
+        # 2. Create a new Payment object ('payment_status' defaults to pending)
+        new_payment = Payment(**values)
         
-        # 5. Add the new object to the database session and commit (save) it
+        # 3. Add the new object to the database session and commit (save) it
         db.session.add(new_payment)
         db.session.commit()
         
-        # 6. Return the created payment as JSON with status 201 (Created)
+        # 4. Return the created payment as JSON with status 201 (Created)
         return jsonify(new_payment.to_dict()), 201
         
     except ValueError as e:
@@ -74,22 +66,23 @@ def create_payment():
 # -------------------------------------------------------------------
 @payments_bp.route('/payments/<int:id>', methods=['PATCH'])
 def update_payment(id):
-    # 1. Find the payment by ID
+    # 1. Validate the fields present in the request, before loading anything.
+    #    Only amount and payment_status can change; other keys are ignored
+    values, problem = PAYMENT_UPDATE.validate(request.get_json(), partial=True)
+    if problem:
+        return jsonify(problem), 400
+
+    # 2. Find the payment by ID
     payment = Payment.query.get(id)
     
-    # 2. If not found, return 404 Error
+    # 3. If not found, return 404 Error
     if not payment:
         return jsonify({'error': 'Payment not found'}), 404
         
-    # 3. Get the data to update
-    data = request.get_json()
-    
     try:
-        # 4. Update fields if they are present in the request
-        if 'amount' in data:
-            payment.amount = float(data['amount'])
-        if 'payment_status' in data:
-            payment.payment_status = data['payment_status']
+        # 4. Update the fields present in the request
+        for field, value in values.items():
+            setattr(payment, field, value)
         
         # 5. Commit the changes
         db.session.commit()
@@ -105,7 +98,8 @@ def update_payment(id):
 
 # -------------------------------------------------------------------
 # DELETE /payments/<id>
-# Delete a payment record from the database.
+# Soft delete a payment record: it disappears from the API but stays in the
+# database (and later the payments archive) as payment history.
 # -------------------------------------------------------------------
 @payments_bp.route('/payments/<int:id>', methods=['DELETE'])
 def delete_payment(id):
@@ -115,8 +109,8 @@ def delete_payment(id):
         return jsonify({'error': 'Payment not found'}), 404
         
     try:
-        # 2. Delete the record and commit
-        db.session.delete(payment)
+        # 2. Mark the record as deleted and commit
+        payment.soft_delete()
         db.session.commit()
         
         # 3. Return success message
@@ -3,10 +3,21 @@ Seed data for Volunteer Connect
 Used for development and testing
 """
 
+import argparse
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select, text
+
 from app import app, db
-from models import User, Organization, Opportunity
+from capacity import recount_places
+from dashboards import refresh_summaries
+from models import User, Organization, Opportunity, Application, Payment
 from werkzeug.security import generate_password_hash
 
+BATCH_SIZE = 10000
+
 def seed_opportunities():
     """Add sample users, organizations, and volunteer opportunities"""
     with app.app_context():
@@ -109,5 +120,132 @@ def seed_opportunities():
         print(f"Seeded {len(opportunities)} opportunities across 3 organizations")
 
 
+def _bulk_insert(model, rows):
+    """Insert an iterable of row dicts in BATCH_SIZE executemany batches"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(insert(model), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+    db.session.commit()
+
+
+def _reset_sequences(models):
+    """Explicit ids leave PostgreSQL sequences behind; move them past the data"""
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+    db.session.commit()
+
+
+def seed_bulk(opportunities=100000, orgs=None, users=None, applications=None, payments=None, seed=42):
+    """
+    Generate a scaled dataset for benchmarks and load testing.
+
+    Rows are built as plain dicts and written with batched bulk inserts, so
+    millions of rows load in minutes instead of hours. Every user shares the
+    password "password123" (hashed once) so login scenarios can authenticate.
+    """
+    rng = random.Random(seed)
+    orgs = orgs or max(1, opportunities // 50)
+    users = users or max(orgs, opportunities // 2)
+    applications = applications if applications is not None else opportunities * 2
+    payments = payments if payments is not None else opportunities // 2
+    password_hash = generate_password_hash("password123")
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        _bulk_insert(User, (
+            {
+                "id": i,
+                "name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "password_hash": password_hash,
+                # The first `orgs` users own one organization each
+                "role": "organization" if i <= orgs else "volunteer",
+                "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(1, users + 1)
+        ))
+        _bulk_insert(Organization, (
+            {
+                "id": i,
+                "name": f"Organization {i}",
+                "description": "Generated for load testing",
+                "location": f"City {i % 100}",
+                "owner_id": i,
+                "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(1, orgs + 1)
+        ))
+        _bulk_insert(Opportunity, (
+            {
+                "id": i,
+                "title": f"Opportunity {i}",
+                "description": "Help out for a few hours. No experience necessary.",
+                "location": f"City {i % 100}",
+                "duration": rng.randint(1, 8),
+                "organization_id": (i % orgs) + 1,
+                "created_by": (i % orgs) + 1,
+                "created_at": now - timedelta(seconds=i),
+            }
+            for i in range(1, opportunities + 1)
+        ))
+        _bulk_insert(Application, (
+            {
+                "id": i,
+                "user_id": rng.randint(1, users),
+                "opportunity_id": rng.randint(1, opportunities),
+                "motivation_message": "I would love to help.",
+                "status": rng.choice(("pending", "accepted", "rejected")),
+                "applied_at": now - timedelta(seconds=i),
+            }
+            for i in range(1, applications + 1)
+        ))
+        _bulk_insert(Payment, (
+            {
+                "id": i,
+                "user_id": rng.randint(1, users),
+                "opportunity_id": rng.randint(1, opportunities),
+                "amount": Decimal(rng.randint(100, 50000)).scaleb(-2),
+                "payment_status": rng.choice(("pending", "completed", "failed")),
+                "payment_date": now - timedelta(seconds=i),
+            }
+            for i in range(1, payments + 1)
+        ))
+        _reset_sequences([User, Organization, Opportunity, Application, Payment])
+        # Bulk inserts bypass the ORM hook that maintains dashboard summaries,
+        # and capacity.py's place counts
+        refresh_summaries(db.session.connection())
+        recount_places(db.session.connection())
+        db.session.commit()
+
+        counts = {
+            model.__tablename__: db.session.scalar(select(func.count()).select_from(model))
+            for model in (User, Organization, Opportunity, Application, Payment)
+        }
+        print("Seeded " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+        return counts
+
+
 if __name__ == "__main__":
-    seed_opportunities()
+    parser = argparse.ArgumentParser(description="Seed the Volunteer Connect database")
+    parser.add_argument("--opportunities", type=int,
+                        help="Generate a scaled dataset with this many opportunities")
+    args = parser.parse_args()
+
+    if args.opportunities:
+        seed_bulk(opportunities=args.opportunities)
+    else:
+        seed_opportunities()
@@ -0,0 +1,140 @@
+"""
+The ASGI entry point must answer with the same JSON as the Flask app
+"""
+import pytest
+from starlette.testclient import TestClient
+
+from app import create_app
+from asgi import create_asgi_app
+from catalog import build_catalog
+from extensions import catalog, db, request_logger
+from models import PaymentAudit
+
+
+@pytest.fixture
+def clients(tmp_path):
+    """A Flask client and an ASGI client sharing one SQLite file"""
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    flask_app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': url, 'RATELIMIT_ENABLED': False})
+    with flask_app.app_context():
+        db.create_all()
+    with TestClient(create_asgi_app(url)) as asgi_client:
+        yield flask_app.test_client(), asgi_client
+    with flask_app.app_context():
+        db.engine.dispose()
+    request_logger.configure({'LOG_ENABLED': False})
+
+
+def same_response(clients, method, path, json=None):
+    flask_client, asgi_client = clients
+    flask_response = flask_client.open(path, method=method, json=json)
+    asgi_response = asgi_client.request(method, path, json=json)
+    assert asgi_response.status_code == flask_response.status_code
+    assert asgi_response.headers['content-type'] == flask_response.headers['content-type']
+    assert asgi_response.content == flask_response.get_data()
+    return asgi_response
+
+
+def test_reads_and_validation_errors_match(clients):
+    flask_client, asgi_client = clients
+    flask_client.post('/register', json={'name': 'Owner', 'email': 'o@test.com',
+                                         'password': 'pw', 'role': 'organization'})
+    flask_client.post('/organizations', json={'name': 'Org', 'owner_id': 1})
+    flask_client.post('/opportunities', json={'title': 'Shift', 'organization_id': 1, 'duration': '3'})
+
+    same_response(clients, 'GET', '/')
+    same_response(clients, 'GET', '/organizations')
+    same_response(clients, 'GET', '/opportunities')
+    same_response(clients, 'GET', '/payments')
+    same_response(clients, 'GET', '/organizations/1/dashboard')
+    same_response(clients, 'GET', '/opportunities/1')
+    same_response(clients, 'GET', '/organizations/1')
+    same_response(clients, 'GET', '/opportunities/999')
+    same_response(clients, 'POST', '/opportunities', json={'organization_id': 1})
+    same_response(clients, 'POST', '/opportunities', json={'title': 'X', 'organization_id': 1, 'duration': 'x'})
+    same_response(clients, 'POST', '/payments', json={'user_id': 1})
+    same_response(clients, 'POST', '/payments', json={'user_id': 'x', 'opportunity_id': 1, 'amount': -1})
+    same_response(clients, 'PATCH', '/opportunities/1', json={'title': '', 'capacity': 'many'})
+    same_response(clients, 'POST', '/register', json=['not', 'an', 'object'])
+    same_response(clients, 'POST', '/login', json={'email': 'o@test.com'})
+    same_response(clients, 'POST', '/login', json={'email': 'o@test.com', 'password': 'wrong'})
+    same_response(clients, 'POST', '/login', json={'email': 'o@test.com', 'password': 'pw'})
+
+
+def test_writes_through_asgi_are_visible_to_flask(clients):
+    flask_client, asgi_client = clients
+    asgi_client.post('/register', json={'name': 'Owner', 'email': 'o@test.com',
+                                        'password': 'pw', 'role': 'organization'})
+    asgi_client.post('/organizations', json={'name': 'Org', 'owner_id': 1})
+
+    created = asgi_client.post('/opportunities', json={'title': 'Shift', 'organization_id': 1})
+    assert created.status_code == 201
+    opp_id = created.json()['id']
+
+    assert asgi_client.patch(f'/opportunities/{opp_id}', json={'title': 'Renamed'}).json()['title'] == 'Renamed'
+    assert asgi_client.delete(f'/opportunities/{opp_id}').status_code == 200
+    assert flask_client.get('/opportunities').get_json() == []
+    assert asgi_client.delete(f'/opportunities/{opp_id}').status_code == 404
+
+
+def test_reads_are_coalesced_and_see_writes(clients):
+    flask_client, asgi_client = clients
+    flask_client.post('/register', json={'name': 'Owner', 'email': 'o@test.com',
+                                         'password': 'pw', 'role': 'organization'})
+    flask_client.post('/organizations', json={'name': 'Org', 'owner_id': 1})
+
+    assert asgi_client.get('/opportunities').headers['X-Coalesced'] == 'computed'
+    asgi_client.post('/opportunities', json={'title': 'Shift', 'organization_id': 1})
+    assert [o['title'] for o in asgi_client.get('/opportunities').json()] == ['Shift']
+
+
+def test_catalog_snapshot_is_served_by_both(clients, tmp_path):
+    flask_client, asgi_client = clients
+    flask_client.post('/register', json={'name': 'Owner', 'email': 'o@test.com',
+                                         'password': 'pw', 'role': 'organization'})
+    flask_client.post('/organizations', json={'name': 'Org', 'owner_id': 1})
+    flask_client.post('/opportunities', json={'title': 'Shift', 'organization_id': 1})
+    path = str(tmp_path / 'catalog.snap')
+    with flask_client.application.app_context():
+        build_catalog(db.session, path)
+    catalog.configure({'CATALOG_SNAPSHOT_PATH': path})
+    try:
+        for url in ['/opportunities', '/opportunities/1', '/organizations/1']:
+            assert same_response(clients, 'GET', url).headers['X-Coalesced'] == 'snapshot'
+    finally:
+        catalog.configure({})
+
+
+def test_request_ids_reach_the_payment_audit(clients):
+    flask_client, asgi_client = clients
+    flask_client.post('/register', json={'name': 'Owner', 'email': 'o@test.com',
+                                         'password': 'pw', 'role': 'organization'})
+    flask_client.post('/organizations', json={'name': 'Org', 'owner_id': 1})
+    flask_client.post('/opportunities', json={'title': 'Shift', 'organization_id': 1})
+    asgi_client.post('/payments', json={'user_id': 1, 'opportunity_id': 1, 'amount': 5},
+                     headers={'X-Request-ID': 'asgi-0'})
+
+    response = asgi_client.patch('/payments/1', json={'payment_status': 'completed'},
+                                 headers={'X-Request-ID': 'asgi-1'})
+    assert response.headers['X-Request-ID'] == 'asgi-1'
+    with flask_client.application.app_context():
+        assert [(row.old_status, row.new_status, row.request_id) for row in PaymentAudit.query] == [
+            (None, 'pending', 'asgi-0'), ('pending', 'completed', 'asgi-1')]
+
+
+def test_places_and_waitlist(clients):
+    flask_client, asgi_client = clients
+    for i in range(3):
+        flask_client.post('/register', json={'name': f'U{i}', 'email': f'u{i}@test.com',
+                                             'password': 'pw', 'role': 'volunteer'})
+    flask_client.post('/organizations', json={'name': 'Org', 'owner_id': 1})
+    flask_client.post('/opportunities', json={'title': 'Shift', 'organization_id': 1, 'capacity': 1})
+
+    first = asgi_client.post('/applications', json={'user_id': 2, 'opportunity_id': 1}).json()
+    second = asgi_client.post('/applications', json={'user_id': 3, 'opportunity_id': 1}).json()
+    assert (first['status'], second['status']) == ('pending', 'waitlisted')
+
+    assert asgi_client.patch(f"/applications/{first['id']}", json={'status': 'rejected'}).status_code == 200
+    assert asgi_client.patch('/opportunities/1', json={'capacity': 2}).json()['filled'] == 1
+    assert asgi_client.patch(f"/applications/{first['id']}", json={'status': 'accepted'}).status_code == 200
+    assert flask_client.get('/opportunities').get_json()[0]['filled'] == 2
@@ -0,0 +1,115 @@
+"""
+Tests for bulk CSV/NDJSON export and import
+"""
+import csv
+import io
+import json
+
+from extensions import db
+from models import Application, Opportunity, Organization, Payment, User
+
+
+def make_org():
+    owner = User(name='Owner', email='owner@test.com', role='organization')
+    owner.set_password('password123')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.commit()
+    return org, owner
+
+
+def test_export_opportunities_as_csv(client):
+    org, owner = make_org()
+    db.session.add_all([
+        Opportunity(title=f'Shift {i}', organization_id=org.id, duration=i) for i in range(3)
+    ])
+    db.session.commit()
+
+    response = client.get(f'/organizations/{org.id}/export/opportunities?format=csv')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['title'] for row in rows] == ['Shift 0', 'Shift 1', 'Shift 2']
+
+
+def test_export_payments_as_ndjson(client):
+    org, owner = make_org()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.flush()
+    db.session.add(Payment(user_id=owner.id, opportunity_id=opp.id, amount=12.5))
+    db.session.commit()
+
+    response = client.get(f'/organizations/{org.id}/export/payments?format=ndjson')
+
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])['amount'] == 12.5
+
+
+def test_export_rejects_unknown_kind(client):
+    org, owner = make_org()
+    assert client.get(f'/organizations/{org.id}/export/users').status_code == 400
+
+
+def test_applicants_are_not_exported_over_http(app, client):
+    org, owner = make_org()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.flush()
+    db.session.add(Application(user_id=owner.id, opportunity_id=opp.id))
+    db.session.commit()
+
+    response = client.get(f'/organizations/{org.id}/export/applicants')
+    assert response.status_code == 400
+    assert owner.email not in response.get_data(as_text=True)
+
+    result = app.test_cli_runner().invoke(args=['export-data', 'applicants', '--organization-id', str(org.id)])
+    assert owner.email in result.output
+
+
+def test_import_opportunities_validates_every_row(client):
+    org, owner = make_org()
+    body = (
+        'title,description,duration,organization_id\n'
+        'Food Sorting,Sort donations,4,999\n'
+        ',Missing title,2,\n'
+        'Dog Walker,,not-a-number,\n'
+        'Reading Buddy,,,\n'
+    )
+
+    response = client.post(f'/organizations/{org.id}/import/opportunities',
+                           data=body, content_type='text/csv')
+
+    assert response.status_code == 201
+    summary = response.get_json()
+    assert summary['imported'] == 2
+    assert summary['errors'] == [
+        {'line': 3, 'error': 'Missing title or organization_id'},
+        {'line': 4, 'error': 'Duration must be a number'},
+    ]
+    # Rows always land in the organization named by the URL
+    titles = {o.title: o.organization_id for o in Opportunity.query.all()}
+    assert titles == {'Food Sorting': org.id, 'Reading Buddy': org.id}
+
+
+def test_import_payments_from_ndjson_cli(app, tmp_path):
+    org, owner = make_org()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.commit()
+    path = tmp_path / 'payments.ndjson'
+    path.write_text('\n'.join([
+        json.dumps({'user_id': owner.id, 'opportunity_id': opp.id, 'amount': 10}),
+        json.dumps({'user_id': owner.id, 'opportunity_id': opp.id, 'amount': -5}),
+        json.dumps({'user_id': owner.id, 'opportunity_id': opp.id, 'amount': 3, 'payment_status': 'lost'}),
+        'not json',
+    ]))
+
+    result = app.test_cli_runner().invoke(args=['import-data', 'payments', str(path)])
+
+    assert 'Imported 1 rows, rejected 3' in result.output
+    assert [p.amount for p in Payment.query.all()] == [10.0]
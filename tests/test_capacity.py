@@ -0,0 +1,112 @@
+"""
+Tests for capacity-limited opportunities, waitlists and promotion
+
+Concurrent applicants are covered by benchmarks/capacity.py, which runs
+against a real server: every test here shares one connection.
+"""
+import pytest
+from sqlalchemy import text
+
+from extensions import db
+from models import Opportunity, Organization, User
+
+
+@pytest.fixture
+def opp(client):
+    owner = User(name='Owner', email='owner@test.com', role='organization')
+    owner.set_password('password123')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.commit()
+    return client.post('/opportunities', json={'title': 'Shift', 'organization_id': org.id, 'capacity': 2}).get_json()
+
+
+def apply(client, opp, n):
+    start = User.query.count()
+    users = [User(name=f'V{i}', email=f'v{i}@test.com', role='volunteer', password_hash='x')
+             for i in range(start, start + n)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [client.post('/applications', json={'user_id': u.id, 'opportunity_id': opp['id']}).get_json()
+            for u in users]
+
+
+def filled(opp_id):
+    return db.session.get(Opportunity, opp_id, populate_existing=True).filled
+
+
+def test_full_opportunity_waitlists(client, opp):
+    responses = apply(client, opp, 4)
+
+    assert [r['status'] for r in responses] == ['pending', 'pending', 'waitlisted', 'waitlisted']
+    assert filled(opp['id']) == 2
+    dashboard = client.get(f"/organizations/{opp['organization_id']}/dashboard").get_json()
+    assert dashboard['totals']['applications']['waitlisted'] == 2
+
+
+def test_rejection_promotes_the_oldest_waitlisted(client, opp):
+    first, _, oldest_waiting, next_waiting = apply(client, opp, 4)
+
+    response = client.patch(f"/applications/{first['id']}", json={'status': 'rejected'})
+
+    assert response.status_code == 200 and response.get_json()['status'] == 'rejected'
+    statuses = dict(db.session.execute(text('SELECT id, status FROM applications')).all())
+    assert statuses[oldest_waiting['id']] == 'pending'
+    assert statuses[next_waiting['id']] == 'waitlisted'
+    assert filled(opp['id']) == 2
+
+
+def test_rejection_without_waitlist_frees_the_place(client, opp):
+    first, _ = apply(client, opp, 2)
+    client.patch(f"/applications/{first['id']}", json={'status': 'accepted'})
+    client.patch(f"/applications/{first['id']}", json={'status': 'rejected'})
+
+    assert filled(opp['id']) == 1
+    # Moving back in takes a place again, while there is one
+    assert client.patch(f"/applications/{first['id']}", json={'status': 'pending'}).status_code == 200
+    [waiting] = apply(client, opp, 1)
+    response = client.patch(f"/applications/{waiting['id']}", json={'status': 'accepted'})
+    assert response.status_code == 409
+    assert response.get_json() == {'error': 'Opportunity is full'}
+
+
+def test_capacity_changes(client, opp):
+    apply(client, opp, 4)
+
+    response = client.patch(f"/opportunities/{opp['id']}", json={'capacity': 1})
+    assert response.status_code == 409
+    assert 'below the 2 places' in response.get_json()['error']
+
+    raised = client.patch(f"/opportunities/{opp['id']}", json={'capacity': 3}).get_json()
+    assert (raised['capacity'], raised['filled']) == (3, 3)
+    unlimited = client.patch(f"/opportunities/{opp['id']}", json={'capacity': None}).get_json()
+    assert (unlimited['capacity'], unlimited['filled']) == (None, 4)
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('post', '/opportunities', {'title': 'X', 'organization_id': 1, 'capacity': -1}),
+    ('post', '/opportunities', {'title': 'X', 'organization_id': 1, 'capacity': 'lots'}),
+    ('patch', '/applications/1', {'status': 'maybe'}),
+])
+def test_invalid_input(client, opp, method, path, body):
+    assert getattr(client, method)(path, json=body).status_code == 400
+
+
+def test_unknown_opportunity_or_application(client, opp):
+    assert client.post('/applications', json={'user_id': 1, 'opportunity_id': 999}).status_code == 404
+    assert client.patch('/applications/999', json={'status': 'accepted'}).status_code == 404
+
+
+def test_recount_places(app, client, opp):
+    apply(client, opp, 1)
+    db.session.execute(text("INSERT INTO applications (user_id, opportunity_id, status) VALUES (1, :id, 'accepted')"),
+                       {'id': opp['id']})
+    db.session.commit()
+    assert filled(opp['id']) == 1
+
+    result = app.test_cli_runner().invoke(args=['recount-places'])
+
+    assert result.exit_code == 0
+    assert filled(opp['id']) == 2
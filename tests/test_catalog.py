@@ -0,0 +1,94 @@
+"""
+Tests for the memory-mapped catalog snapshot
+"""
+import pytest
+
+from catalog import CHECK_SECONDS, _Mapping, build_catalog
+from extensions import catalog, db
+from models import Opportunity, Organization, User
+
+
+@pytest.fixture
+def snapshot(app, tmp_path):
+    """The app's catalog reading a snapshot file in tmp_path, re-checked on every request"""
+    path = str(tmp_path / 'catalog.snap')
+    catalog.configure({'CATALOG_SNAPSHOT_PATH': path, 'CATALOG_SNAPSHOT_INTERVAL': 5})
+    catalog.check_seconds = 0
+    yield path
+    catalog.configure({})
+    catalog.check_seconds = CHECK_SECONDS
+
+
+def make_catalog(count=3):
+    owner = User(name='Owner', email='owner@test.com', role='organization', password_hash='x')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.flush()
+    opps = [Opportunity(title=f'Shift {i}', organization_id=org.id, capacity=i) for i in range(count)]
+    db.session.add_all(opps)
+    db.session.commit()
+    return org, opps
+
+
+def test_snapshot_serves_the_live_bytes(client, snapshot):
+    org, opps = make_catalog()
+    opps[1].soft_delete()
+    db.session.commit()
+    live = {path: client.get(path) for path in
+            ['/opportunities', '/organizations', f'/opportunities/{opps[2].id}', f'/organizations/{org.id}']}
+    assert all(r.headers.get('X-Coalesced') != 'snapshot' for r in live.values())
+
+    assert build_catalog(db.session, snapshot) == {'opportunities': 2, 'organizations': 1}
+
+    for path, response in live.items():
+        served = client.get(path)
+        assert served.headers['X-Coalesced'] == 'snapshot'
+        assert served.get_data() == response.get_data()
+    # Soft-deleted and unknown ids aren't in the snapshot; the database answers
+    assert client.get(f'/opportunities/{opps[1].id}').status_code == 404
+    assert client.get('/opportunities/999').get_json() == {'error': 'Opportunity not found'}
+
+
+def test_a_write_bypasses_older_snapshots_until_rebuilt(client, snapshot):
+    org, _ = make_catalog()
+    build_catalog(db.session, snapshot)
+
+    client.post('/opportunities', json={'title': 'New shift', 'organization_id': org.id})
+    fresh = client.get('/opportunities')
+    assert fresh.headers['X-Coalesced'] != 'snapshot'
+    assert 'New shift' in [o['title'] for o in fresh.get_json()]
+    # Organizations weren't written, so their snapshot is still good
+    assert client.get('/organizations').headers['X-Coalesced'] == 'snapshot'
+
+    build_catalog(db.session, snapshot)
+    rebuilt = client.get('/opportunities')
+    assert rebuilt.headers['X-Coalesced'] == 'snapshot'
+    assert rebuilt.get_data() == fresh.get_data()
+
+
+def test_rebuild_swaps_the_file_under_open_mappings(client, snapshot):
+    _, opps = make_catalog(2)
+    build_catalog(db.session, snapshot)
+    old = _Mapping(snapshot)
+
+    opps[0].title = 'Renamed'
+    db.session.commit()
+    build_catalog(db.session, snapshot)
+
+    assert b'Shift 0' in old.row('opportunities', opps[0].id)
+    assert b'Renamed' in _Mapping(snapshot).row('opportunities', opps[0].id)
+    assert client.get(f'/opportunities/{opps[0].id}').get_json()['title'] == 'Renamed'
+
+
+def test_unusable_snapshots_fall_back_to_the_database(client, snapshot):
+    make_catalog(1)
+    with open(snapshot, 'wb') as f:
+        f.write(b'not a snapshot')
+    response = client.get('/opportunities')
+    assert response.status_code == 200 and response.headers['X-Coalesced'] != 'snapshot'
+
+    build_catalog(db.session, snapshot)
+    catalog.max_age = 0
+    assert client.get('/opportunities').headers['X-Coalesced'] != 'snapshot'
@@ -0,0 +1,99 @@
+"""
+Tests for request coalescing of hot read endpoints
+"""
+import threading
+
+import pytest
+from flask import jsonify
+
+from coalescing import SingleFlight, SQLiteResponses
+from extensions import coalescer, db
+from models import Organization, User
+
+
+def make_org():
+    owner = User(name='Owner', email='owner@test.com', role='organization')
+    owner.set_password('password123')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.commit()
+    return org
+
+
+@pytest.fixture
+def shared(app, tmp_path):
+    """The app's coalescer backed by a shared response store"""
+    coalescer.shared = SQLiteResponses(str(tmp_path / 'responses.db'))
+    yield coalescer.shared
+    coalescer.shared = None
+
+
+def test_concurrent_calls_share_one_execution():
+    flight, started, release = SingleFlight(), threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'rows'
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', slow)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [('rows', False)] + [('rows', True)] * 5
+
+
+def test_errors_are_not_cached():
+    flight = SingleFlight()
+    with pytest.raises(ZeroDivisionError):
+        flight.do('k', lambda: 1 / 0)
+    assert flight.do('k', lambda: 'ok') == ('ok', False)
+
+
+def test_write_is_visible_to_the_next_read(client):
+    org = make_org()
+    first = client.get('/opportunities')
+    assert first.headers['X-Coalesced'] == 'computed'
+    assert first.get_json() == []
+
+    client.post('/opportunities', json={'title': 'Shift', 'organization_id': org.id})
+
+    assert [o['title'] for o in client.get('/opportunities').get_json()] == ['Shift']
+
+
+def test_shared_store_serves_other_workers(app, client, shared):
+    org = make_org()
+    assert client.get('/organizations').headers['X-Coalesced'] == 'computed'
+    cached = client.get('/organizations')
+    assert cached.headers['X-Coalesced'] == 'cached'
+    assert [o['id'] for o in cached.get_json()] == [org.id]
+
+    # Another worker is refreshing after a write: serve the previous response meanwhile
+    shared.bump(['organizations'])
+    assert shared.try_lock('organizations?', seconds=5)
+    stale = client.get('/organizations')
+    assert stale.headers['X-Coalesced'] == 'stale'
+    assert stale.get_data() == cached.get_data()
+
+    shared.unlock('organizations?')
+    assert client.get('/organizations').headers['X-Coalesced'] == 'computed'
+
+
+def test_lock_holder_recomputes_for_everyone(app, shared):
+    with app.test_request_context('/organizations'):
+        assert coalescer.respond('organizations', lambda: jsonify([1])).get_json() == [1]
+        coalescer.invalidate(['organizations'])
+        refreshed = coalescer.respond('organizations', lambda: jsonify([1, 2]))
+    assert refreshed.headers['X-Coalesced'] == 'computed'
+    assert shared.lookup('organizations?', 'organizations')[0] == refreshed.get_data()
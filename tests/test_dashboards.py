@@ -0,0 +1,140 @@
+"""
+Tests for organization dashboards served from opportunity_summaries
+"""
+from sqlalchemy import event, text
+
+from extensions import db
+from models import Application, Opportunity, Organization, Payment, User
+
+
+def make_org():
+    owner = User(name='Owner', email='owner@test.com', role='organization')
+    owner.set_password('password123')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.commit()
+    return org, owner
+
+
+def test_api_writes_show_up_immediately(client):
+    org, owner = make_org()
+    opp_id = client.post('/opportunities', json={'title': 'Shift', 'organization_id': org.id}).get_json()['id']
+    client.post('/applications', json={'user_id': owner.id, 'opportunity_id': opp_id})
+    client.post('/payments', json={'user_id': owner.id, 'opportunity_id': opp_id, 'amount': 20,
+                                   'payment_status': 'completed'})
+    client.post('/payments', json={'user_id': owner.id, 'opportunity_id': opp_id, 'amount': 5})
+
+    data = client.get(f'/organizations/{org.id}/dashboard').get_json()
+
+    assert data['organization']['name'] == 'Org'
+    [summary] = data['opportunities']
+    assert summary['title'] == 'Shift'
+    assert summary['applications'] == {'total': 1, 'pending': 1, 'accepted': 0, 'rejected': 0, 'waitlisted': 0}
+    assert summary['payments'] == {'count': 2, 'completed_amount': 20.0, 'pending_amount': 5.0}
+    assert data['totals']['payments']['completed_amount'] == 20.0
+
+
+def test_status_changes_and_deletes_show_up(client):
+    org, owner = make_org()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.flush()
+    application = Application(user_id=owner.id, opportunity_id=opp.id)
+    db.session.add(application)
+    db.session.commit()
+
+    application.status = 'accepted'
+    db.session.commit()
+    assert client.get(f'/organizations/{org.id}/dashboard').get_json()['totals']['applications']['accepted'] == 1
+
+    client.delete(f'/opportunities/{opp.id}')
+    data = client.get(f'/organizations/{org.id}/dashboard').get_json()
+    assert data['opportunities'] == []
+    assert data['refreshed_at'] is None
+
+
+def test_writes_add_deltas_that_match_a_recount(app, client):
+    org, owner = make_org()
+    first = Opportunity(title='First', organization_id=org.id)
+    second = Opportunity(title='Second', organization_id=org.id)
+    db.session.add_all([first, second])
+    db.session.flush()
+    application = Application(user_id=owner.id, opportunity_id=first.id)
+    moved = Payment(user_id=owner.id, opportunity_id=first.id, amount=10, payment_status='completed')
+    deleted = Payment(user_id=owner.id, opportunity_id=first.id, amount=3)
+    db.session.add_all([application, moved, deleted, Payment(user_id=owner.id, opportunity_id=second.id, amount=4)])
+    db.session.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert client.patch(f'/applications/{application.id}', json={'status': 'accepted'}).status_code == 200
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert not [s for s in statements if 'count(' in s.lower()]
+
+    moved.opportunity_id, moved.amount = second.id, 12
+    deleted.soft_delete()
+    second.title = 'Renamed'
+    db.session.commit()
+    db.session.delete(application)
+    db.session.commit()
+
+    def summaries():
+        data = client.get(f'/organizations/{org.id}/dashboard').get_json()
+        return [(o['title'], o['applications'], o['payments']) for o in data['opportunities']]
+    applied = summaries()
+    assert applied[1] == ('Renamed', {'total': 0, 'pending': 0, 'accepted': 0, 'rejected': 0, 'waitlisted': 0},
+                          {'count': 2, 'completed_amount': 12.0, 'pending_amount': 4.0})
+    assert app.test_cli_runner().invoke(args=['refresh-dashboards']).exit_code == 0
+    assert summaries() == applied
+
+
+def test_dashboard_is_one_query(client):
+    org, owner = make_org()
+    db.session.add_all([Opportunity(title=f'Shift {i}', organization_id=org.id) for i in range(5)])
+    db.session.commit()
+    url = f'/organizations/{org.id}/dashboard'
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(response.get_json()['opportunities']) == 5
+    assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == 1
+
+
+def test_out_of_band_writes_wait_for_refresh(app, client):
+    org, owner = make_org()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.commit()
+    db.session.execute(text('INSERT INTO payments (user_id, opportunity_id, amount, payment_status) '
+                            "VALUES (:user, :opp, 7, 'completed')"), {'user': owner.id, 'opp': opp.id})
+    db.session.commit()
+    assert client.get(f'/organizations/{org.id}/dashboard').get_json()['totals']['payments']['count'] == 0
+
+    result = app.test_cli_runner().invoke(args=['refresh-dashboards', '--organization-id', str(org.id)])
+
+    assert result.exit_code == 0
+    assert client.get(f'/organizations/{org.id}/dashboard').get_json()['totals']['payments']['count'] == 1
+
+
+def test_bulk_import_refreshes_its_organization(client):
+    org, owner = make_org()
+    client.post(f'/organizations/{org.id}/import/opportunities',
+                data='title\nA\nB\n', content_type='text/csv')
+
+    data = client.get(f'/organizations/{org.id}/dashboard').get_json()
+    assert [o['title'] for o in data['opportunities']] == ['A', 'B']
+
+
+def test_unknown_organization(client):
+    assert client.get('/organizations/999/dashboard').status_code == 404
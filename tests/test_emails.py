@@ -0,0 +1,83 @@
+"""
+Tests for case-insensitive emails and the migration that dedupes them
+"""
+import os
+
+import pytest
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import inspect, text
+
+from app import create_app
+from extensions import db
+from models import User
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def register(client, email):
+    return client.post('/register', json={'name': 'Alice', 'email': email,
+                                          'password': 'password123', 'role': 'volunteer'})
+
+
+def test_emails_are_stored_normalized(client):
+    assert register(client, '  Alice@Example.COM ').status_code == 201
+    assert User.query.one().email == 'alice@example.com'
+
+
+def test_register_rejects_a_different_case_of_an_existing_email(client):
+    assert register(client, 'alice@example.com').status_code == 201
+
+    response = register(client, 'ALICE@example.com')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Email already exists'}
+    assert User.query.count() == 1
+
+
+def test_login_ignores_case(client):
+    register(client, 'alice@example.com')
+    response = client.post('/login', json={'email': 'Alice@Example.com', 'password': 'password123'})
+    assert response.status_code == 200
+
+
+def test_lookup_uses_the_lower_email_index(session):
+    plan = session.execute(
+        text('EXPLAIN QUERY PLAN ' + str(User.query.filter(User.email_matches('x')).statement.compile(
+            compile_kwargs={'literal_binds': True})))
+    ).all()
+    assert 'ux_users_email_lower' in ' '.join(str(row) for row in plan)
+
+
+@pytest.fixture
+def migrated_app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'migrate.db'}",
+                      'RATELIMIT_ENABLED': False})
+    Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_migration_merges_users_that_differ_only_in_case(migrated_app):
+    upgrade(revision='e7414e0f5e75')
+    with db.engine.begin() as conn:
+        for user_id, email in [(1, 'alice@example.com'), (2, 'Alice@Example.com '), (3, 'bob@example.com')]:
+            conn.execute(text("INSERT INTO users (id, name, email, password_hash, role) "
+                              "VALUES (:id, 'U', :email, 'x', 'volunteer')"), {'id': user_id, 'email': email})
+        conn.execute(text("INSERT INTO organizations (id, name, owner_id) VALUES (1, 'Org', 2)"))
+        conn.execute(text("INSERT INTO opportunities (id, title, organization_id) VALUES (1, 'Shift', 1)"))
+        conn.execute(text("INSERT INTO applications (user_id, opportunity_id) VALUES (2, 1)"))
+
+    upgrade()
+
+    with db.engine.connect() as conn:
+        assert conn.execute(text('SELECT id, email FROM users ORDER BY id')).all() == [
+            (1, 'alice@example.com'), (3, 'bob@example.com'),
+        ]
+        # The duplicate's rows moved to the surviving account instead of being lost
+        assert conn.execute(text('SELECT owner_id FROM organizations')).scalar() == 1
+        assert conn.execute(text('SELECT user_id FROM applications')).scalar() == 1
+        indexes = conn.execute(text("SELECT name FROM sqlite_master WHERE tbl_name = 'users'")).scalars().all()
+    assert 'ux_users_email_lower' in indexes
+    assert not inspect(db.engine).get_unique_constraints('users')
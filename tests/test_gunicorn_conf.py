@@ -0,0 +1,62 @@
+"""
+Tests for gunicorn.conf.py sizing and the post-fork reset
+"""
+import os
+import runpy
+
+import pytest
+
+from app import create_app, reset_after_fork
+from extensions import limiter, shedder
+from throttling import SQLiteStorage
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+def load_conf(monkeypatch, **env):
+    for key in ('GUNICORN_WORKER_CLASS', 'WEB_CONCURRENCY', 'GUNICORN_THREADS'):
+        monkeypatch.delenv(key, raising=False)
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return runpy.run_path(CONF)
+
+
+def test_workers_follow_cpus_and_memory(monkeypatch):
+    default_workers = load_conf(monkeypatch)['default_workers']
+    gib = 1024 ** 3
+
+    assert default_workers('sync', cpus=2, memory=8 * gib, worker_mb=128) == 5
+    assert default_workers('gthread', cpus=2, memory=8 * gib, worker_mb=128) == 3
+    # A 512 MB container fits 3 workers at 128 MB each, whatever the CPU count
+    assert default_workers('sync', cpus=8, memory=512 * 1024 ** 2, worker_mb=128) == 3
+    assert default_workers('sync', cpus=8, memory=1, worker_mb=128) == 1
+
+
+def test_worker_class_selection(monkeypatch):
+    conf = load_conf(monkeypatch, WEB_CONCURRENCY='2')
+    assert (conf['worker_class'], conf['wsgi_app'], conf['workers'], conf['threads']) == ('gthread', 'app:app', 2, 4)
+    assert conf['max_requests_jitter'] > 0
+
+    conf = load_conf(monkeypatch, GUNICORN_WORKER_CLASS='uvicorn')
+    assert (conf['worker_class'], conf['wsgi_app'], conf['threads']) == ('uvicorn.workers.UvicornWorker', 'asgi:app', 1)
+
+    assert load_conf(monkeypatch, GUNICORN_WORKER_CLASS='gevent')['preload_app'] is False
+    with pytest.raises(RuntimeError):
+        load_conf(monkeypatch, GUNICORN_WORKER_CLASS='eventlet')
+
+
+def test_reset_after_fork_drops_inherited_state(tmp_path):
+    storage = limiter.storage
+    # Its own app: disposing the shared test engine would end the test transaction
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}"})
+    limiter.storage = SQLiteStorage(str(tmp_path / 'buckets.db'))
+    try:
+        inherited = limiter.storage._connect()
+        shedder.in_flight = 3
+
+        reset_after_fork(app)
+
+        assert shedder.in_flight == 0
+        assert limiter.storage._connect() is not inherited
+    finally:
+        limiter.storage = storage
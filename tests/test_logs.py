@@ -0,0 +1,156 @@
+"""
+Tests for structured request logs and the payment audit trail
+"""
+import io
+import json
+import threading
+
+import pytest
+
+from extensions import db, request_logger
+from models import Opportunity, Organization, Payment, PaymentAudit, User
+
+
+@pytest.fixture
+def log_lines(app):
+    """Turns logging on into a buffer; call it to flush and get the JSON lines so far"""
+    stream = io.StringIO()
+    request_logger.configure(dict(app.config, LOG_ENABLED=True), stream)
+
+    def lines():
+        request_logger.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+    yield lines
+    request_logger.configure(app.config)
+
+
+def make_payment(status='pending'):
+    owner = User(name='Owner', email='owner@test.com', role='organization', password_hash='x')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.flush()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.flush()
+    payment = Payment(user_id=owner.id, opportunity_id=opp.id, amount='12.50', payment_status=status)
+    db.session.add(payment)
+    db.session.commit()
+    return payment
+
+
+def test_request_ids_are_echoed_and_logged(client, log_lines):
+    given = client.get('/', headers={'X-Request-ID': 'edge-1234'})
+    made = client.get('/', headers={'X-Request-ID': 'not an id'})
+
+    assert given.headers['X-Request-ID'] == 'edge-1234'
+    assert made.headers['X-Request-ID'] != 'not an id' and len(made.headers['X-Request-ID']) == 32
+    first, second = log_lines()
+    assert first['request_id'] == 'edge-1234' and second['request_id'] == made.headers['X-Request-ID']
+    assert {key: first[key] for key in ('logger', 'method', 'path', 'endpoint', 'status')} == {
+        'logger': 'volunteer.access', 'method': 'GET', 'path': '/', 'endpoint': 'api.home', 'status': 200}
+
+
+def test_sampled_routes_still_log_errors(client, log_lines):
+    request_logger.sample_rates = {'api.get_organization': 0.0, 'api.organizations': 0.5}
+    client.get('/organizations/999')
+    client.get('/organizations')
+    request_logger.slow_ms = 0
+    client.get('/organizations')
+
+    statuses = [(line['path'], line['status'], line.get('sample_rate')) for line in log_lines()]
+    # The 404 isn't sampled; of the two listings, only the slow one is sure to be logged
+    assert statuses[0] == ('/organizations/999', 404, None)
+    assert statuses[-1] == ('/organizations', 200, None)
+
+
+def test_writes_to_sampled_endpoints_are_always_logged(client, log_lines):
+    owner = User(name='Owner', email='owner@test.com', role='organization', password_hash='x')
+    db.session.add(owner)
+    db.session.commit()
+    request_logger.sample_rates = {'api.organizations': 0.0}
+    client.get('/organizations')
+    client.post('/organizations', json={'name': 'Org', 'owner_id': owner.id})
+
+    # The listing shares the endpoint but is a read, so sampling skips it
+    assert [(line['method'], line['status'], line.get('sample_rate')) for line in log_lines()] == [
+        ('POST', 201, None)]
+
+
+def test_a_stalled_stream_drops_lines_instead_of_blocking(app, client):
+    writing, release = threading.Event(), threading.Event()
+
+    class Stalled(io.StringIO):
+        def write(self, text):
+            writing.set()
+            release.wait()
+            return super().write(text)
+
+    stream = Stalled()
+    request_logger.configure(dict(app.config, LOG_ENABLED=True, LOG_QUEUE_SIZE=2), stream)
+    try:
+        client.get('/')
+        assert writing.wait(5)
+        # The writer is stuck on the first line: two more fit in the queue, three are dropped
+        for _ in range(5):
+            assert client.get('/').status_code == 200
+        release.set()
+        while len(stream.getvalue().splitlines()) < 3:
+            writing.wait(0.01)
+        client.get('/')
+        request_logger.stop()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert [line.get('dropped') for line in lines] == [None, None, None, 3]
+    finally:
+        release.set()
+        request_logger.configure(app.config)
+
+
+def test_payment_status_changes_are_audited(client, log_lines):
+    payment = make_payment()
+    headers = {'X-Request-ID': 'pay-1'}
+    client.patch(f'/payments/{payment.id}', json={'payment_status': 'completed'}, headers=headers)
+    client.patch(f'/payments/{payment.id}', json={'amount': 20}, headers=headers)
+    client.patch(f'/payments/{payment.id}', json={'payment_status': 'paid'}, headers=headers)
+
+    audit = [(row.payment_id, row.old_status, row.new_status, row.request_id)
+             for row in PaymentAudit.query.order_by(PaymentAudit.id)]
+    assert audit == [(payment.id, None, 'pending', None), (payment.id, 'pending', 'completed', 'pay-1')]
+    lines = [line for line in log_lines() if line['logger'] == 'volunteer.audit']
+    assert [(line['old_status'], line['new_status'], line.get('request_id')) for line in lines] == [
+        (None, 'pending', None), ('pending', 'completed', 'pay-1')]
+
+
+def test_new_payments_are_audited(app, client, log_lines, tmp_path):
+    payment = make_payment()
+    response = client.post('/payments', json={'user_id': payment.user_id, 'opportunity_id': payment.opportunity_id,
+                                              'amount': 5, 'payment_status': 'completed'},
+                           headers={'X-Request-ID': 'pay-2'})
+    created = response.get_json()['id']
+    path = tmp_path / 'payments.ndjson'
+    path.write_text(json.dumps({'user_id': payment.user_id, 'opportunity_id': payment.opportunity_id,
+                                'amount': '7.25', 'payment_status': 'completed'}))
+    assert 'Imported 1 rows' in app.test_cli_runner().invoke(args=['import-data', 'payments', str(path)]).output
+    imported = Payment.query.order_by(Payment.id.desc()).first().id
+
+    audit = [(row.payment_id, row.old_status, row.new_status, str(row.amount), row.request_id)
+             for row in PaymentAudit.query.order_by(PaymentAudit.id)]
+    assert audit == [(payment.id, None, 'pending', '12.50', None), (created, None, 'completed', '5.00', 'pay-2'),
+                     (imported, None, 'completed', '7.25', None)]
+    lines = [line for line in log_lines() if line['logger'] == 'volunteer.audit']
+    assert [(line['payment_id'], line['old_status'], line['new_status']) for line in lines] == [
+        (payment.id, None, 'pending'), (created, None, 'completed'), (imported, None, 'completed')]
+
+
+def test_audit_rows_roll_back_with_the_change(app):
+    payment = make_payment()
+    db.session.expire_all()
+    payment.payment_status = 'failed'
+    db.session.flush()
+    assert PaymentAudit.query.count() == 2
+    db.session.rollback()
+
+    # Only the creation, committed before, is left
+    assert PaymentAudit.query.count() == 1
+    assert db.session.info.get('payment_audit') is None
@@ -0,0 +1,44 @@
+"""
+The migration chain must build exactly the schema models.py declares
+"""
+import os
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import Migrate, downgrade, upgrade
+
+from app import create_app
+from extensions import db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def migrated_app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'migrate.db'}",
+                      'RATELIMIT_ENABLED': False})
+    Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        yield app
+        db.engine.dispose()
+
+
+def schema_drift():
+    with db.engine.connect() as conn:
+        return compare_metadata(MigrationContext.configure(conn), db.metadata)
+
+
+@pytest.mark.filterwarnings('ignore:autogenerate skipping')
+def test_models_and_migrations_do_not_drift(migrated_app):
+    upgrade()
+    # A failure lists what differs: add a migration (flask db migrate) or fix the model
+    assert schema_drift() == []
+
+
+@pytest.mark.filterwarnings('ignore:autogenerate skipping')
+def test_every_migration_downgrades(migrated_app):
+    upgrade()
+    downgrade(revision='base')
+    upgrade()
+    assert schema_drift() == []
@@ -0,0 +1,173 @@
+"""
+Tests for opt-in partitioning of opportunities and payments
+
+The partitioned tests need PostgreSQL: run them with TEST_DATABASE_URL set.
+The conversion is transactional DDL, so each test's rollback undoes it.
+"""
+from datetime import datetime
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import delete, text
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Application, Opportunity, Organization, Payment, User
+from partitioning import (add_months, create_partitions, include_object, month_partition, month_start,
+                          partition_tables)
+
+
+def make_org(name='Org', email='owner@test.com'):
+    owner = User(name='Owner', email=email, role='organization')
+    owner.set_password('password123')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name=name, owner_id=owner.id)
+    db.session.add(org)
+    db.session.commit()
+    return org, owner
+
+
+def scanned(sql, **params):
+    """Tables an EXPLAIN plan reads"""
+    plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {sql}'), params).scalar()
+    tables, nodes = set(), [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if 'Relation Name' in node:
+            tables.add(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return tables
+
+
+@pytest.fixture
+def partitioned(app):
+    if db.engine.dialect.name != 'postgresql':
+        pytest.skip('partitioning needs PostgreSQL (set TEST_DATABASE_URL)')
+    assert partition_tables(db.session.connection(), opportunity_partitions=4, months_ahead=1) == [
+        'opportunities', 'payments',
+    ]
+
+
+def test_month_arithmetic():
+    assert add_months(datetime(2026, 11, 1), 3) == datetime(2027, 2, 1)
+    assert month_start(datetime(2026, 10, 19, 15, 30)) == datetime(2026, 10, 1)
+    assert month_partition(datetime(2027, 2, 1)) == 'payments_y2027m02'
+
+
+@pytest.mark.parametrize('command', [['partition-tables', '--yes'], ['create-partitions']])
+def test_commands_need_postgresql(app, command):
+    if db.engine.dialect.name == 'postgresql':
+        pytest.skip('checks the error on other databases')
+    result = app.test_cli_runner().invoke(args=command)
+    assert result.exit_code == 1
+    assert 'Partitioning needs PostgreSQL' in result.output
+
+
+def test_one_organization_reads_one_partition(partitioned):
+    org, owner = make_org()
+    other, _ = make_org('Other', 'other@test.com')
+    db.session.add_all([Opportunity(title='Shift', organization_id=o.id) for o in (org, other)])
+    db.session.commit()
+
+    tables = scanned('SELECT * FROM opportunities WHERE organization_id = :org', org=org.id)
+
+    assert len(tables) == 1 and tables.pop().startswith('opportunities_p')
+
+
+def test_date_range_reads_only_its_months(partitioned):
+    month = month_start(datetime.utcnow())
+    tables = scanned('SELECT sum(amount) FROM payments WHERE payment_date >= :start AND payment_date < :end',
+                     start=month, end=add_months(month, 1))
+    assert tables == {month_partition(month)}
+
+
+def test_routes_work_unchanged(partitioned, client):
+    org, owner = make_org()
+    opp = client.post('/opportunities', json={'title': 'Shift', 'organization_id': org.id}).get_json()
+    payment = client.post('/payments', json={'user_id': owner.id, 'opportunity_id': opp['id'], 'amount': 12.5})
+
+    assert payment.status_code == 201
+    update = client.patch(f"/payments/{payment.get_json()['id']}", json={'payment_status': 'completed'})
+    assert update.status_code == 200
+    assert [o['id'] for o in client.get('/opportunities').get_json()] == [opp['id']]
+    assert client.get(f'/organizations/{org.id}/dashboard').get_json()['totals']['payments']['count'] == 1
+
+
+def test_triggers_stand_in_for_foreign_keys(partitioned):
+    org, owner = make_org()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.flush()
+    opp_id = opp.id
+    db.session.add(Application(user_id=owner.id, opportunity_id=opp_id))
+    db.session.commit()
+
+    db.session.execute(delete(Opportunity).where(Opportunity.id == opp_id))
+    assert db.session.scalar(text('SELECT count(*) FROM applications')) == 0
+
+    db.session.add(Application(user_id=owner.id, opportunity_id=opp_id))
+    with pytest.raises(IntegrityError):
+        db.session.flush()
+    db.session.rollback()
+
+
+def test_moving_an_opportunity_to_another_organization_keeps_its_history(partitioned, client):
+    org, owner = make_org()
+    others = [make_org(f'Org {i}', f'org{i}@test.com')[0] for i in range(8)]
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.flush()
+    opp_id = opp.id
+    db.session.add_all([
+        Application(user_id=owner.id, opportunity_id=opp_id),
+        Payment(user_id=owner.id, opportunity_id=opp_id, amount='5.00'),
+    ])
+    db.session.commit()
+
+    def partition_of():
+        return db.session.scalar(text('SELECT tableoid::regclass::text FROM opportunities WHERE id = :id'),
+                                 {'id': opp_id})
+
+    # An organization whose opportunities hash to another partition
+    before = partition_of()
+    target = next(o for o in others if not db.session.scalar(
+        text("SELECT satisfies_hash_partition('opportunities'::regclass, 4, :remainder, :org)"),
+        {'remainder': int(before[-2:]), 'org': o.id},
+    ))
+    response = client.patch(f'/opportunities/{opp_id}', json={'organization_id': target.id})
+
+    assert response.status_code == 200
+    assert partition_of() != before
+    assert db.session.scalar(text('SELECT count(*) FROM applications WHERE opportunity_id = :id'), {'id': opp_id}) == 1
+    assert db.session.scalar(text('SELECT count(*) FROM payments WHERE opportunity_id = :id'), {'id': opp_id}) == 1
+    dashboard = client.get(f'/organizations/{target.id}/dashboard').get_json()
+    assert dashboard['totals']['applications']['total'] == 1
+
+
+def test_create_partitions_moves_rows_out_of_the_default(partitioned):
+    org, owner = make_org()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.flush()
+    later = add_months(month_start(datetime.utcnow()), 6)
+    payment = Payment(user_id=owner.id, opportunity_id=opp.id, amount='5.00', payment_date=later)
+    db.session.add(payment)
+    db.session.commit()
+
+    def partition_of(payment_id):
+        return db.session.scalar(text('SELECT tableoid::regclass::text FROM payments WHERE id = :id'),
+                                 {'id': payment_id})
+
+    assert partition_of(payment.id) == 'payments_default'
+    assert month_partition(later) in create_partitions(db.session.connection(), months_ahead=6)
+    assert partition_of(payment.id) == month_partition(later)
+    assert create_partitions(db.session.connection(), months_ahead=6) == []
+
+
+@pytest.mark.filterwarnings('ignore:autogenerate skipping')
+def test_partitions_are_not_drift(partitioned):
+    connection = db.session.connection()
+    context = MigrationContext.configure(connection, opts={'include_object': include_object(connection)})
+    assert compare_metadata(context, db.metadata) == []
@@ -0,0 +1,114 @@
+"""
+Tests for exact payment amounts and reconciliation against a provider statement
+"""
+from decimal import Decimal
+
+import pytest
+
+from extensions import db
+from models import Opportunity, Organization, Payment, User
+
+
+def make_opportunity():
+    owner = User(name='Owner', email='owner@test.com', role='organization')
+    owner.set_password('password123')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.flush()
+    opp = Opportunity(title='Shift', organization_id=org.id)
+    db.session.add(opp)
+    db.session.commit()
+    return opp, owner
+
+
+def pay(client, opp, owner, amount, **fields):
+    return client.post('/payments', json={'user_id': owner.id, 'opportunity_id': opp.id,
+                                          'amount': amount, **fields})
+
+
+def test_amounts_are_stored_exactly(client):
+    opp, owner = make_opportunity()
+    for amount in (0.1, 0.2, '19.99'):
+        assert pay(client, opp, owner, amount, payment_status='completed').status_code == 201
+
+    assert [p.amount for p in Payment.query.order_by(Payment.id)] == [
+        Decimal('0.10'), Decimal('0.20'), Decimal('19.99'),
+    ]
+    assert client.get('/payments').get_json()[0]['amount'] == 0.1
+    dashboard = client.get(f'/organizations/{opp.organization_id}/dashboard').get_json()
+    assert dashboard['totals']['payments']['completed_amount'] == 20.29
+
+
+@pytest.mark.parametrize('amount, error', [
+    ('ten', 'Amount must be a number'),
+    ('NaN', 'Amount must be a number'),
+    (True, 'Amount must be a number'),
+    (1.005, 'Amount can have at most 2 decimal places'),
+    (-5, 'Amount must be positive'),
+    (10 ** 10, 'Amount is too large'),
+])
+def test_invalid_amounts(client, amount, error):
+    opp, owner = make_opportunity()
+    response = pay(client, opp, owner, amount)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error, 'errors': {'amount': error}}
+
+
+# --------------------
+# Reconciliation
+# --------------------
+def test_reconcile_reports_every_kind_of_discrepancy(app, tmp_path):
+    pytest.importorskip('numpy')
+    opp, owner = make_opportunity()
+    db.session.add_all([
+        Payment(user_id=owner.id, opportunity_id=opp.id, amount=amount, payment_status=status)
+        for amount, status in [('10.00', 'completed'), ('20.50', 'completed'), ('30.00', 'completed'),
+                               ('40.00', 'completed'), ('99.00', 'pending')]
+    ])
+    db.session.commit()
+    p1, p2, p3, p4, pending = [p.id for p in Payment.query.order_by(Payment.id)]
+    statement = tmp_path / 'statement.csv'
+    statement.write_text('currency,payment_id,amount\n'
+                         f'EUR,{p2},20.05\nEUR,{p1},10.00\nEUR,{p4},"40.00"\nEUR,{p4},40.00\nEUR,999,5.00\n')
+
+    result = app.test_cli_runner().invoke(args=['reconcile-payments', str(statement), '--chunk-size', '2'])
+
+    assert result.exit_code == 1
+    assert f'amount mismatch: payment {p2} ledger 20.50 statement 20.05' in result.output
+    assert f'missing from statement: payment {p3}' in result.output
+    assert 'missing from ledger: payment 999' in result.output
+    assert f'duplicates: payment {p4}' in result.output
+    # Only completed payments are expected on the statement by default
+    assert f'payment {pending}' not in result.output
+
+
+def test_reconcile_clean_statement(app, tmp_path):
+    pytest.importorskip('numpy')
+    opp, owner = make_opportunity()
+    db.session.add(Payment(user_id=owner.id, opportunity_id=opp.id, amount='0.30', payment_status='completed'))
+    db.session.commit()
+    statement = tmp_path / 'statement.csv'
+    statement.write_text(f'payment_id,amount\n{Payment.query.one().id},0.3\n')
+
+    result = app.test_cli_runner().invoke(args=['reconcile-payments', str(statement)])
+
+    assert result.exit_code == 0, result.output
+    assert 'matched: 1' in result.output
+
+
+def test_reconcile_matches_in_chunks():
+    np = pytest.importorskip('numpy')
+    from reconcile import reconcile
+
+    statement_ids = np.arange(1, 11, dtype=np.int64)
+    statement_cents = statement_ids * 100
+    ledger = [(np.array([1, 2, 3]), np.array([100, 200, 301])), (np.array([4, 12]), np.array([400, 5]))]
+
+    result = reconcile(statement_ids, statement_cents, iter(ledger))
+
+    assert result['matched'] == 3
+    assert result['mismatched'].tolist() == [[3, 301, 300]]
+    assert result['missing_from_statement'].tolist() == [12]
+    assert result['missing_from_ledger'].tolist() == [5, 6, 7, 8, 9, 10]
@@ -0,0 +1,96 @@
+"""
+Tests for read-replica routing, using two SQLite files as primary and replica
+"""
+import pytest
+
+from app import create_app
+from coalescing import SQLiteResponses
+from extensions import coalescer, db
+from models import Organization, User
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'REPLICA_URLS': [f"sqlite:///{tmp_path / 'replica.db'}"],
+        'REPLICA_STICKY_SECONDS': 60,
+        'RATELIMIT_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica_0'])
+        # Same owner on both sides; each side has an organization the other lacks
+        for engine, org_name in ((db.engine, 'Primary Org'), (db.engines['replica_0'], 'Replica Org')):
+            with engine.begin() as conn:
+                conn.execute(User.__table__.insert(), {
+                    'id': 1, 'name': 'Owner', 'email': 'owner@test.com',
+                    'password_hash': 'x', 'role': 'organization',
+                })
+                conn.execute(Organization.__table__.insert(), {'name': org_name, 'owner_id': 1})
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # Engines register a metadata per bind key on the shared db; other apps'
+    # create_all() would look for a replica_0 bind they don't have
+    db.metadatas.pop('replica_0', None)
+
+
+def org_names(client, **kwargs):
+    return [o['name'] for o in client.get('/organizations', **kwargs).get_json()]
+
+
+def test_reads_go_to_replica(replica_app):
+    assert org_names(replica_app.test_client()) == ['Replica Org']
+
+
+def test_writes_go_to_primary_and_stick(replica_app):
+    client = replica_app.test_client()
+
+    response = client.post('/organizations', json={'name': 'New Org', 'owner_id': 1})
+    assert response.status_code == 201
+
+    # Read-after-write: this client now reads from the primary
+    assert org_names(client) == ['Primary Org', 'New Org']
+
+
+def test_sticky_window_follows_the_client_not_everyone(replica_app):
+    writer = replica_app.test_client()
+    writer.post('/organizations', json={'name': 'New Org', 'owner_id': 1},
+                environ_base={'REMOTE_ADDR': '10.0.0.1'})
+
+    other = replica_app.test_client()
+    assert org_names(other, environ_base={'REMOTE_ADDR': '10.0.0.2'}) == ['Replica Org']
+
+
+def test_window_expires(replica_app):
+    replica_app.config['REPLICA_STICKY_SECONDS'] = 0
+    client = replica_app.test_client()
+    client.post('/organizations', json={'name': 'New Org', 'owner_id': 1})
+
+    assert org_names(client) == ['Replica Org']
+
+
+def test_only_primary_responses_are_shared_between_workers(replica_app, tmp_path):
+    coalescer.shared = SQLiteResponses(str(tmp_path / 'responses.db'))
+    try:
+        writer, other = replica_app.test_client(), replica_app.test_client()
+        writer.post('/organizations', json={'name': 'New Org', 'owner_id': 1},
+                    environ_base={'REMOTE_ADDR': '10.0.0.1'})
+
+        # The first read after the write runs on the lagging replica; it must
+        # not become the shared response for the new generation
+        assert org_names(other, environ_base={'REMOTE_ADDR': '10.0.0.2'}) == ['Replica Org']
+        response = writer.get('/organizations', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        assert [o['name'] for o in response.get_json()] == ['Primary Org', 'New Org']
+        assert response.headers['X-Coalesced'] == 'computed'
+
+        # Once the primary has computed it, replica requests may use it
+        response = other.get('/organizations', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        assert [o['name'] for o in response.get_json()] == ['Primary Org', 'New Org']
+        assert response.headers['X-Coalesced'] == 'cached'
+    finally:
+        coalescer.shared = None
@@ -0,0 +1,84 @@
+"""
+Tests for soft delete, archival and database-side cascades
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from extensions import db
+from models import (Application, Opportunity, Organization, Payment, User,
+                    applications_archive, opportunities_archive, payments_archive)
+
+
+def make_opportunity_with_history():
+    owner = User(name='Owner', email='owner@test.com', role='organization')
+    owner.set_password('password123')
+    db.session.add(owner)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=owner.id)
+    db.session.add(org)
+    db.session.flush()
+    opp = Opportunity(title='Shift', organization_id=org.id, created_by=owner.id)
+    db.session.add(opp)
+    db.session.flush()
+    db.session.add_all([
+        Application(user_id=owner.id, opportunity_id=opp.id),
+        Payment(user_id=owner.id, opportunity_id=opp.id, amount=25.0),
+    ])
+    db.session.commit()
+    return org, opp
+
+
+def count(table):
+    return db.session.scalar(select(func.count()).select_from(table))
+
+
+def test_deleted_payments_are_hidden_but_kept(client):
+    org, opp = make_opportunity_with_history()
+    payment_id = Payment.query.one().id
+
+    assert client.delete(f'/payments/{payment_id}').status_code == 200
+    assert client.get('/payments').get_json() == []
+    assert client.patch(f'/payments/{payment_id}', json={'amount': 1}).status_code == 404
+    assert count(Payment.__table__) == 1
+
+
+def test_archive_moves_old_soft_deleted_rows(app):
+    org, opp = make_opportunity_with_history()
+    opp.deleted_at = datetime.utcnow() - timedelta(days=40)
+    db.session.commit()
+    opp_id = opp.id
+
+    result = app.test_cli_runner().invoke(args=['archive-deleted', '--older-than-days', '30', '--pause', '0'])
+
+    assert 'Archived 1 opportunities, 1 applications and 1 payments' in result.output
+    assert count(Opportunity.__table__) == 0
+    assert count(opportunities_archive) == 1
+    assert count(payments_archive) == 1
+    # Applications are archived with their opportunity, not lost to ON DELETE CASCADE
+    assert count(Application.__table__) == 0
+    archived = db.session.execute(select(applications_archive)).one()
+    assert archived.opportunity_id == opp_id and archived.status == 'pending'
+
+
+
+def test_recently_deleted_rows_are_not_archived(app):
+    org, opp = make_opportunity_with_history()
+    opp.soft_delete()
+    db.session.commit()
+
+    app.test_cli_runner().invoke(args=['archive-deleted', '--pause', '0'])
+
+    assert count(opportunities_archive) == 0
+    assert count(Opportunity.__table__) == 1
+
+
+def test_hard_delete_cascades_in_the_database(app):
+    org, opp = make_opportunity_with_history()
+
+    db.session.delete(org)
+    db.session.commit()
+
+    assert count(Opportunity.__table__) == 0
+    assert count(Application.__table__) == 0
+    assert count(Payment.__table__) == 0
@@ -0,0 +1,138 @@
+"""
+Tests for per-client rate limiting and load shedding
+"""
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import jsonify
+from extensions import limiter, shedder
+from throttling import MemoryStorage, SQLiteStorage, parse_budget
+
+
+@pytest.fixture
+def client(app, client):
+    """Test client with rate limiting on and a tiny /register budget"""
+    budgets = app.config['RATELIMIT_BUDGETS']
+    app.config.update(RATELIMIT_ENABLED=True, RATELIMIT_BUDGETS=dict(budgets, **{'api.register': '2/minute'}))
+    limiter.storage.reset()
+    yield client
+    app.config.update(RATELIMIT_ENABLED=False, RATELIMIT_BUDGETS=budgets)
+    limiter.storage.reset()
+
+
+def test_parse_budget():
+    assert parse_budget('30/minute') == (0.5, 30)
+    assert parse_budget('5/second') == (5.0, 5)
+
+
+@pytest.mark.parametrize('make_storage', [
+    lambda tmp_path: MemoryStorage(),
+    lambda tmp_path: SQLiteStorage(str(tmp_path / 'buckets.db')),
+])
+def test_token_bucket_refills(make_storage, tmp_path):
+    storage = make_storage(tmp_path)
+    assert storage.take('k', rate=1.0, burst=2, now=100.0) == (True, 0.0)
+    assert storage.take('k', rate=1.0, burst=2, now=100.0) == (True, 0.0)
+    allowed, retry_after = storage.take('k', rate=1.0, burst=2, now=100.5)
+    assert not allowed and retry_after == pytest.approx(0.5)
+    assert storage.take('k', rate=1.0, burst=2, now=101.5)[0]
+
+
+def test_register_is_rate_limited_per_client(client):
+    for _ in range(2):
+        assert client.post('/register', json={}).status_code == 400
+
+    response = client.post('/register', json={})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    # Another address has its own budget
+    other = client.post('/register', json={}, environ_base={'REMOTE_ADDR': '10.0.0.9'})
+    assert other.status_code == 400
+
+
+def test_same_user_is_limited_across_addresses(client):
+    for addr in ('10.0.0.1', '10.0.0.2'):
+        response = client.post('/register', json={'email': 'A@x.com'}, environ_base={'REMOTE_ADDR': addr})
+        assert response.status_code == 400
+
+    response = client.post('/register', json={'email': 'a@x.com'}, environ_base={'REMOTE_ADDR': '10.0.0.3'})
+    assert response.status_code == 429
+
+
+def test_spoofed_forwarded_for_does_not_reset_the_budget(client):
+    # The proxy appends the address it saw; anything left of it came from the client
+    for spoofed in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+        response = client.post('/register', json={}, headers={'X-Forwarded-For': f'{spoofed}, 10.0.0.7'})
+    assert response.status_code == 429
+
+
+def test_sheds_load_when_worker_is_saturated(app, client):
+    app.config['SHED_MAX_IN_FLIGHT'], limit = 1, app.config['SHED_MAX_IN_FLIGHT']
+    shedder.in_flight += 1
+    try:
+        response = client.get('/opportunities')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        # Health checks are never shed
+        assert client.get('/').status_code == 200
+    finally:
+        shedder.in_flight -= 1
+        app.config['SHED_MAX_IN_FLIGHT'] = limit
+
+
+@pytest.fixture
+def slow_organizations(app, monkeypatch):
+    """GET /organizations blocks until released; yields (entered, release) events"""
+    entered, release = threading.Semaphore(0), threading.Event()
+
+    def slow():
+        entered.release()
+        release.wait(5)
+        return jsonify([])
+
+    monkeypatch.setitem(app.view_functions, 'api.organizations', slow)
+    monkeypatch.setitem(app.config, 'SHED_MAX_IN_FLIGHT', 2)
+    yield entered, release
+    release.set()
+
+
+def get_organizations(app):
+    return app.test_client().get('/organizations').status_code
+
+
+def test_sheds_when_threads_are_busy(app, slow_organizations):
+    entered, release = slow_organizations
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        running = [pool.submit(get_organizations, app) for _ in range(2)]
+        for _ in running:
+            assert entered.acquire(timeout=5)
+        # Both other threads are inside a request
+        assert pool.submit(get_organizations, app).result(timeout=5) == 503
+        release.set()
+        assert [f.result(timeout=5) for f in running] == [200, 200]
+    assert shedder.in_flight == 0
+
+
+def test_sheds_requests_queued_behind_the_worker_threads(app, slow_organizations, monkeypatch):
+    # Like gunicorn's gthread worker: accepted requests wait in a deque for one thread
+    entered, release = slow_organizations
+    accepted = deque()
+    monkeypatch.setattr(shedder, 'backlog', lambda: len(accepted))
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        def accept():
+            future = pool.submit(get_organizations, app)
+            accepted.append(future)
+            future.add_done_callback(accepted.remove)
+            return future
+
+        first = accept()
+        assert entered.acquire(timeout=5)
+        queued = [accept() for _ in range(3)]
+        release.set()
+        # The first queued request finds two more behind it and is shed; by the
+        # time the others get a thread the backlog has drained
+        assert first.result(timeout=5) == 200
+        assert [f.result(timeout=5) for f in queued] == [503, 200, 200]
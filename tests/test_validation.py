@@ -0,0 +1,102 @@
+"""
+Tests for the request schemas in validation.py
+"""
+import pytest
+from decimal import Decimal
+from sqlalchemy import event
+
+from extensions import db
+from models import Opportunity, Organization, Payment, User
+from validation import OPPORTUNITY, OPPORTUNITY_UPDATE, PAYMENT, PAYMENT_UPDATE, REGISTER
+
+
+@pytest.fixture
+def statements(app):
+    """SQL statements run during the test"""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_values_are_coerced():
+    values, problem = OPPORTUNITY.validate({'title': 'Shift', 'organization_id': '3', 'duration': '4',
+                                            'capacity': 10.0, 'location': '', 'unknown': 'x'})
+    assert problem is None
+    assert values == {'title': 'Shift', 'organization_id': 3, 'description': None, 'location': None,
+                      'duration': 4, 'created_by': None, 'capacity': 10}
+    values, _ = PAYMENT.validate({'user_id': 1, 'opportunity_id': 2, 'amount': '19.99'})
+    assert values['amount'] == Decimal('19.99') and values['payment_status'] == 'pending'
+
+
+def test_every_error_is_reported():
+    _, problem = OPPORTUNITY.validate({'organization_id': True, 'duration': 'x', 'capacity': -1})
+    assert problem == {
+        'error': 'Missing title or organization_id; organization_id must be an integer; '
+                 'Duration must be a number; capacity must be at least 0',
+        'errors': {'title': 'title is required', 'organization_id': 'organization_id must be an integer',
+                   'duration': 'Duration must be a number', 'capacity': 'capacity must be at least 0'},
+    }
+    assert REGISTER.validate(['not', 'an', 'object'])[1]['error'] == 'Request body must be a JSON object'
+
+
+def test_partial_checks_only_what_is_present():
+    assert OPPORTUNITY.validate({'capacity': None}, partial=True) == ({'capacity': None}, None)
+    assert OPPORTUNITY.validate({'title': ''}, partial=True)[1]['errors'] == {'title': "title can't be empty"}
+    assert PAYMENT_UPDATE.validate({'payment_status': None}, partial=True)[1]['errors'] == {
+        'payment_status': "payment_status can't be empty"}
+
+
+def test_updates_only_take_editable_fields():
+    assert PAYMENT_UPDATE.validate({'user_id': 3, 'opportunity_id': 2, 'amount': '5'}, partial=True) == (
+        {'amount': Decimal('5.00')}, None)
+    assert OPPORTUNITY_UPDATE.validate({'created_by': 3, 'title': 'Late shift'}, partial=True) == (
+        {'title': 'Late shift'}, None)
+
+
+def test_patch_cannot_reassign_a_payment_or_an_opportunity(client):
+    users = [User(name=name, email=f'{name}@test.com', role='organization') for name in ('a', 'b')]
+    for user in users:
+        user.set_password('password123')
+    db.session.add_all(users)
+    db.session.flush()
+    org = Organization(name='Org', owner_id=users[0].id)
+    db.session.add(org)
+    db.session.flush()
+    opps = [Opportunity(title=title, organization_id=org.id, created_by=users[0].id) for title in ('A', 'B')]
+    db.session.add_all(opps)
+    db.session.flush()
+    payment = Payment(user_id=users[0].id, opportunity_id=opps[0].id, amount='5.00')
+    db.session.add(payment)
+    db.session.commit()
+    a, b, payment_id = users[0].id, users[1].id, payment.id
+
+    response = client.patch(f'/payments/{payment_id}', json={'user_id': b, 'opportunity_id': opps[1].id})
+    assert response.status_code == 200
+    assert (response.get_json()['user_id'], response.get_json()['opportunity_id']) == (a, opps[0].id)
+
+    response = client.patch(f'/opportunities/{opps[0].id}', json={'created_by': b, 'title': 'Renamed'})
+    assert response.status_code == 200
+    assert (response.get_json()['created_by'], response.get_json()['title']) == (a, 'Renamed')
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('post', '/register', {'name': 'A', 'email': 'a@test.com', 'password': 'pw', 'role': 'admin'}),
+    ('post', '/login', {'email': 'a@test.com'}),
+    ('post', '/organizations', {'name': 'Org', 'owner_id': 'me'}),
+    ('post', '/opportunities', {'title': 'X', 'organization_id': 2 ** 40}),
+    ('patch', '/opportunities/1', {'duration': 'long'}),
+    ('post', '/applications', {'user_id': 1, 'opportunity_id': [1]}),
+    ('patch', '/applications/1', {'status': 'maybe'}),
+    ('post', '/payments', {'user_id': 1, 'opportunity_id': 1, 'amount': 5, 'payment_status': 'paid'}),
+    ('patch', '/payments/1', {'amount': 'ten'}),
+])
+def test_bad_requests_are_rejected_before_any_query(client, statements, method, path, body):
+    response = getattr(client, method)(path, json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['errors']
+    assert statements == []
@@ -0,0 +1,279 @@
+"""
+Rate limiting and load shedding for Volunteer Connect
+
+RateLimiter keeps one token bucket per (route, client) pair. A client is the
+caller's IP address plus, when the request body names one, the user it acts
+for (user_id or email), so a single user cannot dodge the limit by hopping
+addresses and a single address cannot hammer many accounts.
+
+LoadShedder rejects new work with 503 + Retry-After once the worker already
+holds too many requests or requests have been queued in front of it for too
+long. Under gunicorn's gthread worker it counts what the server has accepted
+for this worker (running or waiting for a thread); elsewhere it counts the
+requests its own hooks have seen.
+"""
+import math
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+# --------------------
+# Token bucket storage
+# --------------------
+class MemoryStorage:
+    """Per-process bucket storage. Fast, but every worker has its own budget."""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def take(self, key, rate, burst, cost=1, now=None):
+        """Take `cost` tokens from `key`. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) / rate
+
+            self._ops += 1
+            if self._ops % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+        return allowed, retry_after
+
+    def _sweep(self, now):
+        # A bucket that has been idle long enough to refill is the same as no bucket
+        idle = [k for k, (_, updated) in self._buckets.items() if now - updated > 3600]
+        for key in idle:
+            del self._buckets[key]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def after_fork(self):
+        # The parent's lock may have been held mid-fork; start clean
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+
+class SQLiteStorage:
+    """
+    Bucket storage shared by every worker on the host through a SQLite file.
+
+    Stands in for a networked store such as Redis: the read-modify-write runs
+    inside BEGIN IMMEDIATE, so concurrent workers see one consistent budget.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, cost=1, now=None):
+        # Wall clock, because monotonic clocks are not comparable across processes
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+    def reset(self):
+        self._connect().execute("DELETE FROM buckets")
+
+    def after_fork(self):
+        # A SQLite connection must not be used across fork: abandon the parent's
+        self._local = threading.local()
+
+
+def storage_from_url(url):
+    """Build a storage backend from `memory://` or `sqlite:///path/to/file`."""
+    if not url or url == "memory://":
+        return MemoryStorage()
+    if url.startswith("sqlite:///"):
+        return SQLiteStorage(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported rate limit storage: {url}")
+
+
+def parse_budget(budget):
+    """Parse "10/minute" into (tokens per second, burst size)."""
+    count, _, period = budget.partition("/")
+    seconds = {"second": 1, "minute": 60, "hour": 3600}[period.strip()]
+    count = int(count)
+    return count / seconds, count
+
+
+# --------------------
+# Rate limiter
+# --------------------
+class RateLimiter:
+    """Per-route token buckets keyed by client IP and acting user."""
+
+    def __init__(self, app=None):
+        self.storage = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RATELIMIT_ENABLED", True)
+        app.config.setdefault("RATELIMIT_STORAGE_URL", "memory://")
+        app.config.setdefault("RATELIMIT_BUDGETS", {})
+        self.storage = storage_from_url(app.config["RATELIMIT_STORAGE_URL"])
+        app.extensions["rate_limiter"] = self
+        app.before_request(self.check)
+
+    def after_fork(self):
+        if self.storage is not None:
+            self.storage.after_fork()
+
+    def client_keys(self):
+        keys = [f"ip:{request.remote_addr}"]
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            if data.get("user_id"):
+                keys.append(f"user:{data['user_id']}")
+            elif isinstance(data.get("email"), str):
+                keys.append(f"email:{data['email'].strip().lower()}")
+        return keys
+
+    def check(self):
+        config = current_app.config
+        budget = config["RATELIMIT_BUDGETS"].get(request.endpoint)
+        if not config["RATELIMIT_ENABLED"] or budget is None:
+            return None
+
+        rate, burst = parse_budget(budget)
+        for client in self.client_keys():
+            try:
+                allowed, retry_after = self.storage.take(f"{request.endpoint}:{client}", rate, burst)
+            except sqlite3.Error:
+                # The limiter must never take the API down with it: fail open
+                return None
+            if not allowed:
+                response = jsonify({"error": "Too many requests"})
+                response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+                return response, 429
+        return None
+
+
+# --------------------
+# Load shedding
+# --------------------
+class LoadShedder:
+    """Reject requests early with 503 when this worker is already saturated."""
+
+    def __init__(self, app=None):
+        self.in_flight = 0
+        self.backlog = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SHED_MAX_IN_FLIGHT", 0)  # 0 disables the check
+        app.config.setdefault("SHED_MAX_QUEUE_MS", 0)  # 0 disables the check
+        app.config.setdefault("SHED_RETRY_AFTER", 1)
+        app.config.setdefault("SHED_EXEMPT_ENDPOINTS", ("api.home",))
+        app.extensions["load_shedder"] = self
+        # Runs before the rate limiter so overload never pays for a bucket lookup
+        app.before_request_funcs.setdefault(None, []).insert(0, self.admit)
+        app.teardown_request(self.release)
+
+    def after_fork(self):
+        self.in_flight = 0
+        self.backlog = None
+        self._lock = threading.Lock()
+
+    def count_with(self, backlog):
+        """
+        Measure load with `backlog()`: requests the server has accepted for this
+        worker, this one included.
+
+        A counter bumped in before_request can never pass the worker's thread
+        count, since requests waiting for a thread have not reached Flask yet;
+        the server's own queue can.
+        """
+        self.backlog = backlog
+
+    def others(self):
+        """Requests this worker holds besides the current one"""
+        if self.backlog is not None:
+            return max(0, self.backlog() - 1)
+        return self.in_flight
+
+    def queue_ms(self):
+        """Milliseconds the request waited in front of us, from the proxy's X-Request-Start."""
+        header = request.headers.get("X-Request-Start", "")
+        try:
+            started = float(header.replace("t=", ""))
+        except ValueError:
+            return 0.0
+        # Proxies send seconds, milliseconds or microseconds since the epoch
+        while started > 1e11:
+            started /= 1000.0
+        return max(0.0, (time.time() - started) * 1000.0)
+
+    def admit(self):
+        config = current_app.config
+        if request.endpoint in config["SHED_EXEMPT_ENDPOINTS"]:
+            return None
+
+        max_in_flight = config["SHED_MAX_IN_FLIGHT"]
+        max_queue_ms = config["SHED_MAX_QUEUE_MS"]
+        queued_too_long = bool(max_queue_ms) and self.queue_ms() > max_queue_ms
+        with self._lock:
+            overloaded = queued_too_long or (
+                bool(max_in_flight) and self.others() >= max_in_flight
+            )
+            if not overloaded:
+                self.in_flight += 1
+                g._counted_in_flight = True
+        if overloaded:
+            response = jsonify({"error": "Service overloaded, retry shortly"})
+            response.headers["Retry-After"] = str(config["SHED_RETRY_AFTER"])
+            return response, 503
+        return None
+
+    def release(self, exc=None):
+        if g.pop("_counted_in_flight", False):
+            with self._lock:
+                self.in_flight -= 1
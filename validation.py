@@ -0,0 +1,212 @@
+"""
+Request schemas shared by the JSON handlers and the bulk importers
+
+Every POST and PATCH body is declared below as a Schema of Fields. Each
+schema is compiled once, at import, into one checker per field: a closure
+with that field's coercion and rules already picked, so validating a
+request is a loop over a short list, with no per-request decisions about
+what a field allows. Handlers validate before they touch the session, so a
+malformed body never costs a query or a rollback.
+
+Schema.validate(data) returns (values, problem): the cleaned column values
+ready for the model, or None and a 400 body naming every bad field at once:
+
+    {"error": "Missing title or organization_id; Duration must be a number",
+     "errors": {"duration": "Duration must be a number", "title": "title is required"}}
+
+"error" is the one-line summary clients have always read; "errors" has
+every problem, by field.
+"""
+from models import APPLICATION_STATUSES, USER_ROLES, validate_payment_amount, validate_payment_status
+
+INTEGER_MAX = 2 ** 31 - 1  # INTEGER columns on PostgreSQL
+NOT_AN_OBJECT = "Request body must be a JSON object"
+
+
+def _to_str(name):
+    message = f"{name} must be a string"
+
+    def check(value):
+        if not isinstance(value, str):
+            raise ValueError(message)
+        return value
+    return check
+
+
+def _to_int(name, minimum, message):
+    message = message or f"{name} must be an integer"
+    minimum = -INTEGER_MAX - 1 if minimum is None else minimum
+    too_small = f"{name} must be at least {minimum}"
+    too_large = f"{name} is too large"
+
+    def check(value):
+        # JSON numbers and CSV cells; True is not 1 here
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise ValueError(message)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(message)
+        if value < minimum:
+            raise ValueError(too_small)
+        if value > INTEGER_MAX:
+            raise ValueError(too_large)
+        return value
+    return check
+
+
+def _one_of(name, choices):
+    message = f"{name.capitalize()} must be one of {', '.join(choices)}"
+    allowed = frozenset(choices)
+
+    def check(value):
+        if not isinstance(value, str) or value not in allowed:
+            raise ValueError(message)
+        return value
+    return check
+
+
+class Field:
+    """
+    One body field. `kind` is str or int; `parse` replaces it with a
+    function that returns the clean value or raises ValueError(message).
+    None and "" count as absent: an error if `required`, else `default`.
+    A PATCH may clear a field to None only if it is `nullable`.
+    """
+
+    def __init__(self, kind=str, required=False, nullable=None, default=None, minimum=None, choices=None,
+                 parse=None, message=None):
+        self.kind = kind
+        self.required = required
+        self.nullable = not required if nullable is None else nullable
+        self.default = default
+        self.minimum = minimum
+        self.choices = choices
+        self.parse = parse
+        self.message = message
+
+    def compile(self, name):
+        if self.parse is not None:
+            return self.parse
+        if self.choices is not None:
+            return _one_of(name, self.choices)
+        if self.kind is int:
+            return _to_int(name, self.minimum, self.message)
+        return _to_str(name)
+
+
+class Schema:
+    """
+    A request body: Fields by name, plus the summary message for missing
+    required fields. Unknown keys are ignored.
+    """
+
+    def __init__(self, fields, missing="Missing fields"):
+        self.missing = missing
+        self.fields = tuple(fields)
+        self._checks = tuple(
+            (name, field.required, field.nullable, field.default, field.compile(name))
+            for name, field in fields.items()
+        )
+
+    def validate(self, data, partial=False):
+        """
+        (values, None) or (None, problem). `partial` (PATCH) checks only
+        the fields present and returns only those.
+        """
+        if data is None:
+            data = {}
+        elif not isinstance(data, dict):
+            return None, {"error": NOT_AN_OBJECT, "errors": {}}
+
+        values, errors, missing = {}, {}, []
+        for name, required, nullable, default, check in self._checks:
+            value = data.get(name)
+            if value is None or value == "":
+                if partial:
+                    if name in data and nullable:
+                        values[name] = None
+                    elif name in data:
+                        errors[name] = f"{name} can't be empty"
+                elif required:
+                    errors[name] = f"{name} is required"
+                    missing.append(name)
+                else:
+                    values[name] = default
+                continue
+            try:
+                values[name] = check(value)
+            except (TypeError, ValueError) as e:
+                errors[name] = str(e)
+
+        if not errors:
+            return values, None
+        messages = [message for name, message in errors.items() if name not in missing]
+        return None, {"error": "; ".join([self.missing] * bool(missing) + messages), "errors": errors}
+
+
+# --------------------
+# Schemas, by endpoint
+# --------------------
+REGISTER = Schema({
+    "name": Field(str, required=True),
+    "email": Field(str, required=True),
+    "password": Field(str, required=True),
+    "role": Field(required=True, choices=USER_ROLES),
+})
+
+LOGIN = Schema({
+    "email": Field(str, required=True),
+    "password": Field(str, required=True),
+}, missing="Missing email or password")
+
+ORGANIZATION = Schema({
+    "name": Field(str, required=True),
+    "description": Field(str),
+    "location": Field(str),
+    "owner_id": Field(int, required=True, minimum=1),
+}, missing="Missing organization name or owner_id")
+
+# POST /opportunities and the catalog import
+_OPPORTUNITY_FIELDS = {
+    "title": Field(str, required=True),
+    "organization_id": Field(int, required=True, minimum=1),
+    "description": Field(str),
+    "location": Field(str),
+    "duration": Field(int, minimum=0, message="Duration must be a number"),
+    "created_by": Field(int, minimum=1),
+    # Absent or None: unlimited
+    "capacity": Field(int, minimum=0, message="Capacity must be a whole number"),
+}
+OPPORTUNITY = Schema(_OPPORTUNITY_FIELDS, missing="Missing title or organization_id")
+
+# PATCH /opportunities/<id>, with partial=True: who created it doesn't change
+OPPORTUNITY_UPDATE = Schema(
+    {name: field for name, field in _OPPORTUNITY_FIELDS.items() if name != "created_by"},
+    missing="Missing title or organization_id",
+)
+
+APPLICATION = Schema({
+    "user_id": Field(int, required=True, minimum=1),
+    "opportunity_id": Field(int, required=True, minimum=1),
+    "motivation_message": Field(str),
+}, missing="Missing user_id or opportunity_id")
+
+APPLICATION_UPDATE = Schema({
+    "status": Field(required=True, choices=APPLICATION_STATUSES),
+}, missing=f"Status must be one of {', '.join(APPLICATION_STATUSES)}")
+
+# POST /payments and the payments import
+PAYMENT = Schema({
+    "user_id": Field(int, required=True, minimum=1),
+    "opportunity_id": Field(int, required=True, minimum=1),
+    "amount": Field(required=True, parse=validate_payment_amount),
+    "payment_status": Field(nullable=False, default="pending", parse=validate_payment_status),
+}, missing="Missing required fields: user_id, opportunity_id, amount")
+
+# PATCH /payments/<id>, with partial=True: a payment never moves to another
+# user or opportunity
+PAYMENT_UPDATE = Schema({
+    "amount": Field(nullable=False, parse=validate_payment_amount),
+    "payment_status": Field(nullable=False, parse=validate_payment_status),
+})